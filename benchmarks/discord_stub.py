@@ -0,0 +1,108 @@
+"""
+
+Offline stand-in for the parts of discord.py the question embeds use
+
+install() must run before professor.discord is imported. Embeds are plain dictionaries, shaped like
+discord.Embed.to_dict(), so rendering cost is professor's own and does not vary with the discord.py version.
+
+"""
+from typing import Optional
+import types
+import sys
+
+
+class Colour(object):
+
+	def __init__(self, value: int):
+		self.value: int = value
+
+	@classmethod
+	def dark_theme(cls) -> "Colour":
+		return cls(0x36393F)
+
+
+class Embed(object):
+
+	def __init__(self, title: Optional[str] = None, description: Optional[str] = None, colour: Optional[Colour] = None, **kwargs):
+		self._data: dict = {"type": "rich", "fields": []}
+		if title is not None:
+			self._data["title"] = str(title)
+		if description is not None:
+			self._data["description"] = str(description)
+		if colour is not None:
+			self._data["color"] = colour.value
+
+	@classmethod
+	def from_dict(cls, data: dict) -> "Embed":
+		embed = cls.__new__(cls)
+		embed._data = dict(data)
+		embed._data["fields"] = list(data.get("fields", []))
+		return embed
+
+	@property
+	def fields(self) -> list:
+		return self._data["fields"]
+
+	def set_thumbnail(self, *, url: str) -> "Embed":
+		self._data["thumbnail"] = {"url": str(url)}
+		return self
+
+	def set_image(self, *, url: str) -> "Embed":
+		self._data["image"] = {"url": str(url)}
+		return self
+
+	def set_footer(self, *, text: str) -> "Embed":
+		self._data["footer"] = {"text": str(text)}
+		return self
+
+	def add_field(self, *, name: str, value: str, inline: bool = True) -> "Embed":
+		self._data["fields"].append({"name": str(name), "value": str(value), "inline": inline})
+		return self
+
+	def remove_field(self, index: int):
+		try:
+			del self._data["fields"][index]
+		except IndexError:
+			pass
+
+	def to_dict(self) -> dict:
+		return dict(self._data)
+
+
+class File(object):
+
+	def __init__(self, fp, filename: Optional[str] = None):
+		self.fp = fp
+		self.filename: Optional[str] = filename
+
+
+class HTTPException(Exception):
+
+	def __init__(self, status: int, text: str = "", retry_after: Optional[float] = None):
+		super(HTTPException, self).__init__(text)
+		self.status: int = status
+		self.text: str = text
+		self.retry_after: Optional[float] = retry_after
+
+
+def install() -> types.ModuleType:
+	"""
+	Registers the stub as the discord module. Does nothing if it already is.
+
+	:return: The stub module
+	"""
+	installed = sys.modules.get("discord")
+	if getattr(installed, "__stub__", False):
+		return installed
+	if "professor.discord.question" in sys.modules:
+		raise RuntimeError("discord_stub.install() must run before professor.discord is imported")
+	module = types.ModuleType("discord")
+	module.__stub__ = True
+	module.Colour = module.Color = Colour
+	module.Embed = Embed
+	module.File = File
+	module.HTTPException = HTTPException
+	# Only used in annotations
+	module.Guild = module.Message = object
+	sys.modules["discord"] = module
+	return module
@@ -0,0 +1,81 @@
+"""
+
+Memory footprint of a generated question bank
+
+Run from the repository root: python -m benchmarks.footprint
+Loads a bank of Discord questions under tracemalloc, then reports what the bank retains per question type and attribute.
+
+"""
+from benchmarks import discord_stub
+
+discord_stub.install()
+
+from typing import List
+import argparse
+import tempfile
+import random
+import json
+
+from professor.core.base import QuestionBase, QuizBase
+from professor.discord import question
+from professor.utils.footprint import footprint, traced
+from professor.utils.storage import ImageStore
+from benchmarks.suite import WORDS
+
+
+def bank(n: int, images: int, rng: random.Random) -> List[QuestionBase]:
+	"""
+	Questions of every type with word choices and answers, and images drawn from a few distinct ones
+
+	:param images:  Distinct images (bytes of 64kB). Every tenth question has one.
+
+	"""
+	pictures = [rng.randbytes(64 * 1024) for _ in range(images)]
+	questions = []
+	for k in range(n):
+		kwargs = {"text": f"Question {k}: {' '.join(rng.choices(WORDS, k=8))}?", "id": k}
+		if pictures and (k % 10 == 0):
+			# A copy, as if each question had been loaded from its own file
+			kwargs["image"] = bytes(bytearray(rng.choice(pictures)))
+		kind = k % 5
+		if kind == 0:
+			questions.append(question.FreeResponse(answer=rng.choice(WORDS), **kwargs))
+		elif kind == 1:
+			questions.append(question.Numeric(answer=f"{rng.uniform(0, 100):.2f}", **kwargs))
+		elif kind == 2:
+			questions.append(question.MultipleChoice(choices=rng.sample(WORDS, 4), answer=rng.choice(WORDS), **kwargs))
+		elif kind == 3:
+			questions.append(question.MultipleResponse(choices=rng.sample(WORDS, 6), answer=rng.sample(WORDS, 2), **kwargs))
+		else:
+			questions.append(question.MultipleFreeResponse(answer=rng.sample(WORDS, 3), **kwargs))
+	return questions
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("-n", "--questions", type=int, default=10000, help="Questions in the bank")
+	parser.add_argument("-i", "--images", type=int, default=5, help="Distinct images")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the generated bank")
+	parser.add_argument("--store", action="store_true", help="Keep images in an ImageStore in a temporary directory")
+	parser.add_argument("--embeds", action="store_true", help="Also report the size of rendered embeds")
+	parser.add_argument("--json", action="store_true", help="Print the footprint as JSON")
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	with tempfile.TemporaryDirectory() as root:
+		if args.store:
+			QuestionBase.image_store = ImageStore(root)
+		with traced() as allocated:
+			quiz = QuizBase(questions=bank(args.questions, args.images, rng), size=args.questions)
+		result = footprint(quiz, embeds=args.embeds)
+
+	if args.json:
+		print(json.dumps({"footprint": result.as_dict(), "traced": {"size": allocated.size, "peak": allocated.peak}}, indent=2))
+	else:
+		print(allocated.report())
+		print()
+		print(result.report())
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,93 @@
+"""
+
+Offline grading of a generated response file: a plain check loop against professor.core.grading
+
+Run from the repository root: python -m benchmarks.grading
+
+"""
+import argparse
+import tempfile
+import random
+import json
+import time
+import os
+
+from professor.core import question
+from professor.core.base import QuizBase
+from professor.core.grading import ResultWriter, grade, index_questions, read_responses
+from benchmarks.suite import WORDS, free_responses, numeric_responses
+
+
+def quiz(n: int, rng: random.Random) -> QuizBase:
+	questions = []
+	for k in range(n):
+		kind = k % 4
+		if kind == 0:
+			questions.append(question.FreeResponse(id=k, answer=rng.choice(WORDS)))
+		elif kind == 1:
+			questions.append(question.Numeric(id=k, answer=f"{rng.uniform(0, 100):.2f}"))
+		elif kind == 2:
+			questions.append(question.MultipleChoice(id=k, choices=rng.sample(WORDS, 4), answer=rng.choice(WORDS)))
+		else:
+			questions.append(question.MultipleFreeResponse(id=k, answer=rng.sample(WORDS, 3)))
+	return QuizBase(id="exam", questions=questions, size=n)
+
+
+def responses(exam: QuizBase, n: int, path: str, rng: random.Random):
+	"""
+	Writes n responses from 1000 players as JSON lines, in random question order
+
+	"""
+	with open(path, "w") as f:
+		for _ in range(n):
+			q = rng.choice(exam.questions)
+			if isinstance(q, question.Numeric):
+				response = numeric_responses(q.answer, 1, rng)[0]
+			elif isinstance(q, question.MultipleChoice):
+				response = rng.choice(q.choices)
+			else:
+				answers = q.answer if isinstance(q.answer, list) else [q.answer]
+				response = free_responses(answers, 1, rng)[0]
+			f.write(json.dumps({"quiz": exam.id, "question": q.id, "player": f"player {rng.randrange(1000)}", "response": response}) + "\n")
+
+
+def loop(exam: QuizBase, path: str) -> int:
+	"""
+	Baseline: check every response in file order
+
+	"""
+	questions = index_questions({exam.id: exam})
+	graded = 0
+	for chunk in read_responses(path):
+		for _, r in chunk:
+			questions[str(r.quiz), str(r.question)].check(r.response)
+			graded += 1
+	return graded
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("-n", "--responses", type=int, default=200000, help="Responses in the file")
+	parser.add_argument("-q", "--questions", type=int, default=200, help="Questions in the exam")
+	parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Worker processes")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the generated file")
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	exam = quiz(args.questions, rng)
+	with tempfile.TemporaryDirectory() as root:
+		path = os.path.join(root, "responses.jsonl")
+		responses(exam, args.responses, path, rng)
+
+		start = time.perf_counter()
+		loop(exam, path)
+		print(f"{'check loop':<30} {time.perf_counter() - start:8.2f} s")
+
+		for workers in (0, args.workers):
+			with ResultWriter(os.path.join(root, "results.csv")) as sink:
+				done = grade([path], {exam.id: exam}, sink, workers=workers)
+			print(f"{f'pipeline, {workers} workers':<30} {done.elapsed:8.2f} s  ({done.rate:,.0f} responses/s, {done.errors} errors)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,59 @@
+"""
+
+Answers graded per second by a ShardHost, in this process and with worker processes
+
+Run from the repository root: python -m benchmarks.host
+
+"""
+import argparse
+import random
+import time
+import os
+
+from professor.core import question
+from professor.core.base import QuizBase
+from professor.core.host import ShardHost
+from benchmarks.suite import WORDS, free_responses
+
+
+def quizzes(n: int, rng: random.Random):
+	questions = [question.FreeResponse(id=k, text=f"Question {k}", answer=rng.choice(WORDS)) for k in range(n)]
+	return {"exam": QuizBase(id="exam", questions=questions, size=n)}
+
+
+def run(host: ShardHost, sessions: int, players: int, rng: random.Random) -> float:
+	"""
+	Starts the sessions, then every player answers the first question of every session
+
+	:return: Seconds taken by the answers
+	"""
+	keys = [("guild", k) for k in range(sessions)]
+	for future in [host.begin(key, "exam", seed=k) for k, key in enumerate(keys)]:
+		future.result()
+	responses = free_responses(WORDS, players, rng)
+	start = time.perf_counter()
+	futures = [host.answer(key, f"player {p}", response) for key in keys for p, response in enumerate(responses)]
+	for future in futures:
+		future.result()
+	return time.perf_counter() - start
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("-g", "--sessions", type=int, default=200, help="Concurrent sessions")
+	parser.add_argument("-p", "--players", type=int, default=100, help="Players per session")
+	parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Worker processes")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the generated responses")
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	exam = quizzes(50, rng)
+	for workers in (0, args.workers):
+		with ShardHost(exam, workers=workers) as host:
+			elapsed = run(host, args.sessions, args.players, random.Random(args.seed))
+		answers = args.sessions * args.players
+		print(f"{f'{workers} workers':<12} {elapsed:8.2f} s  ({answers / elapsed:,.0f} answers/s)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,54 @@
+"""
+
+Import-time budget for professor modules, measured with python -X importtime
+
+Run from the repository root: python -m benchmarks.imports
+Exits with status 1 if a module goes over its budget.
+
+"""
+from typing import Dict
+import argparse
+import subprocess
+import sys
+
+# Cumulative import time budgets in milliseconds, with headroom for slow machines
+BUDGETS: Dict[str, float] = {
+	"professor.utils.numeric": 30,
+	"professor.core.question": 60,
+	"professor.discord.question": 90,
+}
+
+
+def import_time(module: str) -> float:
+	"""
+	Cumulative import time of a module in a fresh interpreter, in milliseconds
+
+	"""
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+		capture_output=True, text=True, check=True
+	)
+	for line in result.stderr.splitlines():
+		# import time: self [us] | cumulative | imported package
+		parts = [part.strip() for part in line.split("|")]
+		if (len(parts) == 3) and (parts[2] == module):
+			return int(parts[1]) / 1000
+	raise ValueError(f"'{module}' not found in -X importtime output")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("-r", "--repeat", type=int, default=5, help="Interpreters started per module, the best is reported")
+	args = parser.parse_args()
+
+	over = False
+	for module, budget in BUDGETS.items():
+		best = min(import_time(module) for _ in range(args.repeat))
+		status = "ok" if best <= budget else "OVER BUDGET"
+		over |= best > budget
+		print(f"{module:<30} {best:8.1f} ms / {budget:6.1f} ms  {status}")
+	sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+	main()
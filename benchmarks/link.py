@@ -0,0 +1,75 @@
+"""
+
+Benchmark of Link-decorated edits on questions with 1k choices
+
+Run from the repository root: python -m benchmarks.link
+
+"""
+from typing import Callable, Dict
+import argparse
+import timeit
+
+from professor.core.question import MultipleChoice, MultipleResponse
+
+
+def multiple_choice(n: int) -> MultipleChoice:
+	choices = [f"choice {k}" for k in range(n)]
+	return MultipleChoice(choices=choices, answer=choices[n // 2], shuffle=False)
+
+
+def multiple_response(n: int) -> MultipleResponse:
+	choices = [f"choice {k}" for k in range(n)]
+	return MultipleResponse(choices=choices, answer=choices[::10], shuffle=False)
+
+
+def cases(n: int) -> Dict[str, Callable]:
+	"""
+	Each case leaves the question as it found it, so it can be repeated
+
+	"""
+	mc = multiple_choice(n)
+	mr = multiple_response(n)
+
+	def mc_edit_choice():
+		mc.edit_choice(x="edited", i=n // 2)
+		mc.edit_choice(x=f"choice {n // 2}", i=n // 2)
+
+	def mc_edit_answer():
+		mc.edit_answer(x="edited")
+		mc.edit_answer(x=f"choice {n // 2}")
+
+	def mr_edit_choice():
+		mr.edit_choice(x="edited", i=n // 2)
+		mr.edit_choice(x=f"choice {n // 2}", i=n // 2)
+
+	def mr_edit_answer():
+		mr.edit_answer(x="edited", i=len(mr.answer) // 2)
+		mr.edit_answer(x=f"choice {(len(mr.answer) // 2) * 10}", i=len(mr.answer) // 2)
+
+	def mr_add_delete_answer():
+		mr.add_answer(x="added")
+		mr.delete_answer(x="added")
+
+	return {
+		"MultipleChoice.edit_choice": mc_edit_choice,
+		"MultipleChoice.edit_answer": mc_edit_answer,
+		"MultipleResponse.edit_choice": mr_edit_choice,
+		"MultipleResponse.edit_answer": mr_edit_answer,
+		"MultipleResponse.add_answer/delete_answer": mr_add_delete_answer,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("-n", "--choices", type=int, default=1000, help="Choices per question")
+	parser.add_argument("-r", "--repeat", type=int, default=5, help="Timing repeats, the best is reported")
+	parser.add_argument("-l", "--loops", type=int, default=2000, help="Calls per repeat")
+	args = parser.parse_args()
+
+	for name, case in cases(args.choices).items():
+		best = min(timeit.repeat(case, number=args.loops, repeat=args.repeat)) / args.loops
+		print(f"{name:<45} {best * 1e6:10.2f} us")
+
+
+if __name__ == "__main__":
+	main()
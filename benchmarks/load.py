@@ -0,0 +1,335 @@
+"""
+
+Load test: simulated players answering quizzes in many guilds at once
+
+Run from the repository root: python -m benchmarks.load
+
+Every guild runs a session of the same quiz on a ShardHost. Each question is rendered by the host, sent through a
+SendScheduler to a fake channel that answers after a simulated API latency (and now and then with a 429), then
+answered by the guild's players. Answers arrive as a Poisson process at the given rate, split evenly between guilds,
+and are correct, near misses, junk or duplicates of an earlier answer in the given proportions.
+
+Latencies are measured from when a request was due, not from when the loop got around to it, so a saturated
+host shows up as growing latencies rather than as a lower arrival rate.
+
+Stages:
+	question    Starting a session or moving it to its next question, including the embed render in the host
+	send        Sending a rendered question, including rate limiting and retries
+	answer      Grading one answer
+
+"""
+from benchmarks import discord_stub
+
+discord = discord_stub.install()
+
+from typing import Any, Dict, List, Tuple
+from array import array
+from bisect import bisect_left
+import argparse
+import asyncio
+import datetime
+import platform
+import random
+import json
+import math
+import time
+import sys
+import os
+
+from professor.core import question as core
+from professor.core.base import QuestionBase, QuizBase
+from professor.core.host import ShardHost
+from professor.core.instrument import BOUNDS
+from professor.core.template import NumericTemplate
+from professor.discord import question
+from professor.discord.broadcast import Broadcast, BroadcastTarget, SendScheduler
+from benchmarks.suite import WORDS, typo
+
+KINDS = ("correct", "near", "junk", "duplicate")
+STAGES = ("question", "send", "answer")
+PERCENTILES = (0.5, 0.99, 0.999)
+
+
+class Histogram(object):
+
+	def __init__(self):
+		"""
+		Latencies of one stage. Every sample is kept so percentiles are exact.
+
+		"""
+		self.samples: array = array("d")
+		self._sorted: List[float] = []
+
+	def __len__(self) -> int:
+		return len(self.samples)
+
+	def add(self, seconds: float):
+		self.samples.append(seconds)
+
+	def percentile(self, q: float) -> float:
+		"""
+		Nearest-rank percentile, q in [0, 1]
+
+		"""
+		if len(self._sorted) != len(self.samples):
+			self._sorted = sorted(self.samples)
+		if not self._sorted:
+			return math.nan
+		return self._sorted[max(0, math.ceil(q * len(self._sorted)) - 1)]
+
+	def buckets(self) -> List[Tuple[float, int]]:
+		"""
+		Sample counts per latency bucket of professor.core.instrument, as (upper bound in seconds, count)
+
+		"""
+		counts = [0] * (len(BOUNDS) + 1)
+		for s in self.samples:
+			counts[bisect_left(BOUNDS, s * 1e9)] += 1
+		return [(b / 1e9, n) for b, n in zip(BOUNDS, counts)] + [(math.inf, counts[-1])]
+
+	def summary(self, elapsed: float) -> Dict[str, float]:
+		n = len(self.samples)
+		return {
+			"count": n,
+			"rate": n / elapsed if elapsed else 0.0,
+			"mean": sum(self.samples) / n if n else math.nan,
+			**{f"p{q * 100:g}": self.percentile(q) for q in PERCENTILES},
+			"max": max(self.samples) if n else math.nan,
+		}
+
+
+class FakeGuild(object):
+
+	def __init__(self, id: int):
+		self.id: int = id
+		self.icon_url: str = f"https://cdn.example.com/icons/{id}.png"
+
+
+class FakeChannel(object):
+
+	def __init__(self, id: int, latency: float, limited: float, rng: random.Random):
+		"""
+		Channel whose send takes a log-normally distributed time, like a call to the Discord API
+
+		:param latency: Median seconds a send takes
+		:param limited: Fraction of sends answered with a 429
+
+		"""
+		self.id: int = id
+		self.guild: FakeGuild = FakeGuild(id)
+		self.latency: float = latency
+		self.limited: float = limited
+		self.rng: random.Random = rng
+		self.sent: int = 0
+
+	async def send(self, **kwargs) -> dict:
+		await asyncio.sleep(self.latency * self.rng.lognormvariate(0, 0.5))
+		if self.rng.random() < self.limited:
+			raise discord.HTTPException(429, "You are being rate limited.", retry_after=self.latency)
+		self.sent += 1
+		return kwargs
+
+
+def quiz(n: int, rng: random.Random) -> QuizBase:
+	"""
+	A quiz cycling through the question types, with numeric templates among them
+
+	"""
+	questions = []
+	for k in range(n):
+		kind = k % 6
+		if kind == 0:
+			questions.append(question.FreeResponse(id=k, text=f"Question {k}", answer=rng.choice(WORDS)))
+		elif kind == 1:
+			questions.append(question.Numeric(id=k, text=f"Question {k}", answer=f"{rng.uniform(0, 100):.2f}", round=2))
+		elif kind == 2:
+			choices = rng.sample(WORDS, 4)
+			questions.append(question.MultipleChoice(id=k, text=f"Question {k}", choices=choices, answer=choices[0]))
+		elif kind == 3:
+			choices = rng.sample(WORDS, 6)
+			questions.append(question.MultipleResponse(id=k, text=f"Question {k}", choices=choices, answer=choices[:2]))
+		elif kind == 4:
+			questions.append(question.MultipleFreeResponse(id=k, text=f"Question {k}", answer=rng.sample(WORDS, 3)))
+		else:
+			questions.append(NumericTemplate(
+				id=k, text="A car travels {d} km in {t} h. What is its speed in km/h?",
+				params={"d": ("integers", 10, 500), "t": [1, 2, 4, 5]}, expression="d / t", round=1,
+				instance_type=question.Numeric
+			))
+	return QuizBase(id="load", questions=questions, size=n, shuffle=True)
+
+
+def response(q: QuestionBase, kind: str, rng: random.Random) -> Any:
+	"""
+	A response of the given kind ('correct', 'near' or 'junk') to a question
+
+	"""
+	if kind == "junk":
+		return rng.choice(["idk", "", "?", "asdfgh", rng.choice(WORDS)[::-1]])
+	if isinstance(q, core.Numeric):
+		return f"{q.answer:.2f}" if kind == "correct" else f"{q.answer + rng.choice((-1, 1)) * 0.1:.2f}"
+	if isinstance(q, core.MultipleResponse):
+		# Players type the letters of their picks
+		picks = q.answer if kind == "correct" else (q.answer[:-1] or q.choices[:1])
+		return ", ".join("abcdefghij"[q.choices.index(pick)] for pick in picks)
+	if isinstance(q, core.MultipleChoice):
+		return q.answer if kind == "correct" else rng.choice([c for c in q.choices if c != q.answer])
+	answer = rng.choice(q.answer) if isinstance(q.answer, list) else q.answer
+	return answer if kind == "correct" else typo(answer, rng)
+
+
+def arrivals(q: QuestionBase, players: int, mix: Dict[str, float], rng: random.Random) -> List[Tuple[str, str, Any]]:
+	"""
+	The answers to a question in arrival order: every player answers once, and some answer again
+
+	:return: (player, kind, response)
+	"""
+	fresh = [k for k in KINDS if k != "duplicate"]
+	weights = [mix[k] for k in fresh]
+	planned = []
+	for p in rng.sample(range(players), k=players):
+		kind = rng.choices(fresh, weights)[0]
+		planned.append((f"player {p}", kind, response(q, kind, rng)))
+		if rng.random() < mix["duplicate"]:
+			planned.append((f"player {p}", "duplicate", planned[-1][2]))
+	return planned
+
+
+class LoadTest(object):
+
+	def __init__(self, host: ShardHost, exam: QuizBase, args: argparse.Namespace):
+		self.host: ShardHost = host
+		self.exam: QuizBase = exam
+		self.args: argparse.Namespace = args
+		self.rng: random.Random = random.Random(args.seed)
+		self.scheduler: SendScheduler = SendScheduler(rate=args.send_rate)
+		self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+		# Kind -> grading result ('True', 'False', 'None', or the exception) -> count
+		self.outcomes: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}
+
+	@property
+	def mix(self) -> Dict[str, float]:
+		return dict(zip(KINDS, self.args.mix))
+
+	async def request(self, stage: str, due: float, future) -> Any:
+		"""
+		Waits for a host request and records its latency since it was due
+
+		"""
+		try:
+			return await asyncio.wrap_future(future)
+		finally:
+			self.stages[stage].add(asyncio.get_running_loop().time() - due)
+
+	async def answer(self, key: int, due: float, player: str, kind: str, response: Any):
+		try:
+			result = await self.request("answer", due, self.host.answer(key, player, response))
+		except Exception as e:
+			result = type(e).__name__
+		outcomes = self.outcomes[kind]
+		outcomes[str(result)] = outcomes.get(str(result), 0) + 1
+
+	async def session(self, key: int):
+		"""
+		One guild's session, from its first question to its standings
+
+		"""
+		loop = asyncio.get_running_loop()
+		rng = random.Random(self.rng.getrandbits(64))
+		seed = rng.getrandbits(64)
+		channel = FakeChannel(key, self.args.latency, self.args.limited, rng)
+		target = BroadcastTarget(channel)
+		# The same seed draws the same questions here as in the host, so correct answers can be planned
+		questions = self.exam.session(seed)
+		# Each guild's share of the arrival rate
+		rate = self.args.rate / self.args.guilds
+
+		rendered = await self.request("question", loop.time(), self.host.begin(key, "load", seed))
+		while rendered is not None:
+			q = next(questions)
+			due = loop.time()
+			await self.scheduler.send(channel, embed=Broadcast.patch(rendered, target))
+			self.stages["send"].add(loop.time() - due)
+
+			tasks = []
+			due = loop.time()
+			for player, kind, response in arrivals(q, self.args.players, self.mix, rng):
+				due += rng.expovariate(rate)
+				await asyncio.sleep(due - loop.time())
+				tasks.append(asyncio.ensure_future(self.answer(key, due, player, kind, response)))
+			await asyncio.gather(*tasks)
+			rendered = await self.request("question", loop.time(), self.host.advance(key))
+		await asyncio.wrap_future(self.host.end(key))
+
+	async def run(self) -> float:
+		"""
+		:return: Seconds taken
+		"""
+		start = time.perf_counter()
+		await asyncio.gather(*(self.session(key) for key in range(self.args.guilds)))
+		return time.perf_counter() - start
+
+
+def report(test: LoadTest, elapsed: float, histogram: bool) -> Dict[str, Dict[str, float]]:
+	summaries = {stage: test.stages[stage].summary(elapsed) for stage in STAGES}
+	print(f"{'stage':<10} {'count':>9} {'per s':>10} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}")
+	for stage, s in summaries.items():
+		print(
+			f"{stage:<10} {s['count']:>9} {s['rate']:>10,.0f} {s['mean'] * 1e3:>9.2f} {s['p50'] * 1e3:>9.2f} "
+			f"{s['p99'] * 1e3:>9.2f} {s['p99.9'] * 1e3:>9.2f} {s['max'] * 1e3:>9.2f}"
+		)
+	print()
+	for kind, outcomes in test.outcomes.items():
+		print(f"{kind:<10} " + "  ".join(f"{result}: {n}" for result, n in sorted(outcomes.items())))
+	if histogram:
+		for stage in STAGES:
+			print(f"\n{stage}")
+			for bound, n in test.stages[stage].buckets():
+				if n:
+					print(f"  <= {bound * 1e3:>10.3f} ms  {n:>9}")
+	return summaries
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("-g", "--guilds", type=int, default=20, help="Concurrent sessions, one per guild")
+	parser.add_argument("-p", "--players", type=int, default=250, help="Players per guild")
+	parser.add_argument("-q", "--questions", type=int, default=6, help="Questions per quiz")
+	parser.add_argument("-r", "--rate", type=float, default=5000, help="Answers per second, across all guilds")
+	parser.add_argument(
+		"-m", "--mix", type=float, nargs=4, default=(0.6, 0.2, 0.15, 0.05), metavar=KINDS,
+		help="Proportions of correct, near-miss and junk answers, and the chance an answer is sent twice"
+	)
+	parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Host worker processes, 0 for none")
+	parser.add_argument("--latency", type=float, default=0.05, help="Median seconds the fake API takes per send")
+	parser.add_argument("--limited", type=float, default=0.01, help="Fraction of sends rate limited by the fake API")
+	parser.add_argument("--send-rate", type=float, default=50, help="Global sends per second of the scheduler")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the quiz and the simulated players")
+	parser.add_argument("--histogram", action="store_true", help="Print the latency histogram of every stage")
+	parser.add_argument("-o", "--output", help="Write the summaries to this JSON file")
+	args = parser.parse_args()
+
+	exam = quiz(args.questions, random.Random(args.seed))
+	with ShardHost({"load": exam}, workers=args.workers, render=Broadcast.render) as host:
+		test = LoadTest(host, exam, args)
+		elapsed = asyncio.run(test.run())
+	print(f"{args.guilds} guilds, {args.players} players each, {args.workers} workers: {elapsed:.2f} s\n")
+	summaries = report(test, elapsed, args.histogram)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump({
+				"meta": {
+					"date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+					"python": sys.version.split()[0],
+					"implementation": platform.python_implementation(),
+					"machine": platform.machine(),
+					"args": {k: v for k, v in vars(args).items() if k != "output"},
+				},
+				"stages": summaries,
+				"outcomes": test.outcomes,
+			}, f, indent=2)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,331 @@
+"""
+
+Benchmark suite for grading, construction, editing and rendering hot paths
+
+Run from the repository root: python -m benchmarks.suite
+Save results with -o results.json and compare a later run against them with -c results.json.
+Responses and questions are generated from a fixed seed, so runs on the same code time the same work.
+
+"""
+from benchmarks import discord_stub
+
+discord_stub.install()
+
+from typing import Callable, Dict, List, NamedTuple
+import argparse
+import datetime
+import platform
+import statistics
+import random
+import json
+import sys
+import re
+import timeit
+
+from professor.core import question
+from professor.core.base import QuizBase
+from professor.core.template import NumericTemplate
+from professor.utils.numeric import numeric_string
+from professor.discord import question as discord_question
+from benchmarks import link
+
+WORDS = [
+	"mitochondria", "photosynthesis", "osmosis", "electron", "gravity", "velocity", "isotope", "catalyst",
+	"enzyme", "nucleus", "ribosome", "chlorophyll", "entropy", "momentum", "friction", "molecule",
+]
+
+
+class Case(NamedTuple):
+	# Called once per loop
+	f: Callable
+	# Operations performed by one call of f, results are reported per operation
+	ops: int = 1
+
+
+def typo(word: str, rng: random.Random) -> str:
+	"""
+	Misspells a word by dropping, doubling or swapping a character
+
+	"""
+	i = rng.randrange(len(word) - 1)
+	kind = rng.randrange(3)
+	if kind == 0:
+		return word[:i] + word[i + 1:]
+	elif kind == 1:
+		return word[:i] + word[i] + word[i:]
+	return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def free_responses(answers: List[str], n: int, rng: random.Random) -> List[str]:
+	"""
+	Exact answers, case and whitespace slips, misspellings and wrong answers
+
+	"""
+	responses = []
+	for _ in range(n):
+		answer = rng.choice(answers)
+		kind = rng.random()
+		if kind < 0.4:
+			responses.append(answer)
+		elif kind < 0.55:
+			responses.append(f" {answer.upper()} ")
+		elif kind < 0.8:
+			responses.append(typo(answer, rng))
+		else:
+			responses.append(rng.choice(WORDS))
+	return responses
+
+
+def numeric_responses(answer: float, n: int, rng: random.Random) -> List[str]:
+	"""
+	Integers, decimals at several precisions, negatives, units and words
+
+	"""
+	responses = []
+	for _ in range(n):
+		kind = rng.random()
+		if kind < 0.3:
+			responses.append(f"{answer}")
+		elif kind < 0.6:
+			responses.append(f"{answer + rng.uniform(-0.01, 0.01):.{rng.randrange(1, 5)}f}")
+		elif kind < 0.75:
+			responses.append(f"{rng.randrange(1000)}")
+		elif kind < 0.85:
+			responses.append(f"-{answer}")
+		elif kind < 0.95:
+			responses.append(f"{answer} m/s")
+		else:
+			responses.append(rng.choice(WORDS))
+	return responses
+
+
+def grading_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	fr = question.FreeResponse(text="Organelle that produces ATP?", answer="mitochondria")
+	fr_responses = free_responses([fr.answer], n, rng)
+
+	nu = question.Numeric(text="g to two decimals?", answer="9.81", round=2)
+	nu_responses = numeric_responses(nu.answer, n, rng)
+
+	mc = question.MultipleChoice(text="Smallest?", choices=WORDS[:4], answer=WORDS[2])
+	# Mostly picked by value, some by position
+	mc_responses = [rng.choice(mc.choices) if rng.random() < 0.8 else None for _ in range(n)]
+	mc_positions = [rng.randrange(len(mc.choices)) for _ in range(n)]
+
+	mr = question.MultipleResponse(text="Which are organelles?", choices=WORDS[:8], answer=["nucleus", "ribosome"])
+	mr_responses = [rng.sample(mr.choices, k=rng.randrange(1, 4)) for _ in range(n)]
+	# As players type them
+	mr_letters = [", ".join(rng.sample("abcdefgh", k=rng.randrange(1, 4))) for _ in range(n)]
+
+	mfr = question.MultipleFreeResponse(text="Name a particle", answer=["electron", "proton", "neutron", "isotope"])
+	mfr_responses = free_responses(mfr.answer, n, rng)
+
+	def fr_check():
+		for x in fr_responses:
+			fr.check(x)
+
+	def nu_check():
+		for x in nu_responses:
+			nu.check(x)
+
+	def mc_check():
+		for x, i in zip(mc_responses, mc_positions):
+			mc.check(x=x, i=i)
+
+	def mr_check():
+		for x in mr_responses:
+			mr.check(x=x)
+
+	def mr_check_letters():
+		for x in mr_letters:
+			mr.check(x=x)
+
+	def mr_score():
+		for x in mr_responses:
+			mr.score(x=x)
+
+	def mfr_check():
+		for x in mfr_responses:
+			mfr.check(x)
+
+	return {
+		"check.FreeResponse": Case(fr_check, n),
+		"check.Numeric": Case(nu_check, n),
+		"check.MultipleChoice": Case(mc_check, n),
+		"check.MultipleResponse": Case(mr_check, n),
+		"check.MultipleResponse.letters": Case(mr_check_letters, n),
+		"check_many.MultipleResponse.letters": Case(lambda: mr.check_many(mr_letters), n),
+		"score.MultipleResponse": Case(mr_score, n),
+		"check.MultipleFreeResponse": Case(mfr_check, n),
+	}
+
+
+def construction_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	choices = [f"choice {k}" for k in range(n)]
+	mc = question.MultipleChoice(choices=choices, answer=choices[-1], shuffle=False)
+
+	return {
+		"init.FreeResponse": Case(lambda: question.FreeResponse(text="Capital of France?", answer="Paris")),
+		"init.Numeric": Case(lambda: question.Numeric(text="Speed of light?", answer="299792458")),
+		"init.MultipleChoice": Case(lambda: question.MultipleChoice(text="Smallest?", choices=WORDS[:4], answer=WORDS[2])),
+		"init.MultipleResponse": Case(lambda: question.MultipleResponse(text="Which?", choices=WORDS[:8], answer=WORDS[2:4])),
+		"init.MultipleFreeResponse": Case(lambda: question.MultipleFreeResponse(text="Name one", answer=WORDS[:4])),
+		"init.MultipleChoice[n]": Case(lambda: question.MultipleChoice(choices=list(choices), answer=choices[-1], shuffle=False)),
+		"build.MultipleChoice[n]": Case(mc.build),
+	}
+
+
+def editing_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	cases = {f"link.{name}[n]": Case(f) for name, f in link.cases(n).items()}
+
+	mc = question.MultipleChoice(text="Smallest?", choices=WORDS[:4], answer=WORDS[2])
+
+	def edit_type():
+		mc.edit_type(question.FreeResponse)
+		mc.edit_type(question.MultipleChoice)
+
+	def edit_text():
+		mc.edit_text("Largest?")
+		mc.edit_text("Smallest?")
+
+	cases["edit_type.MultipleChoice<->FreeResponse"] = Case(edit_type, 2)
+	cases["edit_text.MultipleChoice"] = Case(edit_text, 2)
+	return cases
+
+
+def quiz_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	questions = [question.FreeResponse(text=f"Question {k}", answer=rng.choice(WORDS)) for k in range(n)]
+	ordered = QuizBase(questions=list(questions), size=n // 2)
+	shuffled = QuizBase(questions=list(questions), size=n // 2, shuffle=True)
+	template = NumericTemplate(
+		text="A car travels {d} km in {t} h. Speed in km/h?", params={"d": ("integers", 10, 500), "t": [1, 2, 4, 5]},
+		expression="d / t", round=1
+	)
+
+	return {
+		"QuizBase.__iter__[n]": Case(lambda: list(ordered)),
+		"QuizBase.__iter__.shuffle[n]": Case(lambda: list(shuffled)),
+		"NumericTemplate.batch": Case(lambda: template.batch(n, 0), n),
+		"NumericTemplate.variants": Case(lambda: list(template.variants(n, 0)), n),
+	}
+
+
+def numeric_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	strings = numeric_responses(9.81, n, rng)
+
+	def parse():
+		for string in strings:
+			numeric_string(string)
+
+	return {"numeric_string": Case(parse, n)}
+
+
+def rendering_cases(n: int, rng: random.Random) -> Dict[str, Case]:
+	questions = {
+		"FreeResponse": discord_question.FreeResponse(text="Capital of France?", answer="Paris"),
+		"Numeric": discord_question.Numeric(text="Speed of light?", answer="299792458"),
+		"MultipleChoice": discord_question.MultipleChoice(text="Smallest?", choices=WORDS[:4], answer=WORDS[2]),
+		"MultipleResponse": discord_question.MultipleResponse(text="Which?", choices=WORDS[:8], answer=WORDS[2:4]),
+		"MultipleFreeResponse": discord_question.MultipleFreeResponse(text="Name one", answer=WORDS[:4]),
+	}
+	cases = {}
+	for name, q in questions.items():
+		cases[f"user_embed.{name}"] = Case(q.user_embed)
+		cases[f"editor_embed.{name}"] = Case(q.editor_embed)
+	return cases
+
+
+GROUPS = [grading_cases, construction_cases, editing_cases, quiz_cases, numeric_cases, rendering_cases]
+
+
+def cases(n: int, seed: int) -> Dict[str, Case]:
+	"""
+	Every benchmark case, built from a fixed seed
+
+	:param n:       Size of the generated inputs (responses per grading case, choices, questions per quiz)
+	:param seed:    Seed of the response generators and question shuffles
+
+	"""
+	random.seed(seed)
+	rng = random.Random(seed)
+	found = {}
+	for group in GROUPS:
+		found.update(group(n, rng))
+	return found
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+	"""
+	Times a case with enough loops per repeat to take at least 0.2 seconds
+
+	:return: Seconds per operation (best and median of the repeats), loops per repeat and operations per loop
+	"""
+	timer = timeit.Timer(case.f)
+	loops, _ = timer.autorange()
+	times = [t / (loops * case.ops) for t in timer.repeat(repeat=repeat, number=loops)]
+	return {"best": min(times), "median": statistics.median(times), "loops": loops, "ops": case.ops}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+	"""
+	Cases whose best time is more than threshold (a fraction) slower than the baseline
+
+	"""
+	slower = []
+	for name, result in results.items():
+		if name not in baseline:
+			continue
+		ratio = result["best"] / baseline[name]["best"]
+		mark = ""
+		if ratio > 1 + threshold:
+			slower.append(name)
+			mark = "  SLOWER"
+		elif ratio < 1 - threshold:
+			mark = "  faster"
+		print(f"{name:<50} {baseline[name]['best'] * 1e6:10.2f} us -> {result['best'] * 1e6:10.2f} us  x{ratio:5.2f}{mark}")
+	return slower
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("-k", "--filter", default="", help="Only run cases whose name matches this regular expression")
+	parser.add_argument("-n", "--size", type=int, default=1000, help="Size of generated inputs")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the generated inputs")
+	parser.add_argument("-r", "--repeat", type=int, default=5, help="Timing repeats per case")
+	parser.add_argument("-o", "--output", help="Write results to this JSON file")
+	parser.add_argument("-c", "--compare", help="Compare against the results in this JSON file")
+	parser.add_argument("-t", "--threshold", type=float, default=0.1, help="Slowdown (fraction) reported by --compare")
+	args = parser.parse_args()
+
+	pattern = re.compile(args.filter)
+	results = {}
+	for name, case in cases(args.size, args.seed).items():
+		if pattern.search(name) is None:
+			continue
+		results[name] = measure(case, args.repeat)
+		if args.compare is None:
+			print(f"{name:<50} {results[name]['best'] * 1e6:10.2f} us  (median {results[name]['median'] * 1e6:.2f} us)")
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump({
+				"meta": {
+					"date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+					"python": sys.version.split()[0],
+					"implementation": platform.python_implementation(),
+					"machine": platform.machine(),
+					"size": args.size,
+					"seed": args.seed,
+					"repeat": args.repeat,
+				},
+				"results": results
+			}, f, indent=2)
+
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)["results"]
+		if compare(results, baseline, args.threshold):
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -1,14 +1,36 @@
-from typing import Union, Optional, Any, List
+from typing import TYPE_CHECKING, Union, Optional, Any, Iterator, List, Callable, Dict, NamedTuple, Tuple
+from contextlib import contextmanager
+import inspect
 import random
 
-from professor.core.wraps import contains
+from professor.core.wraps import contains, instance_lock, lock_editors
+from professor.core.index import ListIndex
+from professor.core.convert import plan
+from professor.core import instrument
+
+if TYPE_CHECKING:
+	from professor.utils.storage import ImageStore
 
 
 class EditableBase(object):
 
+	# Bookkeeping attributes that are never carried over or serialized
+	transient = frozenset({
+		"_indexes", "_cache", "_links", "_deltas", "_journal", "_muted", "_published", "_shared", "_writing"
+	})
+	# Bookkeeping derived from the attributes' values, dropped when the type changes
+	derived = frozenset({"_indexes", "_cache", "_links"})
 	# When editing types, exclude these attributes from the update
-	no_carryover = ["type_help", "name"]
-	no_json = set()
+	no_carryover = ["type_help", "name", *transient]
+	no_json = set(transient)
+	# Array attributes that keep a hash index (value -> positions) for lookups by value
+	indexed = frozenset()
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		lock_editors(cls)
+		# Does nothing unless professor.core.instrument is enabled
+		instrument.install(cls)
 
 	@property
 	def json(self):
@@ -21,13 +43,93 @@ class EditableBase(object):
 		"""
 		pass
 
+	@contextmanager
+	def muted(self):
+		"""
+		Integrations skip their change notifications (e.g. Discord embeds) for edits made inside the block
+
+		"""
+		self.__dict__["_muted"] = self.__dict__.get("_muted", 0) + 1
+		try:
+			yield self
+		finally:
+			self.__dict__["_muted"] -= 1
+			if not self.__dict__["_muted"]:
+				del self.__dict__["_muted"]
+
+	def _index(self, attr: str) -> ListIndex:
+		"""
+		Returns the hash index of an array attribute, building it if it is missing or stale.
+		Once built, the editors keep it updated.
+
+		"""
+		indexes = self.__dict__.setdefault("_indexes", {})
+		index = indexes.get(attr)
+		arr = self.__dict__[attr]
+		if index is None:
+			index = indexes[attr] = ListIndex(arr)
+		elif not index.valid(arr):
+			index.arr = arr
+			index.rebuild()
+		return index
+
+	def _writable(self, attr: str) -> list:
+		"""
+		Returns an array attribute for in-place editing. Concurrent objects copy it first if a published
+		snapshot shares it (see professor.core.concurrency).
+
+		"""
+		return self.__dict__[attr]
+
+	def _publish(self):
+		"""
+		Called after an edit completes. Concurrent objects publish a snapshot for readers here.
+
+		"""
+		pass
+
+	def _changed(self, attr: str, op: str, i: Optional[int] = None, old: Any = None, new: Any = None):
+		"""
+		Reports a change made by an editor. Updates the attribute's index, any active delta recording and the
+		object's journal (see professor.core.journal), and drops values cached from the attributes.
+
+		:param attr:    Attribute changed
+		:param op:      'append', 'insert', 'set', 'pop' or 'assign'
+		:param i:       Non-negative position of an element change
+		:param old:     Value removed or overwritten
+		:param new:     Value added or written
+
+		"""
+		indexes = self.__dict__.get("_indexes")
+		if indexes and (attr in indexes):
+			index = indexes[attr]
+			if index.arr is self.__dict__[attr]:
+				index.update(op, i, old, new)
+		self.__dict__.pop("_cache", None)
+		if (op == "assign") and (old.__class__ is not new.__class__):
+			# Linked attributes select their relationship by type (see professor.core.wraps.Link)
+			self.__dict__.pop("_links", None)
+		deltas = self.__dict__.get("_deltas")
+		if deltas is not None:
+			deltas.append((attr, op, i, old, new))
+		journal = self.__dict__.get("_journal")
+		if journal is not None:
+			journal.record((attr, op, i, old, new))
+
+	def _assign(self, attr: str, x: Any):
+		old = self.__dict__.get(attr)
+		self.__dict__[attr] = x
+		self._changed(attr, "assign", None, old, x)
+
 	def _add_element(self, attr: str, x: Any) -> bool:
 		"""
 		Adds an element to the array attribute
 
 		"""
 		try:
-			self.__dict__[attr].append(x)
+			arr = self._writable(attr)
+			arr.append(x)
+			self._changed(attr, "append", len(arr) - 1, None, x)
 			return True
 		except AttributeError:
 			return False
@@ -38,7 +140,12 @@ class EditableBase(object):
 
 		"""
 		try:
-			self.__dict__[attr].insert(i, x)
+			arr = self._writable(attr)
+			arr.insert(i, x)
+			# Position the element actually landed at
+			L = len(arr) - 1
+			j = min(max(i + L if i < 0 else i, 0), L)
+			self._changed(attr, "insert", j, None, x)
 			return True
 		except AttributeError:
 			return False
@@ -50,7 +157,11 @@ class EditableBase(object):
 
 		"""
 		try:
-			self.__dict__[attr].pop(i)
+			arr = self._writable(attr)
+			if i < 0:
+				i += len(arr)
+			old = arr.pop(i)
+			self._changed(attr, "pop", i, old, None)
 			return True
 		except AttributeError:
 			return False
@@ -61,7 +172,7 @@ class EditableBase(object):
 
 		"""
 		try:
-			self.__dict__[attr] = default
+			self._assign(attr, default)
 			return True
 		except AttributeError:
 			return False
@@ -72,7 +183,7 @@ class EditableBase(object):
 
 		"""
 		try:
-			self.__dict__[attr] = x
+			self._assign(attr, x)
 			return True
 		except Exception:
 			return False
@@ -84,7 +195,12 @@ class EditableBase(object):
 
 		:return: True if successful
 		"""
-		self.__dict__[attr][i] = x
+		arr = self._writable(attr)
+		if i < 0:
+			i += len(arr)
+		old = arr[i]
+		arr[i] = x
+		self._changed(attr, "set", i, old, x)
 		return True
 
 	def _edit_boolean(self, attr: str, x: bool) -> bool:
@@ -98,7 +214,7 @@ class EditableBase(object):
 		"""
 		try:
 			assert isinstance(x, bool)
-			self.__dict__[attr] = x
+			self._assign(attr, x)
 			return True
 		except AssertionError:
 			return False
@@ -111,7 +227,7 @@ class EditableBase(object):
 		"""
 		try:
 			assert isinstance(x, str)
-			self.__dict__[attr] = x
+			self._assign(attr, x)
 			return True
 		except AssertionError:
 			return False
@@ -124,37 +240,29 @@ class EditableBase(object):
 		"""
 		try:
 			assert isinstance(x, (int, float))
-			self.__dict__[attr] = x
+			self._assign(attr, x)
 			return True
 		except AssertionError:
 			return False
 
 	def _edit_type(self, new: type, *args, **kwargs) -> bool:
 		"""
-		Converts the object type to another question type and updates shared attributes
+		Converts the object type to another question type and updates shared attributes.
+		The attributes to carry over are planned once per (current type, new type), see professor.core.convert
 
+		:return: True if successful. On failure the object is left unchanged
 		"""
 		try:
-			old = self.__dict__
-			obj = new(*args, **kwargs)
-			# Find shared attributes
-			update = set(old).intersection(obj.__dict__)
-			# Set new dictionary
-			self.__dict__ = obj.__dict__
-			# Update with carryovers
-			self.__dict__.update({k: old[k] for k in update if (k not in self.no_carryover) & (k not in kwargs)})
-			# Establish new class
-			self.__class__ = obj.__class__
-			# Apply build constructor
-			self.build()
-			return True
-		except Exception as e:
-			print(e)
+			return plan(self.__class__, new).apply(self, **kwargs)
+		except Exception:
 			return False
 
 
 class QuestionBase(EditableBase):
 
+	# When set, images are kept in the store and questions only hold their digest
+	image_store: Optional["ImageStore"] = None
+
 	def __init__(self, *args, **kwargs):
 		"""
 		Abstract class for question types to inherit from
@@ -163,7 +271,7 @@ class QuestionBase(EditableBase):
 		:param version:     Number of versions (most recent being this one)
 		:param text:        Question's text
 		:param answer:      Question's answer
-		:param image:       Image to include
+		:param image:       Image to include (bytes, or a digest if an image store is set)
 		:param id:          Question's id
 		:param help:        Text to display when user needs help
 		:param type_help:   Text to display when user doesn't know how to answer
@@ -180,18 +288,30 @@ class QuestionBase(EditableBase):
 		self.version: int = 1
 		self.text: str = ""
 		self.answer: Optional[Any] = None
-		self.image: Optional[bytes] = None
+		self.image: Optional[Union[bytes, str]] = None
 		self.help: str = "Hmmm... It seems this question doesn't offer help."
 
 		if "type_help" not in self.__dict__:
 			self.type_help: str = "Hmmm... It seems this question type doesn't have a defined answer format."
 
 		self.__dict__.update(kwargs)
+		if isinstance(self.image, bytes) & (self.image_store is not None):
+			self.image = self.image_store.put(self.image)
 		self.build()
 
 	def __eq__(self, other: Any) -> bool:
 		return self.check(x=other)
 
+	@property
+	def image_bytes(self) -> Optional[bytes]:
+		"""
+		The image's bytes, loaded from the image store if the question holds a digest
+
+		"""
+		if isinstance(self.image, str) & (self.image_store is not None):
+			return self.image_store.get(self.image)
+		return self.image
+
 	def check(self, x: Any) -> bool:
 		"""
 		Base method for validating a response, x, against question's answer. Subclasses should override.
@@ -200,6 +320,21 @@ class QuestionBase(EditableBase):
 		"""
 		return self.answer == x
 
+	def draw(self, seed: Optional[int] = None) -> "QuestionBase":
+		"""
+		The question to administer in a session. Templates return a variant drawn from seed, other questions themselves.
+
+		"""
+		return self
+
+	def grader(self) -> Callable[[Any], bool]:
+		"""
+		Returns a function that checks responses like check, for grading many responses to this question at once.
+		Subclasses can override to do per-question work once instead of on every check.
+
+		"""
+		return self.check
+
 	def edit_text(self, x: str) -> bool:
 		"""
 		Edits the text attribute of the question
@@ -227,12 +362,13 @@ class QuestionBase(EditableBase):
 	def edit_image(self, x: bytes) -> bool:
 		"""
 		Edits the image attribute of the question. Subclasses should override.
+		If an image store is set, the image is stored there and the question keeps its digest.
 
 		:return: True if successful
 		"""
 		try:
 			assert isinstance(x, bytes)
-			self.image = x
+			self._assign("image", self.image_store.put(x) if self.image_store is not None else x)
 			return True
 		except AssertionError:
 			return False
@@ -281,11 +417,83 @@ class QuizBase(EditableBase):
 		"""
 		Generator for a sample of queestions of the given size
 		
+		"""
+		return self.session()
+
+	def session(self, seed: Optional[int] = None) -> Iterator[QuestionBase]:
+		"""
+		Generator for a sample of questions of the given size. Template questions are replaced by a variant,
+		generated when it is reached.
+
+		:param seed:    Seeds the sample and the variants, so a session can be administered again identically.
+		                If None, the sample is random and so are the variants.
+
 		"""
 		questions = self.questions
+		rng = random.Random(seed) if seed is not None else random
+		if seed is not None:
+			# A seeded session must not reorder the quiz, or replaying it would sample differently
+			questions = list(questions)
 		if self.shuffle:
-			random.shuffle(questions)
-		yield from random.sample(questions, k=self.size)
+			rng.shuffle(questions)
+		for question in rng.sample(questions, k=self.size):
+			yield question.draw(seed)
+
+	def updated(self, questions: List[QuestionBase]):
+		"""
+		Called once at the end of a bulk update with the questions that were edited. Integrations should override.
+
+		"""
+		pass
+
+	def update(
+			self,
+			where: Optional[Union[Callable, Dict[str, Any]]] = None,
+			values: Optional[Dict[str, Any]] = None,
+			failures: Optional[List["UpdateFailure"]] = None,
+			**match
+	) -> List[QuestionBase]:
+		"""
+		Applies the same edits to every matching question in one pass
+
+		:param where:   Predicate taking a question, or dict of attribute: value (or predicate on the value).
+						The 'type' key matches question classes
+		:param values:  attribute: value edits. Each goes through the question's edit_<attribute> method if it has one,
+						otherwise through the _edit_ method for the attribute's current type. The 'type' key converts
+						questions to another type
+		:param failures:    Receives an UpdateFailure for every edit a matching question did not apply
+		:param match:   Same as a where dict (e.g. type=Numeric, round=None)
+
+		:return: Questions that were edited
+		"""
+		if isinstance(where, dict):
+			match = {**where, **match}
+			where = None
+		predicate = _predicate(where, match)
+		edits = list((values or {}).items())
+
+		edited = []
+		for question in self.questions:
+			if not predicate(question):
+				continue
+			journal = question.__dict__.get("_journal")
+			with instance_lock(question), question.muted(), (journal.step() if journal is not None else _nothing()):
+				success = False
+				for attr, x in edits:
+					try:
+						# Discord editors return an embed, muted they return their success
+						applied, error = bool(_editor(question, attr)(question, x)), None
+					except (TypeError, ValueError, AttributeError) as e:
+						# Value (or call) the question's editor does not accept
+						applied, error = False, e
+					success |= applied
+					if (not applied) and (failures is not None):
+						failures.append(UpdateFailure(question, attr, x, error))
+			if success:
+				edited.append(question)
+
+		self.updated(edited)
+		return edited
 
 	def edit_name(self, x: str) -> bool:
 		"""
@@ -335,3 +543,72 @@ class QuizBase(EditableBase):
 
 		"""
 		return self._edit_type(new=x)
+
+
+class UpdateFailure(NamedTuple):
+	question: QuestionBase
+	attr: str
+	value: Any
+	# What the editor raised, None if it returned False or the question has no such attribute
+	error: Optional[Exception] = None
+
+
+@contextmanager
+def _nothing():
+	yield
+
+
+def _predicate(where: Optional[Callable], match: Dict[str, Any]) -> Callable:
+	"""
+	Compiles a where clause into one predicate taking a question
+
+	"""
+	checks: List[Callable] = []
+	if "type" in match:
+		types = match.pop("type")
+		checks.append(lambda q: isinstance(q, types))
+	for attr, value in match.items():
+		if callable(value):
+			checks.append(lambda q, attr=attr, f=value: f(q.__dict__.get(attr)))
+		else:
+			checks.append(lambda q, attr=attr, value=value: q.__dict__.get(attr) == value)
+	if where is not None:
+		checks.append(where)
+
+	if not checks:
+		return lambda q: True
+	elif len(checks) == 1:
+		return checks[0]
+	return lambda q: all(check(q) for check in checks)
+
+
+_editors: Dict[Tuple[type, str], Optional[Callable]] = {}
+_typed_editors = ((bool, "_edit_boolean"), (str, "_edit_string"), ((int, float), "_edit_number"))
+
+
+def _editor(question: EditableBase, attr: str) -> Callable:
+	"""
+	Returns f(question, x) that edits question's attribute through its editor.
+	The public edit_<attr> method and the name of its value parameter (e.g. Q for edit_type) are resolved once per class.
+
+	"""
+	key = question.__class__, attr
+	if key not in _editors:
+		method = getattr(question.__class__, f"edit_{attr}", None)
+		if callable(method):
+			name = list(inspect.signature(method).parameters)[1]
+			_editors[key] = lambda q, x, method=method, name=name: method(q, **{name: x})
+		else:
+			_editors[key] = None
+	editor = _editors[key]
+	if editor is not None:
+		return editor
+
+	if attr not in question.__dict__:
+		# Bulk edits do not add attributes a question type lacks
+		return lambda q, x: False
+	current = question.__dict__[attr]
+	for types, name in _typed_editors:
+		if isinstance(current, types):
+			return lambda q, x, name=name: getattr(q, name)(attr=attr, x=x)
+	return lambda q, x: q._edit_arbitrary(attr=attr, x=x)
@@ -0,0 +1,138 @@
+"""
+
+Opt-in concurrent editing: striped locks for writers, copy-on-write snapshots for readers
+
+"""
+from typing import Callable, Dict
+import functools
+import threading
+import copy
+import re
+
+from professor.core.wraps import instance_lock
+
+
+def _writer(f: Callable) -> Callable:
+	"""
+	Runs an editor under the object's lock and publishes a snapshot once the outermost editor returns
+
+	"""
+	# Keeps the markers of wrappers already applied (e.g. on_change), so they aren't applied twice
+	@functools.wraps(f)
+	def wrap(self, *args, **kwargs):
+		with instance_lock(self):
+			_, depth = self.__dict__.get("_writing", (None, 0))
+			self.__dict__["_writing"] = threading.get_ident(), depth + 1
+			try:
+				return f(self, *args, **kwargs)
+			finally:
+				if depth:
+					self.__dict__["_writing"] = threading.get_ident(), depth
+				else:
+					self.__dict__.pop("_writing", None)
+					self._publish()
+	wrap.__concurrent__ = True
+	return wrap
+
+
+def _reader(f: Callable, name: str) -> Callable:
+	"""
+	Runs a reader on the last published snapshot, without locking. Inside an edit, the editing thread
+	reads its working state instead. The snapshot's own class provides the reader, so a snapshot taken
+	before a type change is never read by the new type's method.
+
+	"""
+	@functools.wraps(f)
+	def wrap(self, *args, **kwargs):
+		d = self.__dict__
+		published = d.get("_published")
+		if (published is None) or (("_writing" in d) and (d["_writing"][0] == threading.get_ident())):
+			return f(self, *args, **kwargs)
+		if published.__class__ is self.__class__:
+			return f(published, *args, **kwargs)
+		return getattr(published.__class__, name)(published, *args, **kwargs)
+	wrap.__concurrent__ = True
+	return wrap
+
+
+class Concurrent(object):
+
+	writer_pattern = re.compile(r"^_?((add_)|(clear_)|(delete_)|(edit_)|(insert_))")
+	readers = ("check", "score", "grader", "precision", "user_embed", "editor_embed", "_base_embed")
+
+	__doc__ = """
+	Mixin that makes an EditableBase safe to edit from several threads. Place it first in the bases,
+	or use concurrent(cls).
+
+	Editors take the object's striped lock and edit a private working state. When the outermost editor returns,
+	the state is published as a snapshot in one atomic store, which covers type changes too. Arrays the snapshot
+	shares are copied on their next write. Readers (check and the embed renderers) run on the snapshot
+	and never take a lock.
+	"""
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		for attr in dir(cls):
+			value = getattr(cls, attr)
+			if not callable(value) or isinstance(value, type) or getattr(value, "__concurrent__", False):
+				continue
+			if attr in cls.readers:
+				setattr(cls, attr, _reader(value, attr))
+			elif cls.writer_pattern.match(attr) is not None:
+				setattr(cls, attr, _writer(value))
+
+	def __init__(self, *args, **kwargs):
+		super(Concurrent, self).__init__(*args, **kwargs)
+		self._publish()
+
+	def snapshot(self):
+		"""
+		Returns the last published state as an object of the same class. It must not be edited.
+
+		"""
+		return self.__dict__.get("_published", self)
+
+	def _edit_type(self, new: type, *args, **kwargs) -> bool:
+		# Converted objects stay concurrent
+		return super(Concurrent, self)._edit_type(concurrent(new), *args, **kwargs)
+
+	def _writable(self, attr: str):
+		shared = self.__dict__.get("_shared")
+		if shared and (attr in shared):
+			shared.discard(attr)
+			arr = self.__dict__[attr]
+			own = self.__dict__[attr] = copy.copy(arr)
+			# Same contents, so the index only needs to follow the copy
+			index = self.__dict__.get("_indexes", {}).get(attr)
+			if (index is not None) and (index.arr is arr):
+				index.arr = own
+			return own
+		return self.__dict__[attr]
+
+	def _publish(self):
+		transient = self.transient
+		state = {k: v for k, v in self.__dict__.items() if k not in transient}
+		published = self.__class__.__new__(self.__class__)
+		published.__dict__ = state
+		self.__dict__["_shared"] = {k for k, v in state.items() if isinstance(v, (list, dict, set))}
+		self.__dict__["_published"] = published
+
+
+_classes: Dict[type, type] = {}
+_classes_lock = threading.Lock()
+
+
+def concurrent(cls: type) -> type:
+	"""
+	Returns the concurrent version of a question (or quiz) class
+
+	"""
+	if issubclass(cls, Concurrent):
+		return cls
+	found = _classes.get(cls)
+	if found is None:
+		with _classes_lock:
+			found = _classes.get(cls)
+			if found is None:
+				found = _classes[cls] = type(cls)(f"Concurrent{cls.__name__}", (Concurrent, cls), {})
+	return found
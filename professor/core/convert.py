@@ -0,0 +1,128 @@
+"""
+
+Planned type conversions between question (or quiz) classes
+
+"""
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import threading
+import copy
+
+from professor.core.journal import state
+
+_immutable = (str, bytes, int, float, bool, type(None), tuple, frozenset)
+
+
+class ConversionResult(NamedTuple):
+	question: Any
+	source: type
+	success: bool
+	error: Optional[Exception] = None
+
+
+class ConversionPlan(object):
+
+	def __init__(self, source: type, target: type):
+		"""
+		Everything needed to convert a source instance to the target type that does not depend on the instance.
+		The target's default attributes are taken once from a prototype instance.
+
+		:param source:  Class converted from
+		:param target:  Class converted to
+
+		"""
+		self.source: type = source
+		self.target: type = target
+		prototype = target()
+		self.defaults: Dict[str, Any] = {k: v for k, v in prototype.__dict__.items() if k not in target.transient}
+		# Defaults are shared by every conversion, so mutable ones are copied for each instance
+		self.mutable: FrozenSet[str] = frozenset(k for k, v in self.defaults.items() if not isinstance(v, _immutable))
+		# Attributes taken from the instance when it has them
+		self.carry: FrozenSet[str] = frozenset(self.defaults).difference(source.no_carryover)
+		# Type-specific coercion, run once the attributes are in place
+		self.build: Callable = target.build
+
+	def apply(self, inst: object, **kwargs) -> bool:
+		"""
+		Converts inst in place. On failure inst is left as it was and the exception is raised.
+
+		:param kwargs:  Attributes to set on the converted instance, as if passed to the target's constructor
+
+		"""
+		old = inst.__dict__
+		d = {}
+		for k, v in self.defaults.items():
+			if (k in self.carry) and (k in old) and (k not in kwargs):
+				# build may edit carried containers in place, so take them through _writable: concurrent objects
+				# copy the ones their published snapshot shares
+				d[k] = old[k] if isinstance(old[k], _immutable) else inst._writable(k)
+			elif k in self.mutable:
+				d[k] = copy.copy(v)
+			else:
+				d[k] = v
+		d.update(kwargs)
+
+		for k in inst.transient:
+			# Bookkeeping follows the object, except what was derived from attributes it no longer holds
+			if (k in old) & (k not in inst.derived):
+				d[k] = old[k]
+		journal = old.get("_journal")
+		if journal is not None:
+			# The conversion is journaled as a whole, build's own edits are part of it
+			before = inst.__class__, state(inst)
+
+		cls = inst.__class__
+		inst.__dict__ = d
+		inst.__class__ = self.target
+		try:
+			if journal is None:
+				self.build(inst)
+			else:
+				with journal.paused():
+					self.build(inst)
+		except Exception:
+			inst.__class__ = cls
+			inst.__dict__ = old
+			raise
+		if journal is not None:
+			journal.record(("__class__", "type", None, before, (self.target, state(inst))))
+		return True
+
+
+_plans: Dict[Tuple[type, type], ConversionPlan] = {}
+_plans_lock = threading.Lock()
+
+
+def plan(source: type, target: type) -> ConversionPlan:
+	"""
+	Returns the cached conversion plan between two classes
+
+	"""
+	key = source, target
+	found = _plans.get(key)
+	if found is None:
+		with _plans_lock:
+			found = _plans.get(key)
+			if found is None:
+				found = _plans[key] = ConversionPlan(source, target)
+	return found
+
+
+def convert_type(questions: Iterable[Any], target: type, **kwargs) -> List[ConversionResult]:
+	"""
+	Converts every question to the target type in one pass. Questions that fail to convert are left unchanged.
+
+	:param questions:   Questions (or quizzes) to convert
+	:param target:      Class to convert to
+	:param kwargs:      Attributes to set on every converted question
+
+	:return: One result per question, in order
+	"""
+	results = []
+	for question in questions:
+		source = question.__class__
+		try:
+			plan(source, target).apply(question, **{k: copy.copy(v) for k, v in kwargs.items()})
+			results.append(ConversionResult(question, source, True))
+		except Exception as e:
+			results.append(ConversionResult(question, source, False, e))
+	return results
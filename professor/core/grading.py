@@ -0,0 +1,304 @@
+"""
+
+Offline grading of saved responses with a process pool
+
+"""
+from typing import Any, Callable, Dict, Hashable, IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+import json
+import time
+import csv
+import os
+
+from professor.core.base import QuestionBase, QuizBase
+
+# Columns of a response file, in order when it is a CSV file
+FIELDS = ("quiz", "question", "player", "response")
+
+
+class Response(NamedTuple):
+	quiz: Union[int, str]
+	question: Union[int, str]
+	player: str
+	response: Any
+
+
+class Result(NamedTuple):
+	# File the response was read from, as given to grade
+	source: str
+	# Position of the response in its file
+	row: int
+	# quiz, question and player are None if the record could not be read
+	quiz: Optional[Union[int, str]]
+	question: Optional[Union[int, str]]
+	player: Optional[str]
+	# None if the response could not be graded
+	correct: Optional[bool]
+	error: Optional[str] = None
+
+
+class Progress(NamedTuple):
+	read: int
+	graded: int
+	errors: int
+	elapsed: float
+
+	@property
+	def rate(self) -> float:
+		"""
+		Responses graded per second
+
+		"""
+		return self.graded / self.elapsed if self.elapsed else 0.0
+
+
+def read_responses(path: Union[str, Path], chunk_size: int = 10000) -> Iterator[List[Tuple[int, Union[Response, str]]]]:
+	"""
+	Streams a response file in chunks of (row, Response). JSON lines files (.jsonl, .ndjson) hold one object
+	per line with the FIELDS as keys. Other files are read as CSV with the FIELDS as columns, and an optional header.
+	A record that can't be read has a message saying why in place of its Response, so one bad record doesn't
+	stop the file.
+
+	"""
+	path = Path(path)
+	with open(path, newline="", encoding="utf-8") as f:
+		if path.suffix in (".jsonl", ".ndjson"):
+			rows = (_json_response(line) for line in f if line.strip())
+		else:
+			rows = _csv_responses(f)
+
+		chunk = []
+		for row, response in enumerate(rows):
+			chunk.append((row, response))
+			if len(chunk) >= chunk_size:
+				yield chunk
+				chunk = []
+		if chunk:
+			yield chunk
+
+
+def _json_response(line: str) -> Union[Response, str]:
+	try:
+		row = json.loads(line)
+		return Response(*(row[field] for field in FIELDS))
+	except (ValueError, KeyError, TypeError) as e:
+		return f"malformed record: {type(e).__name__}: {e}"
+
+
+def _csv_responses(f: IO[str]) -> Iterator[Union[Response, str]]:
+	reader = csv.reader(f)
+	while True:
+		try:
+			row = next(reader)
+		except StopIteration:
+			return
+		except csv.Error as e:
+			# The reader carries on with the next record
+			yield f"malformed record: {e}"
+			continue
+		if tuple(row) == FIELDS:
+			continue
+		if len(row) != len(FIELDS):
+			yield f"malformed record: {len(row)} fields instead of {len(FIELDS)}"
+		else:
+			yield Response(*row)
+
+
+def malformed(chunk: List[Tuple[int, Union[Response, str]]], source: str = "") -> List[Result]:
+	"""
+	Results of a chunk's records that could not be read. They count as grading errors.
+
+	"""
+	return [Result(source, row, None, None, None, None, r) for row, r in chunk if isinstance(r, str)]
+
+
+def index_questions(quizzes: Dict[Any, QuizBase]) -> Dict[Tuple[str, str], QuestionBase]:
+	"""
+	Questions keyed by (quiz id, question id) as strings, since CSV files hold ids as text
+
+	"""
+	return {(str(quiz_id), str(question.id)): question for quiz_id, quiz in quizzes.items() for question in quiz.questions}
+
+
+def group_responses(chunk: List[Tuple[int, Union[Response, str]]]) -> Dict[Tuple[str, str], List[Tuple[int, str, Any]]]:
+	"""
+	Groups a chunk's responses by question. Records that could not be read are left out (see malformed).
+
+	:return: (quiz id, question id) -> [(row, player, response)]
+	"""
+	groups = {}
+	for row, r in chunk:
+		if isinstance(r, str):
+			continue
+		groups.setdefault((str(r.quiz), str(r.question)), []).append((row, r.player, r.response))
+	return groups
+
+
+def _hashable(x: Any) -> Hashable:
+	if isinstance(x, list):
+		return tuple(_hashable(v) for v in x)
+	elif isinstance(x, dict):
+		return tuple(sorted((k, _hashable(v)) for k, v in x.items()))
+	return x
+
+
+def grade_group(
+		question: Optional[QuestionBase],
+		quiz: str,
+		question_id: str,
+		rows: List[Tuple[int, str, Any]],
+		source: str = ""
+) -> List[Result]:
+	"""
+	Grades one question's responses. The question's grader is set up once, and a response already seen in
+	the group reuses its verdict.
+
+	:param source:  File the responses were read from
+
+	"""
+	if question is None:
+		return [Result(source, row, quiz, question_id, player, None, "unknown question") for row, player, _ in rows]
+	grader = question.grader()
+	verdicts: Dict[Hashable, Tuple[Optional[bool], Optional[str]]] = {}
+	results = []
+	for row, player, response in rows:
+		key = _hashable(response)
+		verdict = verdicts.get(key)
+		if verdict is None:
+			try:
+				verdict = bool(grader(response)), None
+			except Exception as e:
+				verdict = None, f"{type(e).__name__}: {e}"
+			verdicts[key] = verdict
+		results.append(Result(source, row, quiz, question_id, player, *verdict))
+	return results
+
+
+# Questions of the worker process, set once by _init_worker
+_questions: Dict[Tuple[str, str], QuestionBase] = {}
+
+
+def _init_worker(quizzes: Dict[Any, QuizBase]):
+	global _questions
+	_questions = index_questions(quizzes)
+
+
+def _grade(groups: Dict[Tuple[str, str], List[Tuple[int, str, Any]]], source: str = "") -> List[Result]:
+	"""
+	Grades a chunk's groups in a worker process
+
+	"""
+	results = []
+	for (quiz, question_id), rows in groups.items():
+		results.extend(grade_group(_questions.get((quiz, question_id)), quiz, question_id, rows, source))
+	return results
+
+
+class ResultWriter(object):
+
+	def __init__(self, path: Union[str, Path, IO[str]]):
+		"""
+		Appends results to a file as they arrive: JSON lines for .jsonl and .ndjson files, CSV otherwise
+
+		:param path:    File path, or a text file object (written as JSON lines)
+
+		"""
+		if isinstance(path, (str, Path)):
+			self.file: IO[str] = open(path, "w", newline="", encoding="utf-8")
+			self.owned: bool = True
+			self.csv: bool = Path(path).suffix not in (".jsonl", ".ndjson")
+		else:
+			self.file = path
+			self.owned = False
+			self.csv = False
+		self.writer = csv.writer(self.file) if self.csv else None
+		if self.writer is not None:
+			self.writer.writerow(Result._fields)
+
+	def __call__(self, results: List[Result]):
+		if self.writer is not None:
+			self.writer.writerows(results)
+		else:
+			self.file.writelines(json.dumps(r._asdict()) + "\n" for r in results)
+
+	def __enter__(self) -> "ResultWriter":
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		if self.owned:
+			self.file.close()
+		else:
+			self.file.flush()
+
+
+def grade(
+		paths: Iterable[Union[str, Path]],
+		quizzes: Dict[Any, QuizBase],
+		sink: Callable[[List[Result]], None],
+		workers: Optional[int] = None,
+		chunk_size: int = 10000,
+		progress: Optional[Callable[[Progress], None]] = None,
+		interval: float = 5.0
+) -> Progress:
+	"""
+	Grades every response in the files and passes the results to the sink, one chunk at a time.
+	Within a chunk, results are grouped by question rather than in file order (Result.source and Result.row
+	give the file and the position in it).
+
+	Records that can't be read are passed to the sink as results with an error, like responses that can't be graded.
+
+	Each worker process receives the quizzes once, when it starts. Files are read chunk by chunk and at most
+	two chunks per worker are in flight, so memory stays bounded whatever the size of the files.
+
+	:param paths:       Response files (see read_responses)
+	:param quizzes:     Quiz id -> QuizBase
+	:param sink:        Called with each batch of results, e.g. a ResultWriter
+	:param workers:     Worker processes (os.cpu_count() by default). 0 grades in this process.
+	:param chunk_size:  Responses read at once
+	:param progress:    Called every interval seconds, and once at the end
+	:param interval:    Seconds between progress calls
+
+	"""
+	start = time.monotonic()
+	read = graded = errors = 0
+	last = start
+
+	def done(results: List[Result]):
+		nonlocal graded, errors, last
+		sink(results)
+		graded += len(results)
+		errors += sum(r.correct is None for r in results)
+		if (progress is not None) and (time.monotonic() - last >= interval):
+			last = time.monotonic()
+			progress(Progress(read, graded, errors, last - start))
+
+	chunks = ((str(path), chunk) for path in paths for chunk in read_responses(path, chunk_size))
+	if workers == 0:
+		_init_worker(quizzes)
+		for source, chunk in chunks:
+			read += len(chunk)
+			done(malformed(chunk, source) + _grade(group_responses(chunk), source))
+	else:
+		workers = workers or os.cpu_count() or 1
+		with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(quizzes,)) as pool:
+			# Chunks in flight, oldest first
+			pending: List[Future] = []
+			for source, chunk in chunks:
+				read += len(chunk)
+				bad = malformed(chunk, source)
+				if bad:
+					done(bad)
+				pending.append(pool.submit(_grade, group_responses(chunk), source))
+				while len(pending) > 2 * workers:
+					done(pending.pop(0).result())
+			for future in pending:
+				done(future.result())
+
+	result = Progress(read, graded, errors, time.monotonic() - start)
+	if progress is not None:
+		progress(result)
+	return result
@@ -0,0 +1,554 @@
+"""
+
+Hosting quiz sessions across worker processes, each owning a shard of the sessions
+
+"""
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+from concurrent.futures import Future
+import multiprocessing
+import threading
+import itertools
+import hashlib
+import bisect
+import random
+import signal
+import pickle
+import queue
+import gc
+import os
+
+from professor.core.base import QuestionBase, QuizBase
+from professor.core.leaderboard import Leaderboard, Standing
+
+
+def _hash(x: Any) -> int:
+	"""
+	Hash that is the same in every process (the built-in hash of strings is salted per process)
+
+	"""
+	return int.from_bytes(hashlib.blake2b(repr(x).encode(), digest_size=8).digest(), "big")
+
+
+class HashRing(object):
+
+	def __init__(self, nodes: Iterable[Hashable] = (), replicas: int = 64):
+		"""
+		Consistent hashing of keys to nodes. Each node is placed at several points of the ring and a key belongs
+		to the node of the first point after it, so adding or removing a node only moves the keys next to its points.
+
+		:param nodes:       Initial nodes
+		:param replicas:    Points per node. More points spread keys more evenly
+
+		"""
+		self.replicas: int = replicas
+		self.nodes: List[Hashable] = []
+		self._points: List[int] = []
+		self._owners: List[Hashable] = []
+		for node in nodes:
+			self.add(node)
+
+	def __len__(self) -> int:
+		return len(self.nodes)
+
+	def __contains__(self, node: Hashable) -> bool:
+		return node in self.nodes
+
+	def add(self, node: Hashable):
+		if node in self.nodes:
+			return
+		self.nodes.append(node)
+		for k in range(self.replicas):
+			point = _hash((node, k))
+			i = bisect.bisect(self._points, point)
+			self._points.insert(i, point)
+			self._owners.insert(i, node)
+
+	def remove(self, node: Hashable):
+		if node not in self.nodes:
+			return
+		self.nodes.remove(node)
+		kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+		self._points = [point for point, _ in kept]
+		self._owners = [owner for _, owner in kept]
+
+	def node(self, key: Hashable) -> Hashable:
+		"""
+		The node owning a key
+
+		:raises LookupError: If the ring has no nodes
+		"""
+		if not self._points:
+			raise LookupError("The ring has no nodes")
+		i = bisect.bisect(self._points, _hash(key))
+		return self._owners[i % len(self._owners)]
+
+
+class SessionState(NamedTuple):
+	quiz: Hashable
+	seed: int
+	# Index of the current question in the session
+	position: int
+	leaderboard: List[Tuple[Hashable, float, float]]
+	# Players who answered the current question
+	answered: Tuple[Hashable, ...]
+
+
+class Session(object):
+
+	def __init__(self, quiz: QuizBase, quiz_id: Hashable, seed: int, state: Optional[SessionState] = None):
+		"""
+		A quiz being administered. The questions come from quiz.session(seed), so a session is restored from
+		its SessionState by replaying the seed up to the current question.
+
+		:param quiz:        The quiz
+		:param quiz_id:     Key of the quiz in its host
+		:param seed:        Seed of the sample and of template variants
+		:param state:       State to resume from. A new session starts at the first question
+
+		"""
+		self.quiz_id: Hashable = quiz_id
+		self.seed: int = seed
+		self.position: int = -1
+		self.question: Optional[QuestionBase] = None
+		self.leaderboard: Leaderboard = Leaderboard(state.leaderboard if state is not None else ())
+		self.answered: set = set()
+		self._questions = quiz.session(seed)
+		self._grader: Optional[Callable[[Any], bool]] = None
+		for _ in range((state.position if state is not None else 0) + 1):
+			self.advance()
+		if state is not None:
+			self.answered = set(state.answered)
+
+	def advance(self) -> Optional[QuestionBase]:
+		"""
+		Moves to the next question
+
+		:return: The question or None if the session is over
+		"""
+		self.question = next(self._questions, None)
+		self.position += 1
+		self.answered = set()
+		self._grader = self.question.grader() if self.question is not None else None
+		return self.question
+
+	def answer(self, player: Hashable, response: Any, time: float = 0.0) -> Optional[bool]:
+		"""
+		Grades a player's response to the current question and records it on the leaderboard
+
+		:return: Whether the response is correct, None if the player already answered or the session is over
+		"""
+		if (self._grader is None) or (player in self.answered):
+			return None
+		correct = bool(self._grader(response))
+		self.answered.add(player)
+		self.leaderboard.record(player, correct, time)
+		return correct
+
+	def state(self) -> SessionState:
+		return SessionState(self.quiz_id, self.seed, self.position, self.leaderboard.entries(), tuple(self.answered))
+
+
+class _Record(object):
+
+	__slots__ = ("quiz", "seed", "position", "leaderboard", "answered")
+
+	def __init__(self, quiz: Hashable, seed: int):
+		"""
+		The host's copy of a session's state. It is kept up to date from the requests and their results,
+		so workers never send their sessions back.
+
+		"""
+		self.quiz: Hashable = quiz
+		self.seed: int = seed
+		self.position: int = 0
+		self.leaderboard: Leaderboard = Leaderboard()
+		self.answered: set = set()
+
+	def state(self) -> SessionState:
+		return SessionState(self.quiz, self.seed, self.position, self.leaderboard.entries(), tuple(self.answered))
+
+
+def describe(question: QuestionBase) -> Dict[str, Any]:
+	"""
+	Default rendering of a session's question
+
+	"""
+	return {"id": question.id, "name": question.name, "text": question.text}
+
+
+class Shard(object):
+
+	def __init__(self, quizzes: Dict[Hashable, QuizBase], render: Optional[Callable[[QuestionBase], Any]] = None):
+		"""
+		The sessions owned by one worker
+
+		:param quizzes: Quiz id -> QuizBase, only read
+		:param render:  Turns a session's question into what is sent back to the router, e.g.
+		                professor.discord.broadcast.Broadcast.render for embed dictionaries. Defaults to describe.
+		                It runs in the worker, so it must be picklable (a module-level function)
+
+		"""
+		self.quizzes: Dict[Hashable, QuizBase] = quizzes
+		self.render: Callable[[QuestionBase], Any] = render if render is not None else describe
+		self.sessions: Dict[Hashable, Session] = {}
+
+	def view(self, session: Session) -> Any:
+		return self.render(session.question) if session.question is not None else None
+
+	def begin(self, key: Hashable, quiz: Hashable, seed: Optional[int] = None) -> Any:
+		"""
+		Starts a session, replacing the key's previous session if any
+
+		:return: The first question, rendered
+		"""
+		session = self.sessions[key] = Session(self.quizzes[quiz], quiz, seed if seed is not None else random.getrandbits(64))
+		return self.view(session)
+
+	def answer(self, key: Hashable, player: Hashable, response: Any, time: float = 0.0) -> Optional[bool]:
+		return self.sessions[key].answer(player, response, time)
+
+	def advance(self, key: Hashable) -> Any:
+		"""
+		:return: The next question rendered, None if the session is over
+		"""
+		session = self.sessions[key]
+		session.advance()
+		return self.view(session)
+
+	def end(self, key: Hashable) -> List[Standing]:
+		"""
+		Ends a session
+
+		:return: Its final standings
+		"""
+		return list(self.sessions.pop(key).leaderboard)
+
+	def restore(self, key: Hashable, state: SessionState):
+		self.sessions[key] = Session(self.quizzes[state.quiz], state.quiz, state.seed, state)
+
+	def state(self, key: Hashable) -> Optional[SessionState]:
+		session = self.sessions.get(key)
+		return session.state() if session is not None else None
+
+
+class WorkerError(Exception):
+	"""
+	Raised in place of an exception a worker could not send back, e.g. one holding a lock. Its message is the
+	original's type name and repr.
+
+	"""
+	pass
+
+
+def _portable(e: Exception) -> Exception:
+	"""
+	The exception itself if it survives pickling, otherwise a WorkerError describing it
+
+	"""
+	try:
+		pickle.loads(pickle.dumps(e, pickle.HIGHEST_PROTOCOL))
+		return e
+	except Exception:
+		return WorkerError(f"{type(e).__name__}: {e!r}")
+
+
+def _dumps(replies: List[Tuple[Optional[int], bool, Any]]) -> bytes:
+	"""
+	Pickles a batch of replies. A value that can't be pickled fails its own request with a WorkerError,
+	rather than the batch being lost and its futures never resolved.
+
+	"""
+	try:
+		return pickle.dumps(replies, pickle.HIGHEST_PROTOCOL)
+	except Exception:
+		portable = []
+		for rid, ok, value in replies:
+			try:
+				pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+				portable.append((rid, ok, value))
+			except Exception as e:
+				portable.append((rid, False, WorkerError(f"The result could not be sent: {type(e).__name__}: {e}")))
+		return pickle.dumps(portable, pickle.HIGHEST_PROTOCOL)
+
+
+# Most requests a worker serves before replying
+BATCH = 256
+
+
+def _serve(slot: int, quizzes: Dict[Hashable, QuizBase], render: Optional[Callable], inbox, outbox):
+	"""
+	Worker process loop. Requests are (request id, operation, key, args) and are answered with
+	(request id, ok, value or exception). The requests waiting in the inbox are served together and answered
+	in one message, pickled by the worker so a reply that can't be sent is caught here (see _dumps).
+
+	"""
+	# Interrupts are handled by the host, which closes the workers
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	shard = Shard(quizzes, render)
+	running = True
+	while running:
+		messages = [inbox.get()]
+		try:
+			while len(messages) < BATCH:
+				messages.append(inbox.get_nowait())
+		except queue.Empty:
+			pass
+		replies = []
+		for message in messages:
+			if message is None:
+				running = False
+				break
+			rid, op, key, args = message
+			try:
+				replies.append((rid, True, getattr(shard, op)(key, *args)))
+			except Exception as e:
+				replies.append((rid, False, _portable(e)))
+		outbox.put(_dumps(replies))
+
+
+class ShardHost(object):
+
+	def __init__(
+			self,
+			quizzes: Dict[Hashable, QuizBase],
+			workers: Optional[int] = None,
+			render: Optional[Callable[[QuestionBase], Any]] = None,
+			replicas: int = 64
+	):
+		"""
+		Runs quiz sessions in worker processes, so grading and rendering use every core. Sessions are assigned to
+		workers by consistent hashing of their key (e.g. a guild or channel id), and every request for a session
+		goes to the worker owning it. Requests return concurrent.futures.Future (use asyncio.wrap_future in a bot).
+
+		Workers receive the quizzes when they start. With the fork start method they share the parent's copy
+		read-only, without pickling. The host follows the state of every session from the results of its requests,
+		and a worker that exits is restarted with the sessions of its shard. Requests in flight to it fail
+		with RuntimeError. Exceptions raised in a worker are raised by the request's future, as WorkerError if
+		they can't be pickled.
+
+		:param quizzes:     Quiz id -> QuizBase. Don't edit them while the host is open, workers keep their copy
+		:param workers:     Worker processes (os.cpu_count() by default). 0 runs the sessions in this process.
+		:param render:      See Shard
+		:param replicas:    Points per worker on the hash ring
+
+		"""
+		self.quizzes: Dict[Hashable, QuizBase] = quizzes
+		self.workers: int = workers if workers is not None else (os.cpu_count() or 1)
+		self.render: Optional[Callable[[QuestionBase], Any]] = render
+		self.ring: HashRing = HashRing(range(max(self.workers, 1)), replicas)
+		self._records: Dict[Hashable, _Record] = {}
+		self.restarts: int = 0
+		self._context = multiprocessing.get_context()
+		self._processes: List[Optional[multiprocessing.Process]] = [None] * self.workers
+		self._inboxes: List[Any] = [None] * self.workers
+		self._outbox = None
+		# Request id -> (slot, future, operation, key, args)
+		self._pending: Dict[int, Tuple[int, Future, str, Hashable, tuple]] = {}
+		self._ids = itertools.count()
+		self._lock = threading.Lock()
+		self._collector: Optional[threading.Thread] = None
+		self._local: Optional[Shard] = None
+		self._open: bool = False
+
+	def __enter__(self) -> "ShardHost":
+		self.open()
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def open(self):
+		"""
+		Starts the workers
+
+		"""
+		if self._open:
+			return
+		self._open = True
+		if self.workers == 0:
+			self._local = Shard(self.quizzes, self.render)
+			return
+		self._outbox = self._context.Queue()
+		for slot in range(self.workers):
+			self._spawn(slot)
+		self._collector = threading.Thread(target=self._collect, name="shard-host-collector", daemon=True)
+		self._collector.start()
+
+	def close(self, timeout: float = 5.0):
+		"""
+		Stops the workers once they have answered their requests
+
+		"""
+		if not self._open:
+			return
+		self._open = False
+		if self._local is not None:
+			self._local = None
+			return
+		for inbox in self._inboxes:
+			inbox.put(None)
+		for process in self._processes:
+			process.join(timeout)
+			if process.is_alive():
+				process.terminate()
+		self._outbox.put(None)
+		self._collector.join(timeout)
+		with self._lock:
+			for _, future, *_ in self._pending.values():
+				future.set_exception(RuntimeError("The host was closed"))
+			self._pending.clear()
+
+	def shard(self, key: Hashable) -> int:
+		"""
+		The worker owning a session key
+
+		"""
+		return self.ring.node(key)
+
+	def state(self, key: Hashable) -> Optional[SessionState]:
+		"""
+		A session's state as of its last completed request, None if there is no session for the key
+
+		"""
+		if self._local is not None:
+			return self._local.state(key)
+		with self._lock:
+			record = self._records.get(key)
+			return record.state() if record is not None else None
+
+	def begin(self, key: Hashable, quiz: Hashable, seed: Optional[int] = None) -> Future:
+		"""
+		Starts a session for the key (see Shard.begin)
+
+		"""
+		# Chosen here so the host can restore the session
+		return self._submit("begin", key, quiz, seed if seed is not None else random.getrandbits(64))
+
+	def answer(self, key: Hashable, player: Hashable, response: Any, time: float = 0.0) -> Future:
+		"""
+		Grades a player's response (see Session.answer)
+
+		"""
+		return self._submit("answer", key, player, response, time)
+
+	def advance(self, key: Hashable) -> Future:
+		"""
+		Moves a session to its next question (see Shard.advance)
+
+		"""
+		return self._submit("advance", key)
+
+	def end(self, key: Hashable) -> Future:
+		"""
+		Ends a session (see Shard.end)
+
+		"""
+		return self._submit("end", key)
+
+	def _submit(self, op: str, key: Hashable, *args) -> Future:
+		if not self._open:
+			raise RuntimeError("The host is not open")
+		future = Future()
+		if self._local is not None:
+			try:
+				future.set_result(getattr(self._local, op)(key, *args))
+			except Exception as e:
+				future.set_exception(e)
+			return future
+		slot = self.shard(key)
+		with self._lock:
+			rid = next(self._ids)
+			self._pending[rid] = slot, future, op, key, args
+			self._inboxes[slot].put((rid, op, key, args))
+		return future
+
+	def _spawn(self, slot: int):
+		"""
+		Starts the worker of a slot with a new inbox. Called with the lock held, or before the collector starts.
+
+		"""
+		self._inboxes[slot] = self._context.Queue()
+		process = self._context.Process(
+			target=_serve,
+			args=(slot, self.quizzes, self.render, self._inboxes[slot], self._outbox),
+			name=f"shard-{slot}",
+			daemon=True
+		)
+		forked = self._context.get_start_method() == "fork"
+		if forked:
+			# Keeps the garbage collector from touching the inherited objects, which would copy their pages
+			gc.freeze()
+		try:
+			process.start()
+		finally:
+			if forked:
+				gc.unfreeze()
+		self._processes[slot] = process
+
+	def _restart(self, slot: int):
+		"""
+		Replaces an exited worker, failing its requests in flight and restoring its sessions
+
+		"""
+		with self._lock:
+			lost = [rid for rid, (owner, *_) in self._pending.items() if owner == slot]
+			for rid in lost:
+				self._pending.pop(rid)[1].set_exception(RuntimeError(f"Worker {slot} exited, the request may not have completed"))
+			self._spawn(slot)
+			for key, record in self._records.items():
+				if self.shard(key) == slot:
+					self._inboxes[slot].put((None, "restore", key, (record.state(),)))
+			self.restarts += 1
+
+	def _apply(self, op: str, key: Hashable, args: tuple, value: Any):
+		"""
+		Updates the host's record of a session with a completed request. Called with the lock held.
+
+		"""
+		if op == "begin":
+			self._records[key] = _Record(*args)
+			return
+		record = self._records.get(key)
+		if record is None:
+			return
+		if op == "end":
+			del self._records[key]
+		elif (op == "answer") and (value is not None):
+			player, _, time = args
+			record.leaderboard.record(player, value, time)
+			record.answered.add(player)
+		elif op == "advance":
+			record.position += 1
+			record.answered = set()
+
+	def _collect(self):
+		"""
+		Resolves futures with the workers' replies and restarts workers that exited
+
+		"""
+		while True:
+			try:
+				replies = self._outbox.get(timeout=0.5)
+			except queue.Empty:
+				replies = ()
+			if replies is None:
+				break
+			if replies:
+				replies = pickle.loads(replies)
+			resolved = []
+			with self._lock:
+				for rid, ok, value in replies:
+					_, future, op, key, args = self._pending.pop(rid, (None, None, None, None, None))
+					if ok and (op is not None):
+						self._apply(op, key, args, value)
+					if future is not None:
+						resolved.append((future, ok, value))
+			for future, ok, value in resolved:
+				if ok:
+					future.set_result(value)
+				else:
+					future.set_exception(value)
+			if self._open:
+				for slot, process in enumerate(self._processes):
+					if not process.is_alive():
+						self._restart(slot)
@@ -0,0 +1,145 @@
+"""
+
+Companion hash indexes for list attributes
+
+"""
+from typing import Any, Dict, List, Optional
+from bisect import insort
+
+
+class ListIndex(object):
+
+	def __init__(self, arr: list):
+		"""
+		Maps every value of a list to its ascending positions. Editors report their changes through update so
+		the index follows the list without rescanning it.
+
+		Changes that shift positions (inserts and pops before the end, or replacing the list) mark the index stale,
+		and it is rebuilt on next use. Lists of unhashable values fall back to scanning.
+
+		:param arr: List to index
+
+		"""
+		self.arr: list = arr
+		self.size: int = 0
+		self.stale: bool = False
+		self.positions: Optional[Dict[Any, List[int]]] = None
+		self.rebuild()
+
+	def __contains__(self, x: Any) -> bool:
+		if self.positions is None:
+			return x in self.arr
+		try:
+			return x in self.positions
+		except TypeError:
+			return False
+
+	def rebuild(self):
+		"""
+		Indexes the list from scratch
+
+		"""
+		positions: Dict[Any, List[int]] = {}
+		try:
+			for i, x in enumerate(self.arr):
+				if x in positions:
+					positions[x].append(i)
+				else:
+					positions[x] = [i]
+			self.positions = positions
+		except TypeError:
+			self.positions = None
+		self.size = len(self.arr)
+		self.stale = False
+
+	def valid(self, arr: list) -> bool:
+		"""
+		True if the index still describes arr
+
+		"""
+		return (arr is self.arr) and (len(arr) == self.size) and not self.stale
+
+	def first(self, x: Any) -> Optional[int]:
+		"""
+		Position of the first occurrence of x, or None if absent
+
+		"""
+		if self.positions is None:
+			return self.arr.index(x) if x in self.arr else None
+		try:
+			found = self.positions.get(x)
+		except TypeError:
+			return None
+		return found[0] if found else None
+
+	def count(self, x: Any) -> int:
+		"""
+		Number of occurrences of x
+
+		"""
+		if self.positions is None:
+			return self.arr.count(x)
+		try:
+			return len(self.positions.get(x, ()))
+		except TypeError:
+			return 0
+
+	def update(self, op: str, i: Optional[int] = None, old: Any = None, new: Any = None):
+		"""
+		Applies a change made to the list
+
+		:param op:  'append', 'insert', 'set', 'pop' or 'assign'
+		:param i:   Non-negative position of the change
+		:param old: Value removed or overwritten
+		:param new: Value added or written
+
+		"""
+		if self.stale:
+			# Positions are already out of date, the rebuild on next use covers this change too
+			return
+		if op == "assign":
+			self.stale = True
+			return
+		if (op == "insert") & (i == self.size):
+			op = "append"
+
+		if op == "append":
+			self.size += 1
+			if self.positions is not None:
+				self._add(new, i)
+		elif op == "set":
+			if self.positions is not None:
+				self._remove(old, i)
+				self._add(new, i)
+		elif (op == "pop") & (i == self.size - 1):
+			self.size -= 1
+			if self.positions is not None:
+				self._remove(old, i)
+		else:
+			# Every later position shifts, cheaper to rebuild on next use
+			self.stale = True
+
+	def _add(self, x: Any, i: int):
+		try:
+			found = self.positions.get(x)
+			if found is None:
+				self.positions[x] = [i]
+			elif found[-1] < i:
+				found.append(i)
+			else:
+				insort(found, i)
+		except TypeError:
+			self.positions = None
+
+	def _remove(self, x: Any, i: int):
+		try:
+			found = self.positions[x]
+		except (KeyError, TypeError):
+			self.stale = True
+			return
+		if found[-1] == i:
+			found.pop()
+		else:
+			found.remove(i)
+		if not found:
+			del self.positions[x]
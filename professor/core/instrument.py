@@ -0,0 +1,203 @@
+"""
+
+Opt-in instrumentation of editors, checks and embed renders: call counts, errors and latency histograms
+
+Methods are wrapped when their class is created, so instrumentation must be enabled before the question modules
+are imported (call enable() or set PROFESSOR_INSTRUMENT=1). Classes created while it is disabled keep their plain
+functions and pay nothing.
+
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from bisect import bisect_left
+import threading
+import types
+import time
+import os
+import re
+
+# Upper bounds of the latency buckets in nanoseconds: 1us doubling up to ~1s. Slower calls fall in a last +Inf bucket.
+BOUNDS: Tuple[int, ...] = tuple(1000 * 2 ** k for k in range(21))
+
+editor_pattern = re.compile(r"^_?((add_)|(clear_)|(delete_)|(edit_)|(insert_))")
+# Methods instrumented by name, and their kind
+named: Dict[str, str] = {"check": "check", "user_embed": "render", "editor_embed": "render"}
+
+_enabled: bool = os.environ.get("PROFESSOR_INSTRUMENT", "") not in ("", "0")
+_stats: Dict[Tuple[type, str], "Stats"] = {}
+_lock = threading.Lock()
+
+
+class Stats(object):
+
+	__slots__ = ("kind", "calls", "errors", "failures", "total", "buckets")
+
+	def __init__(self, kind: str):
+		"""
+		Counters of one method on one class
+
+		:param kind:    'edit', 'check' or 'render'
+
+		"""
+		self.kind: str = kind
+		self.calls: int = 0
+		# Calls that raised
+		self.errors: int = 0
+		# Editor calls that returned False
+		self.failures: int = 0
+		# Nanoseconds spent in the method
+		self.total: int = 0
+		self.buckets: List[int] = [0] * (len(BOUNDS) + 1)
+
+	def as_dict(self) -> dict:
+		return {
+			"kind": self.kind,
+			"calls": self.calls,
+			"errors": self.errors,
+			"failures": self.failures,
+			"seconds": self.total / 1e9,
+			"buckets": {**{f"{b / 1e9:g}": n for b, n in zip(BOUNDS, self.buckets)}, "+Inf": self.buckets[-1]}
+		}
+
+
+def enable():
+	"""
+	Instruments every EditableBase class created from now on
+
+	"""
+	global _enabled
+	_enabled = True
+
+
+def enabled() -> bool:
+	return _enabled
+
+
+def kind(attr: str) -> Optional[str]:
+	"""
+	Kind of method an attribute name is instrumented as, or None
+
+	"""
+	if attr in named:
+		return named[attr]
+	return "edit" if editor_pattern.match(attr) is not None else None
+
+
+def is_instrumented(f: Callable) -> bool:
+	"""
+	True if f, or a function it wraps, is instrumented
+
+	"""
+	while f is not None:
+		if getattr(f, "__instrumented__", False):
+			return True
+		f = getattr(f, "__wrapped__", None)
+	return False
+
+
+def record(cls: type, name: str, kind: str, elapsed: int, error: bool = False, failed: bool = False):
+	"""
+	Adds a call to a method's counters
+
+	:param elapsed: Nanoseconds the call took
+
+	"""
+	with _lock:
+		stats = _stats.get((cls, name))
+		if stats is None:
+			stats = _stats[cls, name] = Stats(kind)
+		stats.calls += 1
+		stats.errors += error
+		stats.failures += failed
+		stats.total += elapsed
+		stats.buckets[bisect_left(BOUNDS, elapsed)] += 1
+
+
+def instrumented(f: Callable, name: str, kind: str) -> Callable:
+	"""
+	Wraps a method to record its calls under the class of the object it is called on
+
+	"""
+	def wrap(self, *args, **kwargs):
+		start = time.perf_counter_ns()
+		try:
+			result = f(self, *args, **kwargs)
+		except BaseException:
+			record(self.__class__, name, kind, time.perf_counter_ns() - start, error=True)
+			raise
+		record(self.__class__, name, kind, time.perf_counter_ns() - start, failed=(kind == "edit") and (result is False))
+		return result
+
+	wrap.__name__ = f.__name__
+	wrap.__qualname__ = f.__qualname__
+	wrap.__doc__ = f.__doc__
+	wrap.__wrapped__ = f
+	wrap.__instrumented__ = True
+	return wrap
+
+
+def install(cls: type):
+	"""
+	Instruments a class's editors, checks and renders, unless instrumentation is disabled.
+	Called by EditableBase.__init_subclass__. Methods instrumented in a base class are not wrapped again.
+
+	"""
+	if not _enabled:
+		return
+	seen = set()
+	for klass in cls.__mro__:
+		for attr, value in vars(klass).items():
+			if attr in seen:
+				continue
+			seen.add(attr)
+			k = kind(attr)
+			if (k is not None) and isinstance(value, types.FunctionType) and not is_instrumented(value):
+				setattr(cls, attr, instrumented(value, attr, k))
+
+
+def snapshot() -> Dict[str, dict]:
+	"""
+	Counters of every instrumented method that was called, keyed by '<module>.<class>.<method>'
+
+	"""
+	with _lock:
+		return {
+			f"{cls.__module__}.{cls.__qualname__}.{name}": stats.as_dict()
+			for (cls, name), stats in sorted(_stats.items(), key=lambda item: (item[0][0].__module__, item[0][0].__qualname__, item[0][1]))
+		}
+
+
+def reset():
+	"""
+	Clears every counter
+
+	"""
+	with _lock:
+		_stats.clear()
+
+
+def prometheus(prefix: str = "professor") -> str:
+	"""
+	Counters in the Prometheus text exposition format, e.g. to serve from a metrics endpoint
+
+	"""
+	lines = [
+		f"# TYPE {prefix}_calls_total counter",
+		f"# TYPE {prefix}_errors_total counter",
+		f"# TYPE {prefix}_failures_total counter",
+		f"# TYPE {prefix}_latency_seconds histogram",
+	]
+	calls, errors, failures, latency = [], [], [], []
+	for key, stats in snapshot().items():
+		cls, method = key.rsplit(".", 1)
+		labels = f'class="{cls}",method="{method}",kind="{stats["kind"]}"'
+		calls.append(f"{prefix}_calls_total{{{labels}}} {stats['calls']}")
+		errors.append(f"{prefix}_errors_total{{{labels}}} {stats['errors']}")
+		failures.append(f"{prefix}_failures_total{{{labels}}} {stats['failures']}")
+		cumulative = 0
+		for le, n in stats["buckets"].items():
+			cumulative += n
+			latency.append(f'{prefix}_latency_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+		latency.append(f"{prefix}_latency_seconds_sum{{{labels}}} {stats['seconds']}")
+		latency.append(f"{prefix}_latency_seconds_count{{{labels}}} {stats['calls']}")
+	# Samples of a metric follow its TYPE line
+	return "\n".join([lines[0], *calls, lines[1], *errors, lines[2], *failures, lines[3], *latency]) + "\n"
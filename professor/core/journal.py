@@ -0,0 +1,225 @@
+"""
+
+Append-only journal of editor deltas, with undo/redo and versions rebuilt from periodic snapshots
+
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import copy
+
+from professor.core.wraps import instance_lock
+
+# (attr, op, i, old, new) as reported by EditableBase._changed
+Delta = Tuple[str, str, Optional[int], Any, Any]
+
+
+def state(inst: object) -> Dict[str, Any]:
+	"""
+	Deep copy of an object's attributes, without its bookkeeping attributes
+
+	"""
+	transient = inst.transient
+	return copy.deepcopy({k: v for k, v in inst.__dict__.items() if k not in transient})
+
+
+def inverse(delta: Delta) -> Delta:
+	"""
+	Delta that undoes delta
+
+	"""
+	attr, op, i, old, new = delta
+	if op in ("append", "insert"):
+		return attr, "pop", i, new, None
+	elif op == "pop":
+		return attr, "insert", i, None, old
+	# 'set', 'assign' and 'type' swap their values
+	return attr, op, i, new, old
+
+
+def apply(inst: object, delta: Delta):
+	"""
+	Applies a delta to an object, updating its indexes like the editors do
+
+	"""
+	attr, op, i, old, new = delta
+	d = inst.__dict__
+	if op == "type":
+		cls, attrs = new
+		keep = {k: v for k, v in d.items() if (k in inst.transient) and (k not in inst.derived)}
+		inst.__class__ = cls
+		inst.__dict__ = copy.deepcopy(attrs)
+		inst.__dict__.update(keep)
+		return
+	elif op == "assign":
+		# The journal keeps its own copy, later edits of the attribute must not reach it
+		d[attr] = copy.deepcopy(new)
+	elif op == "append":
+		inst._writable(attr).append(new)
+	elif op == "insert":
+		inst._writable(attr).insert(i, new)
+	elif op == "set":
+		inst._writable(attr)[i] = new
+	elif op == "pop":
+		inst._writable(attr).pop(i)
+	inst._changed(attr, op, i, old, new)
+
+
+def replay(inst: object, deltas: Iterable[Delta]):
+	"""
+	Applies deltas in order, e.g. deltas shipped from another process by Journal.deltas
+
+	"""
+	journal = inst.__dict__.get("_journal")
+	with journal.paused() if journal is not None else _nothing():
+		for delta in deltas:
+			apply(inst, delta)
+
+
+@contextmanager
+def _nothing():
+	yield
+
+
+class Journal(object):
+
+	def __init__(self, inst: object, snapshot_every: int = 64):
+		"""
+		Records the deltas reported by an object's editors. Deltas made by one editor call are grouped into a step,
+		and every step is one version. Storage grows with the size of the edits, plus one snapshot of the object
+		every snapshot_every versions to bound the replay needed to rebuild a past version.
+
+		Only changes made through the editors (and Link) are recorded.
+
+		:param inst:            EditableBase to journal
+		:param snapshot_every:  Versions between snapshots
+
+		"""
+		self.inst = inst
+		self.snapshot_every: int = snapshot_every
+		self.steps: List[List[Delta]] = []
+		self.version: int = 0
+		self.snapshots: Dict[int, Tuple[type, Dict[str, Any]]] = {0: (inst.__class__, state(inst))}
+		self._open: Optional[List[Delta]] = None
+		self._depth: int = 0
+		self._paused: int = 0
+		inst.__dict__["_journal"] = self
+
+	@property
+	def latest(self) -> int:
+		return len(self.steps)
+
+	def detach(self):
+		self.inst.__dict__.pop("_journal", None)
+
+	def record(self, delta: Delta):
+		"""
+		Appends a delta to the open step, or as a step of its own
+
+		"""
+		if self._paused:
+			return
+		attr, op, i, old, new = delta
+		if op == "assign":
+			# The values are the attribute's objects, which later editors mutate in place
+			delta = attr, op, i, copy.deepcopy(old), copy.deepcopy(new)
+		if self._open is not None:
+			self._open.append(delta)
+		else:
+			self._commit([delta])
+
+	@contextmanager
+	def step(self) -> Iterator["Journal"]:
+		"""
+		Groups every delta recorded inside the block into one step
+
+		"""
+		outer = self._depth == 0
+		if outer:
+			self._open = []
+		self._depth += 1
+		try:
+			yield self
+		finally:
+			self._depth -= 1
+			if outer:
+				deltas, self._open = self._open, None
+				if deltas:
+					self._commit(deltas)
+
+	@contextmanager
+	def paused(self) -> Iterator["Journal"]:
+		"""
+		Stops recording inside the block
+
+		"""
+		self._paused += 1
+		try:
+			yield self
+		finally:
+			self._paused -= 1
+
+	def undo(self) -> bool:
+		"""
+		Reverts the last step
+
+		:return: True if successful
+		"""
+		if self.version == 0:
+			return False
+		with instance_lock(self.inst), self.paused():
+			for delta in reversed(self.steps[self.version - 1]):
+				apply(self.inst, inverse(delta))
+			self.version -= 1
+			self.inst._publish()
+		return True
+
+	def redo(self) -> bool:
+		"""
+		Reapplies the last undone step
+
+		:return: True if successful
+		"""
+		if self.version == self.latest:
+			return False
+		with instance_lock(self.inst), self.paused():
+			for delta in self.steps[self.version]:
+				apply(self.inst, delta)
+			self.version += 1
+			self.inst._publish()
+		return True
+
+	def deltas(self, start: int, end: Optional[int] = None) -> List[Delta]:
+		"""
+		Deltas that take version start to version end (current version by default).
+		Going backwards returns the inverse deltas.
+
+		"""
+		end = self.version if end is None else end
+		if start <= end:
+			return [delta for deltas in self.steps[start:end] for delta in deltas]
+		return [inverse(delta) for deltas in reversed(self.steps[end:start]) for delta in reversed(deltas)]
+
+	def materialize(self, version: int) -> object:
+		"""
+		Builds a copy of the object at a version by replaying deltas from the nearest earlier snapshot
+
+		"""
+		if not 0 <= version <= self.latest:
+			raise ValueError(f"Version {version} is not in the journal (0 to {self.latest})")
+		base = max(v for v in self.snapshots if v <= version)
+		cls, attrs = self.snapshots[base]
+		obj = cls.__new__(cls)
+		obj.__dict__ = copy.deepcopy(attrs)
+		replay(obj, self.deltas(base, version))
+		return obj
+
+	def _commit(self, deltas: List[Delta]):
+		if self.version < self.latest:
+			# Editing after an undo discards the undone steps
+			del self.steps[self.version:]
+			for v in [v for v in self.snapshots if v > self.version]:
+				del self.snapshots[v]
+		self.steps.append(deltas)
+		self.version += 1
+		if self.version % self.snapshot_every == 0:
+			self.snapshots[self.version] = (self.inst.__class__, state(self.inst))
@@ -0,0 +1,238 @@
+"""
+
+Incremental leaderboards: O(log n) score updates, ranks and top-k queries
+
+"""
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import threading
+import random
+
+MAX_LEVEL = 32
+# Chance of a node reaching each next level of the skip list
+P = 0.25
+
+# (-score, time, order): higher scores first, then less time taken, then whoever joined first
+Key = Tuple[float, float, int]
+
+
+class Standing(NamedTuple):
+	rank: int
+	player: Hashable
+	score: float
+	# Total seconds taken answering, lower breaks ties
+	time: float
+
+
+class _Node(object):
+
+	__slots__ = ("key", "player", "forward", "span")
+
+	def __init__(self, key: Optional[Key], player: Any, level: int):
+		self.key: Optional[Key] = key
+		self.player: Any = player
+		self.forward: List[Optional["_Node"]] = [None] * level
+		# Ranks skipped by each forward link
+		self.span: List[int] = [0] * level
+
+
+class Leaderboard(object):
+
+	def __init__(self, entries: Iterable[Tuple[Hashable, float, float]] = ()):
+		"""
+		Players ordered by score, then by total time taken answering. Scores are kept in an indexable skip list,
+		so updates, ranks and the k-th player are O(log n) and the top k are O(log n + k).
+
+		:param entries: (player, score, time) to start from
+
+		"""
+		self._head = _Node(None, None, MAX_LEVEL)
+		self._level: int = 1
+		self._length: int = 0
+		self._players: Dict[Hashable, Key] = {}
+		self._joined: int = 0
+		self._lock = threading.Lock()
+		for player, score, time in entries:
+			self.add(player, score, time)
+
+	def __len__(self) -> int:
+		return self._length
+
+	def __contains__(self, player: Hashable) -> bool:
+		return player in self._players
+
+	def __iter__(self) -> Iterator[Standing]:
+		return iter(self.top(self._length))
+
+	def __getstate__(self) -> dict:
+		# Keys rather than entries(), so ties keep breaking by joining order
+		with self._lock:
+			return {"keys": list(self._players.items()), "joined": self._joined}
+
+	def __setstate__(self, state: dict):
+		self.__init__()
+		for player, key in state["keys"]:
+			self._players[player] = key
+			self._insert(key, player)
+		self._joined = state["joined"]
+
+	def add(self, player: Hashable, points: float = 1, time: float = 0.0) -> Standing:
+		"""
+		Adds points and time to a player's totals, adding the player if new
+
+		:return: The player's new standing
+		"""
+		with self._lock:
+			key = self._players.get(player)
+			if key is None:
+				order = self._joined
+				self._joined += 1
+				score, total = points, time
+			else:
+				self._delete(key)
+				score, total, order = -key[0] + points, key[1] + time, key[2]
+			key = self._players[player] = (-score, total, order)
+			self._insert(key, player)
+			return Standing(self._rank(key), player, score, total)
+
+	def record(self, player: Hashable, correct: bool, time: float = 0.0, points: float = 1) -> Standing:
+		"""
+		Adds a graded answer: points if it was correct, and the time it took either way
+
+		"""
+		return self.add(player, points if correct else 0, time)
+
+	def remove(self, player: Hashable) -> bool:
+		"""
+		:return: True if the player was on the leaderboard
+		"""
+		with self._lock:
+			key = self._players.pop(player, None)
+			if key is None:
+				return False
+			self._delete(key)
+			return True
+
+	def standing(self, player: Hashable) -> Optional[Standing]:
+		"""
+		A player's rank (1 is first), score and time, or None if not on the leaderboard
+
+		"""
+		with self._lock:
+			key = self._players.get(player)
+			if key is None:
+				return None
+			return Standing(self._rank(key), player, -key[0], key[1])
+
+	def rank(self, player: Hashable) -> Optional[int]:
+		standing = self.standing(player)
+		return standing.rank if standing is not None else None
+
+	def at(self, rank: int) -> Optional[Standing]:
+		"""
+		Standing of the player at a rank (1 is first)
+
+		"""
+		with self._lock:
+			if not 1 <= rank <= self._length:
+				return None
+			x, traversed = self._head, 0
+			for i in reversed(range(self._level)):
+				while (x.forward[i] is not None) and (traversed + x.span[i] <= rank):
+					traversed += x.span[i]
+					x = x.forward[i]
+				if traversed == rank:
+					return Standing(rank, x.player, -x.key[0], x.key[1])
+		return None
+
+	def top(self, k: int = 10) -> List[Standing]:
+		"""
+		The first k standings
+
+		"""
+		with self._lock:
+			standings = []
+			x = self._head.forward[0]
+			while (x is not None) and (len(standings) < k):
+				standings.append(Standing(len(standings) + 1, x.player, -x.key[0], x.key[1]))
+				x = x.forward[0]
+			return standings
+
+	def entries(self) -> List[Tuple[Hashable, float, float]]:
+		"""
+		(player, score, time) in rank order, e.g. to send to another process
+
+		"""
+		return [(s.player, s.score, s.time) for s in self.top(self._length)]
+
+	def merge(self, other: Union["Leaderboard", Iterable[Tuple[Hashable, float, float]]]) -> "Leaderboard":
+		"""
+		Adds the scores and times of another session or process. Players on both have their totals summed.
+
+		:param other:   Leaderboard, or its entries()
+		:return:        self
+		"""
+		for player, score, time in (other.entries() if isinstance(other, Leaderboard) else other):
+			self.add(player, score, time)
+		return self
+
+	def _random_level(self) -> int:
+		level = 1
+		while (random.random() < P) and (level < MAX_LEVEL):
+			level += 1
+		return level
+
+	def _insert(self, key: Key, player: Hashable):
+		update: List[_Node] = [self._head] * MAX_LEVEL
+		rank = [0] * MAX_LEVEL
+		x = self._head
+		for i in reversed(range(self._level)):
+			rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+			while (x.forward[i] is not None) and (x.forward[i].key < key):
+				rank[i] += x.span[i]
+				x = x.forward[i]
+			update[i] = x
+
+		level = self._random_level()
+		if level > self._level:
+			for i in range(self._level, level):
+				rank[i] = 0
+				update[i] = self._head
+				self._head.span[i] = self._length
+			self._level = level
+
+		node = _Node(key, player, level)
+		for i in range(level):
+			node.forward[i] = update[i].forward[i]
+			update[i].forward[i] = node
+			node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+			update[i].span[i] = rank[0] - rank[i] + 1
+		for i in range(level, self._level):
+			update[i].span[i] += 1
+		self._length += 1
+
+	def _delete(self, key: Key):
+		update: List[_Node] = [self._head] * MAX_LEVEL
+		x = self._head
+		for i in reversed(range(self._level)):
+			while (x.forward[i] is not None) and (x.forward[i].key < key):
+				x = x.forward[i]
+			update[i] = x
+
+		x = x.forward[0]
+		for i in range(self._level):
+			if update[i].forward[i] is x:
+				update[i].span[i] += x.span[i] - 1
+				update[i].forward[i] = x.forward[i]
+			else:
+				update[i].span[i] -= 1
+		while (self._level > 1) and (self._head.forward[self._level - 1] is None):
+			self._level -= 1
+		self._length -= 1
+
+	def _rank(self, key: Key) -> int:
+		x, rank = self._head, 0
+		for i in reversed(range(self._level)):
+			while (x.forward[i] is not None) and (x.forward[i].key <= key):
+				rank += x.span[i]
+				x = x.forward[i]
+		return rank
@@ -3,24 +3,85 @@
 All question classes
 
 """
-from typing import Optional, List, Union, Any
-from fuzzywuzzy.fuzz import ratio
+from typing import Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, List, Sequence, Tuple, Union, Any
 from string import ascii_lowercase
 import random
+import re
 
 from professor.utils.numeric import numeric_string
+from professor.utils import normalize
+from professor.utils.normalize import Normalizer
 from professor.core.base import QuestionBase
 from professor.core.wraps import Link
 
 
+def ratio(s1: str, s2: str) -> int:
+	"""
+	Levenshtein similarity (0-100). fuzzywuzzy is imported on first use and replaces this function.
+
+	"""
+	global ratio
+	from fuzzywuzzy.fuzz import ratio
+	return ratio(s1, s2)
+
+
+# Choice index of each letter shown to players
+_letters: Dict[str, int] = {c: i for i, c in enumerate(ascii_lowercase)}
+_separators = re.compile(r"[\s,;]+")
+
+
+def parse_choices(x: str) -> Optional[List[int]]:
+	"""
+	Parses a response like 'a, c d' to choice indices. Tokens may also be indices ('0 2').
+
+	:return: The indices, or None if a token is neither a letter nor an index
+	"""
+	indices = []
+	for token in _separators.split(x.strip().lower()):
+		if not token:
+			continue
+		i = _letters.get(token)
+		if i is None:
+			if not token.isdigit():
+				return None
+			i = int(token)
+		indices.append(i)
+	return indices
+
+
+def _popcount(x: int) -> int:
+	return bin(x).count("1")
+
+
+class Score(NamedTuple):
+	# Answers picked
+	hits: int
+	# Answers not picked
+	misses: int
+	# Picks that are not answers, including picks that are not choices
+	false_picks: int
+
+	@property
+	def credit(self) -> float:
+		"""
+		Partial credit from 0 to 1: hits less false picks, over the number of answers
+
+		"""
+		answers = self.hits + self.misses
+		return max(0, self.hits - self.false_picks) / answers if answers else 0.0
+
+
 class FreeResponse(QuestionBase):
 
 	def __init__(self, *args, **kwargs):
 		"""
 		...
 		:param exact:
+		:param normalizer:  Applied to responses and answers before comparing them. None compares them as given,
+		                    and so do exact questions.
 		"""
 		self.exact = False
+		self.normalizer: Optional[Normalizer] = normalize.default
 		if "type_help" not in self.__dict__:
 			self.type_help = """To answer a free response question, enter, in precise words, your response. Be careful! Not all quiz builders are lenient on punctuation, capitalization, and spelling."""
 		if "name" not in self.__dict__:
@@ -51,12 +112,81 @@ class FreeResponse(QuestionBase):
 
 	def check(self, x: str) -> bool:
 		"""
-		Validates a string against the question's answer
+		Validates a string against the question's answer. A normalized response equal to the normalized
+		answer is correct without fuzzy matching.
 
 		:param x:
 		:return:
 		"""
-		return ratio(x, self.answer) >= self.precision()
+		normalizer, accepted, answers = self._accepted()
+		if x in accepted:
+			return True
+		y = normalizer(x) if normalizer is not None else x
+		return (y in accepted) or (bool(answers) and (ratio(y, answers[0][1]) >= self.precision()))
+
+	def grader(self) -> Callable[[str], bool]:
+		"""
+		check with the precision computed once
+
+		"""
+		normalizer, accepted, answers = self._accepted()
+		if not answers:
+			return lambda x: False
+		answer, precision = answers[0][1], self.precision()
+		if normalizer is None:
+			return lambda x: (x in accepted) or (ratio(x, answer) >= precision)
+
+		def grade(x: str) -> bool:
+			if x in accepted:
+				return True
+			y = normalizer(x)
+			return (y in accepted) or (ratio(y, answer) >= precision)
+		return grade
+
+	def _accepted(self) -> Tuple[Optional[Normalizer], FrozenSet[str], List[Tuple[str, str]]]:
+		"""
+		The normalizer, the set of accepted responses, and (answer, normalized answer) pairs. Accepted responses
+		are the answers as given and normalized, so responses typed exactly like an answer skip the normalizer.
+		Exact questions don't normalize. Cached until the next edit, or until answer or normalizer are replaced.
+
+		"""
+		d = self.__dict__
+		answer = d["answer"]
+		normalizer = d.get("normalizer") if not d.get("exact") else None
+		answers = answer if isinstance(answer, list) else [answer]
+		cache = d.get("_cache")
+		if cache is None:
+			cache = d["_cache"] = {}
+		found = cache.get("accepted")
+		if (found is not None) and (found[0] is answer) and (found[1] is normalizer) and (found[2] == len(answers)):
+			return found[1], found[3], found[4]
+
+		pairs = [(a, normalizer(a) if normalizer is not None else a) for a in answers if isinstance(a, str)]
+		accepted = frozenset(s for pair in pairs for s in pair)
+		cache["accepted"] = (answer, normalizer, len(answers), accepted, pairs)
+		return normalizer, accepted, pairs
+
+	def edit_normalizer(self, x: Optional[Union[Normalizer, Sequence[str]]]) -> bool:
+		"""
+		Sets the normalizer from a Normalizer or a sequence of step names (see professor.utils.normalize.STEPS).
+		To set it for a whole quiz, use quiz.update(values={"normalizer": x}).
+
+		"""
+		try:
+			if (x is not None) and not isinstance(x, Normalizer):
+				assert not isinstance(x, str)
+				x = Normalizer(*x)
+			self._assign("normalizer", x)
+			return True
+		except (AssertionError, KeyError, TypeError):
+			return False
+
+	def clear_normalizer(self) -> bool:
+		"""
+		Compares responses and answers as given
+
+		"""
+		return self._clear_attr("normalizer")
 
 	def edit_exact(self, x: bool) -> bool:
 		"""
@@ -135,6 +265,8 @@ class Numeric(QuestionBase):
 
 class MultipleChoice(QuestionBase):
 
+	indexed = frozenset({"choices"})
+
 	def __init__(self, *args, **kwargs):
 		self.choices: List[str] = []
 		self.shuffle: bool = True
@@ -145,6 +277,8 @@ class MultipleChoice(QuestionBase):
 		super(MultipleChoice, self).__init__(**kwargs)
 		if self.shuffle:
 			random.shuffle(self.choices)
+			# Positions changed in place
+			self._changed("choices", "assign", None, self.choices, self.choices)
 
 	@property
 	def Choices(self) -> dict:
@@ -171,8 +305,9 @@ class MultipleChoice(QuestionBase):
 			self.answer = str(self.answer)
 
 		# Ensure
-		if (self.answer not in self.choices) & (self.answer is not None):
+		if (self.answer is not None) and (self.answer not in self._index("choices")):
 			self.choices.append(self.answer)
+			self._changed("choices", "append", len(self.choices) - 1, None, self.answer)
 
 	def check(self, x: Optional[str] = None, i: Optional[int] = None) -> bool:
 		"""
@@ -216,7 +351,7 @@ class MultipleChoice(QuestionBase):
 		if i:
 			x = self.choices[i]
 		if x == self.answer:
-			self.answer = None
+			self._assign("answer", None)
 		return self._delete_element(attr="choices", x=x, i=i)
 
 	def clear_choices(self) -> bool:
@@ -224,7 +359,7 @@ class MultipleChoice(QuestionBase):
 		Resets the choices array
 
 		"""
-		self.answer = None
+		self._assign("answer", None)
 		return self._clear_attr(attr="choices", default=[])
 
 	def edit_shuffle(self, x: bool) -> bool:
@@ -245,6 +380,8 @@ class MultipleChoice(QuestionBase):
 
 class MultipleResponse(MultipleChoice):
 
+	indexed = frozenset({"choices", "answer"})
+
 	def __init__(self, *args, **kwargs):
 		self.answer: list = []
 		if "type_help" not in self.__dict__:
@@ -261,19 +398,146 @@ class MultipleResponse(MultipleChoice):
 		if not isinstance(self.answer, (list, tuple, set)):
 			self.answer = [str(self.answer)] if self.answer is not None else []
 
-		for missing in set(self.answer) - set(self.choices):
-			self.choices.append(missing)
+		index = self._index("choices")
+		for missing in dict.fromkeys(self.answer):
+			if missing not in index:
+				self.choices.append(missing)
+				self._changed("choices", "append", len(self.choices) - 1, None, missing)
+
+	def check(self, x: Optional[Union[str, List[str]]] = None, i: Optional[List[int]] = None) -> bool:
+		"""
+		Checks if given responses are exactly the answers. Responses are choice values, a string of
+		letters as players type them (see parse_choices), or choice indices.
+
+		"""
+		bits, answer = self._bits()
+		return self._exact(bits, answer, x, i)
+
+	def score(self, x: Optional[Union[str, List[str]]] = None, i: Optional[List[int]] = None) -> Score:
+		"""
+		Partial credit of a response: answers picked and missed, and false picks
+
+		"""
+		bits, answer = self._bits()
+		mask, unknown = self._mask(bits, x, i)
+		return Score(_popcount(mask & answer), _popcount(answer & ~mask), _popcount(mask & ~answer) + unknown)
+
+	def grader(self) -> Callable[[Union[str, List[str]]], bool]:
+		"""
+		check with the answer mask computed once
+
+		"""
+		bits, answer = self._bits()
+		return lambda x: self._exact(bits, answer, x)
+
+	def check_many(self, responses: Iterable[Union[str, List[str]]]) -> List[bool]:
+		"""
+		Checks a round of responses (choice values or letter strings)
+
+		"""
+		return list(map(self.grader(), responses))
+
+	def score_many(self, responses: Iterable[Union[str, List[str]]]) -> List[Score]:
+		"""
+		Scores a round of responses (choice values or letter strings)
+
+		"""
+		bits, answer = self._bits()
+		scores = []
+		for x in responses:
+			mask, unknown = self._mask(bits, x)
+			scores.append(Score(_popcount(mask & answer), _popcount(answer & ~mask), _popcount(mask & ~answer) + unknown))
+		return scores
+
+	def _bits(self) -> Tuple[Dict[Any, int], int]:
+		"""
+		Bit of each choice value (at its first position) and the bitmask of the answers. Answers missing from
+		the choices get bits past the last choice. Cached until the next edit, or until choices or answer are
+		replaced or resized.
+
+		"""
+		d = self.__dict__
+		choices, answer = d["choices"], d["answer"]
+		cache = d.get("_cache")
+		if cache is None:
+			cache = d["_cache"] = {}
+		found = cache.get("bits")
+		if (found is not None) and (found[0] is choices) and (found[1] is answer) and (found[2] == len(choices)) and (found[3] == len(answer)):
+			return found[4], found[5]
+
+		bits = {}
+		for k, v in enumerate(choices):
+			try:
+				bits.setdefault(v, 1 << k)
+			except TypeError:
+				pass
+		mask = 0
+		for v in answer:
+			try:
+				if v not in bits:
+					bits[v] = 1 << (len(choices) + len(bits))
+				mask |= bits[v]
+			except TypeError:
+				pass
+		cache["bits"] = (choices, answer, len(choices), len(answer), bits, mask)
+		return bits, mask
 
-	def check(self, x: Optional[List[str]] = None, i: Optional[List[int]] = None):
+	def _exact(self, bits: Dict[Any, int], answer: int, x: Optional[Union[str, List[str]]] = None, i: Optional[List[int]] = None) -> bool:
 		"""
-		Checks if given responses are answers or given choice indices are answers
+		True if a response picks exactly the answers. Picks that are not choices set every bit (-1),
+		so the mask can no longer equal the answers'.
 
 		"""
+		if isinstance(x, str):
+			i, x = parse_choices(x), None
+		mask = 0
+		get = bits.get
 		if x:
-			return set(x) == self.answer
+			try:
+				for v in x:
+					mask |= get(v, -1)
+			except TypeError:
+				return False
 		elif i:
-			return set(self.choices[k] for k in i) == self.answer
-		return False
+			choices = self.choices
+			n = len(choices)
+			for k in i:
+				mask |= get(choices[k], -1) if 0 <= k < n else -1
+		else:
+			return False
+		return mask == answer
+
+	def _mask(self, bits: Dict[Any, int], x: Optional[Union[str, List[str]]] = None, i: Optional[List[int]] = None) -> Tuple[int, int]:
+		"""
+		Bitmask of a response, and its number of picks that are not choices
+
+		"""
+		if isinstance(x, str):
+			i = parse_choices(x)
+			if i is None:
+				return 0, 1
+			x = None
+		mask = unknown = 0
+		get = bits.get
+		if x:
+			for v in x:
+				try:
+					b = get(v)
+				except TypeError:
+					b = None
+				if b is None:
+					unknown += 1
+				else:
+					mask |= b
+		elif i:
+			choices = self.choices
+			for k in i:
+				b = get(choices[k]) if 0 <= k < len(choices) else None
+				if b is None:
+					unknown += 1
+				else:
+					mask |= b
+		return mask, unknown
 
 	@Link(domain="answer", codomain="choices")
 	def add_answer(self, x: Any) -> bool:
@@ -326,6 +590,8 @@ class MultipleResponse(MultipleChoice):
 
 class MultipleFreeResponse(FreeResponse):
 
+	indexed = frozenset({"answer"})
+
 	def __init__(self, *args, **kwargs):
 		if "type_help" not in self.__dict__:
 			self.type_help = """To answer a multiple free response question, enter, in precise words, your response. There are multiple correct answers to this question, you should only give one. Be careful! Not all quiz builders are lenient on punctuation, capitalization, and spelling."""
@@ -352,10 +618,30 @@ class MultipleFreeResponse(FreeResponse):
 
 	def check(self, x: str):
 		"""
-		Checks if given responses are answers or given choice indices are answers
+		Checks if the response matches any of the answers. A normalized response equal to a normalized
+		answer is correct without fuzzy matching.
 
 		"""
-		return any(ratio(x, ans) > self.precision(answer=ans) for ans in self.answer)
+		normalizer, accepted, answers = self._accepted()
+		if x in accepted:
+			return True
+		y = normalizer(x) if normalizer is not None else x
+		return (y in accepted) or any(ratio(y, norm) > self.precision(answer=ans) for ans, norm in answers)
+
+	def grader(self) -> Callable[[str], bool]:
+		"""
+		check with the precisions computed once
+
+		"""
+		normalizer, accepted, answers = self._accepted()
+		answers = [(norm, self.precision(answer=ans)) for ans, norm in answers]
+
+		def grade(x: str) -> bool:
+			if x in accepted:
+				return True
+			y = normalizer(x) if normalizer is not None else x
+			return (y in accepted) or any(ratio(y, norm) > precision for norm, precision in answers)
+		return grade
 
 	def add_answer(self, x: Any) -> bool:
 		"""
@@ -0,0 +1,247 @@
+"""
+
+Streaming item statistics per question: difficulty, point-biserial discrimination and time to answer
+
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from array import array
+from pathlib import Path
+import threading
+import struct
+import json
+import math
+import sys
+import os
+
+# Array fields and their typecodes. t_* is time to answer, s_* is the taker's score and s1_* the score of correct takers.
+FIELDS: Dict[str, str] = {
+	"n": "q", "correct": "q",
+	"t_n": "q", "t_mean": "d", "t_m2": "d",
+	"s_n": "q", "s_mean": "d", "s_m2": "d",
+	"s1_n": "q", "s1_mean": "d",
+}
+
+_header = struct.Struct("<I")
+
+
+class ItemSummary(NamedTuple):
+	id: Union[int, str]
+	answers: int
+	# Proportion correct
+	difficulty: Optional[float]
+	# Point-biserial correlation between answering correctly and the taker's score
+	discrimination: Optional[float]
+	mean_time: Optional[float]
+	time_sd: Optional[float]
+
+
+def _welford(n: int, mean: float, m2: float, x: float) -> Tuple[float, float]:
+	"""
+	Mean and sum of squared deviations after adding x as the n-th value
+
+	"""
+	delta = x - mean
+	mean += delta / n
+	return mean, m2 + delta * (x - mean)
+
+
+def _chan(na: int, ma: float, m2a: float, nb: int, mb: float, m2b: float) -> Tuple[float, float]:
+	"""
+	Mean and sum of squared deviations of two combined samples
+
+	"""
+	n = na + nb
+	if n == 0:
+		return 0.0, 0.0
+	delta = mb - ma
+	return ma + delta * nb / n, m2a + m2b + delta * delta * na * nb / n
+
+
+class ItemStatistics(object):
+
+	def __init__(self):
+		"""
+		Statistics of every question, updated in O(1) per graded answer. Each statistic is a compact array
+		with one slot per question id.
+
+		Difficulty is the proportion of correct answers. Discrimination is the point-biserial correlation between
+		answering correctly and the taker's score, so it is only computed from answers given with a score
+		(see record_attempt). Times and scores use Welford's online mean and variance.
+
+		"""
+		self.slots: Dict[Union[int, str], int] = {}
+		self.ids: List[Union[int, str]] = []
+		self.arrays: Dict[str, array] = {field: array(code) for field, code in FIELDS.items()}
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	def __contains__(self, qid: Union[int, str]) -> bool:
+		return qid in self.slots
+
+	def slot(self, qid: Union[int, str]) -> int:
+		"""
+		Slot of a question id, added if new
+
+		"""
+		i = self.slots.get(qid)
+		if i is None:
+			i = self.slots[qid] = len(self.ids)
+			self.ids.append(qid)
+			for arr in self.arrays.values():
+				arr.append(0)
+		return i
+
+	def update(self, qid: Union[int, str], correct: bool, time: Optional[float] = None, score: Optional[float] = None):
+		"""
+		Adds one graded answer
+
+		:param qid:     Question id
+		:param correct: Verdict of check
+		:param time:    Seconds taken to answer
+		:param score:   Taker's score (e.g. proportion correct over the attempt), needed for discrimination
+
+		"""
+		a = self.arrays
+		with self._lock:
+			i = self.slot(qid)
+			a["n"][i] += 1
+			a["correct"][i] += bool(correct)
+			if time is not None:
+				n = a["t_n"][i] = a["t_n"][i] + 1
+				a["t_mean"][i], a["t_m2"][i] = _welford(n, a["t_mean"][i], a["t_m2"][i], time)
+			if score is not None:
+				n = a["s_n"][i] = a["s_n"][i] + 1
+				a["s_mean"][i], a["s_m2"][i] = _welford(n, a["s_mean"][i], a["s_m2"][i], score)
+				if correct:
+					n = a["s1_n"][i] = a["s1_n"][i] + 1
+					a["s1_mean"][i] += (score - a["s1_mean"][i]) / n
+
+	def grade(self, question, x: Any, time: Optional[float] = None) -> bool:
+		"""
+		Checks a response against a question and records the verdict
+
+		:return: The verdict
+		"""
+		correct = bool(question.check(x))
+		self.update(question.id, correct, time=time)
+		return correct
+
+	def record_attempt(self, results: Iterable[Tuple[Union[int, str], bool, Optional[float]]]) -> float:
+		"""
+		Adds every answer of a finished attempt, scored by the attempt's proportion correct
+
+		:param results: (question id, verdict, seconds taken or None) per answered question
+		:return:        The attempt's score
+		"""
+		results = list(results)
+		if not results:
+			return 0.0
+		score = sum(bool(correct) for _, correct, _ in results) / len(results)
+		for qid, correct, time in results:
+			self.update(qid, correct, time=time, score=score)
+		return score
+
+	def item(self, qid: Union[int, str]) -> ItemSummary:
+		"""
+		Summary of a question's statistics
+
+		"""
+		i = self.slots[qid]
+		a = self.arrays
+		n, t_n, s_n, s1_n = a["n"][i], a["t_n"][i], a["s_n"][i], a["s1_n"][i]
+
+		discrimination = None
+		s0_n = s_n - s1_n
+		if s1_n and s0_n and a["s_m2"][i] > 0:
+			s0_mean = (a["s_mean"][i] * s_n - a["s1_mean"][i] * s1_n) / s0_n
+			p = s1_n / s_n
+			sd = math.sqrt(a["s_m2"][i] / s_n)
+			discrimination = (a["s1_mean"][i] - s0_mean) / sd * math.sqrt(p * (1 - p))
+
+		return ItemSummary(
+			id=qid,
+			answers=n,
+			difficulty=a["correct"][i] / n if n else None,
+			discrimination=discrimination,
+			mean_time=a["t_mean"][i] if t_n else None,
+			time_sd=math.sqrt(a["t_m2"][i] / (t_n - 1)) if t_n > 1 else None,
+		)
+
+	def summary(self) -> List[ItemSummary]:
+		return [self.item(qid) for qid in self.ids]
+
+	def merge(self, other: "ItemStatistics") -> "ItemStatistics":
+		"""
+		Adds another instance's statistics (e.g. from another worker process) to this one
+
+		:return: self
+		"""
+		b = other.arrays
+		with self._lock:
+			a = self.arrays
+			for j, qid in enumerate(other.ids):
+				i = self.slot(qid)
+				a["n"][i] += b["n"][j]
+				a["correct"][i] += b["correct"][j]
+				for prefix in ("t", "s"):
+					na, nb = a[f"{prefix}_n"][i], b[f"{prefix}_n"][j]
+					a[f"{prefix}_mean"][i], a[f"{prefix}_m2"][i] = _chan(
+						na, a[f"{prefix}_mean"][i], a[f"{prefix}_m2"][i], nb, b[f"{prefix}_mean"][j], b[f"{prefix}_m2"][j]
+					)
+					a[f"{prefix}_n"][i] = na + nb
+				na, nb = a["s1_n"][i], b["s1_n"][j]
+				if na + nb:
+					a["s1_mean"][i] = (a["s1_mean"][i] * na + b["s1_mean"][j] * nb) / (na + nb)
+				a["s1_n"][i] = na + nb
+		return self
+
+	def dumps(self) -> bytes:
+		"""
+		Serialized state: a JSON header with the question ids, followed by the raw arrays
+
+		"""
+		with self._lock:
+			header = json.dumps({
+				"ids": self.ids,
+				"fields": FIELDS,
+				"byteorder": sys.byteorder,
+			}).encode("utf-8")
+			return _header.pack(len(header)) + header + b"".join(self.arrays[field].tobytes() for field in FIELDS)
+
+	@classmethod
+	def loads(cls, data: bytes) -> "ItemStatistics":
+		(size,) = _header.unpack_from(data)
+		start = _header.size + size
+		header = json.loads(data[_header.size:start].decode("utf-8"))
+		if header["fields"] != FIELDS:
+			raise ValueError("Statistics were saved with different fields")
+
+		stats = cls()
+		stats.ids = header["ids"]
+		stats.slots = {qid: i for i, qid in enumerate(stats.ids)}
+		n = len(stats.ids)
+		for field, code in FIELDS.items():
+			arr = array(code)
+			end = start + n * arr.itemsize
+			arr.frombytes(data[start:end])
+			if header["byteorder"] != sys.byteorder:
+				arr.byteswap()
+			stats.arrays[field] = arr
+			start = end
+		return stats
+
+	def save(self, path: Union[str, Path]):
+		"""
+		Writes the state to a file atomically
+
+		"""
+		path = Path(path)
+		tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+		tmp.write_bytes(self.dumps())
+		os.replace(tmp, path)
+
+	@classmethod
+	def load(cls, path: Union[str, Path]) -> "ItemStatistics":
+		return cls.loads(Path(path).read_bytes())
@@ -0,0 +1,275 @@
+"""
+
+Parameterized Numeric questions whose variants are generated when administered
+
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import functools
+import zlib
+import ast
+
+from professor.core.base import QuestionBase
+from professor.core.question import Numeric
+from professor.utils.numeric import numeric_string
+from professor.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Names an answer expression may use besides its parameters, taken from numpy
+FUNCTIONS = (
+	"sqrt", "exp", "log", "log10", "sin", "cos", "tan", "arcsin", "arccos", "arctan", "degrees", "radians",
+	"abs", "floor", "ceil", "round", "minimum", "maximum", "where", "logical_and", "logical_or", "pi", "e",
+)
+
+# Syntax an answer expression may use: arithmetic, comparisons, conditionals and calls of the FUNCTIONS.
+# Attributes, subscripts, lambdas and comprehensions are refused, so no object outside the namespace is reachable.
+NODES = (
+	ast.Expression, ast.Name, ast.Load, ast.Constant, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+	ast.Call, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+# Largest exponent of a power. Exponents must be number literals and bases may not contain powers, so an
+# expression can't build integers too large to compute (e.g. 10**10**10).
+MAX_EXPONENT = 100
+
+# A numpy Generator method and its arguments, e.g. ("uniform", 10, 100), or a list of values to choose from
+Distribution = Union[Tuple, List]
+
+
+class NumericTemplate(QuestionBase):
+
+	def __init__(self, *args, **kwargs):
+		"""
+		A Numeric question with parameters. Variants are drawn from a seed when the question is administered
+		(see QuizBase.session) and never stored. Answers of many variants are computed at once with numpy.
+
+		:param text:            Format string of the text, e.g. "A car travels {d} km in {t} h. What is its speed in km/h?"
+		:param params:          Parameter name -> Distribution
+		:param expression:      The answer as an expression of the parameters, e.g. "d / t". It is evaluated on arrays
+		                        of draws and may use the FUNCTIONS.
+		:param decimals:        Parameter name -> decimals it is rounded to before the answer is computed
+		:param round:           Decimals responses are rounded to, as Numeric.round
+		:param instance_type:   Class of the variants, Numeric or a subclass (e.g. professor.discord.question.Numeric)
+
+		"""
+		self.params: Dict[str, Distribution] = {}
+		self.expression: str = "0"
+		self.decimals: Dict[str, int] = {}
+		self.round: Optional[int] = None
+		self.instance_type: type = Numeric
+		if "type_help" not in self.__dict__:
+			self.type_help: str = """To answer a numeric question, enter the number that answers the question (digits, not words). Be careful! Some quiz builders may round your answer to a particular decimal."""
+		if "name" not in self.__dict__:
+			self.name: str = "Numeric Template"
+		super(NumericTemplate, self).__init__(**kwargs)
+
+	def build(self):
+		"""
+		Enforce type requirements
+
+		:raises ValueError: If the expression is not a valid answer expression of the parameters
+		"""
+		self.params = {name: spec for name, spec in dict(self.params).items() if valid_distribution(spec)}
+		if not isinstance(self.expression, str):
+			self.expression = str(self.expression)
+		try:
+			_compile(self.expression, tuple(sorted(self.params)))
+		except (SyntaxError, NameError) as e:
+			raise ValueError(f"Invalid expression {self.expression!r}: {e}") from e
+
+	def check(self, x: Any) -> bool:
+		"""
+		A template has no answer of its own, its variants are checked instead
+
+		"""
+		return False
+
+	def draw(self, seed: Optional[int] = None) -> Numeric:
+		"""
+		One variant, the same for the same seed
+
+		"""
+		return next(self.variants(1, seed))
+
+	def variants(self, n: int, seed: Optional[int] = None) -> Iterator[Numeric]:
+		"""
+		Generates n variants. Parameters and answers are drawn for all of them at once, the questions are only
+		built as they are consumed.
+
+		:param seed:    Seed of the draws (fresh entropy if None). It is part of the variants' ids.
+
+		"""
+		params, answers = self.batch(n, seed)
+		prefix = f"{self.id}:{seed}" if seed is not None else str(self.id)
+		for k in range(n):
+			values = {name: arr[k].item() for name, arr in params.items()}
+			yield self.instance_type(
+				id=f"{prefix}:{k}",
+				text=self.text.format(**values),
+				answer=answers[k].item(),
+				round=self.round,
+				help=self.help,
+				image=self.image,
+				version=self.version,
+			)
+
+	def batch(self, n: int, seed: Optional[int] = None) -> Tuple[Dict[str, "np.ndarray"], "np.ndarray"]:
+		"""
+		Draws n sets of parameters and computes their answers in one vectorized evaluation
+
+		:return: Parameter name -> array of n draws, and the array of n answers
+		"""
+		rng = np.random.default_rng(None if seed is None else [seed & (2**64 - 1), zlib.crc32(str(self.id).encode())])
+		params = {}
+		for name, spec in self.params.items():
+			if isinstance(spec, list):
+				arr = np.asarray(spec)[rng.integers(0, len(spec), size=n)]
+			else:
+				arr = getattr(rng, spec[0])(*spec[1:], size=n)
+			if name in self.decimals:
+				arr = np.round(arr, self.decimals[name])
+			params[name] = arr
+
+		namespace = {name: getattr(np, name) for name in FUNCTIONS}
+		namespace.update(params)
+		code = _compile(self.expression, tuple(sorted(self.params)))
+		answers = eval(code, {"__builtins__": {}}, namespace)
+		return params, np.broadcast_to(np.asarray(answers, dtype=float), (n,))
+
+	def edit_expression(self, x: str) -> bool:
+		"""
+		Edits the answer expression. It may only use the parameters and the FUNCTIONS.
+
+		"""
+		try:
+			compile_expression(x, self.params)
+			self._assign("expression", x)
+			return True
+		except (SyntaxError, NameError, TypeError, ValueError):
+			return False
+
+	def edit_param(self, x: Distribution, name: str) -> bool:
+		"""
+		Adds a parameter or edits its distribution
+
+		"""
+		if not (isinstance(name, str) and name.isidentifier() and valid_distribution(x)):
+			return False
+		self._assign("params", {**self.params, name: x})
+		return True
+
+	def delete_param(self, x: str) -> bool:
+		"""
+		Deletes a parameter. Fails if the expression uses it.
+
+		"""
+		if x not in self.params:
+			return False
+		params = {name: spec for name, spec in self.params.items() if name != x}
+		try:
+			compile_expression(self.expression, params)
+		except NameError:
+			return False
+		self._assign("params", params)
+		return True
+
+	def edit_round(self, x: str) -> bool:
+		"""
+		Edits the round attribute
+
+		"""
+		return self._edit_number(numeric_string(x), "round")
+
+	def clear_round(self):
+		"""
+		Sets the round attribute to None
+
+		"""
+		return self._clear_attr("round")
+
+
+def valid_distribution(spec: Distribution) -> bool:
+	"""
+	True for a non-empty list of values, or a tuple starting with a method name of numpy.random.Generator
+
+	"""
+	if isinstance(spec, list):
+		return len(spec) > 0
+	return isinstance(spec, tuple) and bool(spec) and isinstance(spec[0], str) and not spec[0].startswith("_") \
+		and callable(getattr(np.random.Generator, spec[0], None))
+
+
+def compile_expression(expression: str, params: Dict[str, Distribution]):
+	"""
+	Compiles an answer expression
+
+	:raises SyntaxError: If it is not an expression
+	:raises ValueError: If it uses syntax other than the NODES, constants other than numbers, a power other than
+	                    by a literal up to MAX_EXPONENT, or calls something other than the FUNCTIONS
+	:raises NameError: If it uses a name that is neither a parameter nor one of the FUNCTIONS
+	"""
+	tree = ast.parse(expression, "<expression>", "eval")
+	unknown = set()
+	for node in ast.walk(tree):
+		if not isinstance(node, NODES):
+			raise ValueError(f"{type(node).__name__} is not allowed in an expression")
+		if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+			raise ValueError(f"Only numbers are allowed as constants in an expression, not {node.value!r}")
+		if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+			_check_power(node)
+		if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and (node.func.id in FUNCTIONS)):
+			raise ValueError("Only the FUNCTIONS can be called in an expression")
+		if isinstance(node, ast.Name) and (node.id not in params) and (node.id not in FUNCTIONS):
+			unknown.add(node.id)
+	if unknown:
+		raise NameError(f"Unknown names in expression: {', '.join(sorted(unknown))}")
+	tree = ast.fix_missing_locations(_Elementwise().visit(tree))
+	return compile(tree, "<expression>", "eval")
+
+
+def _check_power(node: ast.BinOp):
+	"""
+	:raises ValueError: If the exponent is not a number literal up to MAX_EXPONENT, or the base contains a power
+	"""
+	exponent = node.right
+	if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, (ast.USub, ast.UAdd)):
+		exponent = exponent.operand
+	if not (isinstance(exponent, ast.Constant) and isinstance(exponent.value, (int, float)) and abs(exponent.value) <= MAX_EXPONENT):
+		raise ValueError(f"Exponents must be numbers up to {MAX_EXPONENT}")
+	if any(isinstance(child, ast.BinOp) and isinstance(child.op, ast.Pow) for child in ast.walk(node.left)):
+		raise ValueError("The base of a power can't contain a power")
+
+
+class _Elementwise(ast.NodeTransformer):
+	"""
+	Rewrites conditionals and boolean operators, which need a single truth value, to their numpy counterparts
+	so they apply to every draw
+
+	"""
+
+	def visit_IfExp(self, node: ast.IfExp) -> ast.Call:
+		self.generic_visit(node)
+		return ast.Call(ast.Name("where", ast.Load()), [node.test, node.body, node.orelse], [])
+
+	def visit_Compare(self, node: ast.AST) -> ast.AST:
+		self.generic_visit(node)
+		if len(node.ops) == 1:
+			return node
+		# a < b < c is a < b and b < c
+		operands = [node.left, *node.comparators]
+		pairs = [ast.Compare(left, [op], [right]) for left, op, right in zip(operands, node.ops, operands[1:])]
+		return self.visit_BoolOp(ast.BoolOp(ast.And(), pairs))
+
+	def visit_BoolOp(self, node: ast.BoolOp) -> ast.Call:
+		self.generic_visit(node)
+		name = "logical_and" if isinstance(node.op, ast.And) else "logical_or"
+		call, *rest = node.values
+		for value in rest:
+			call = ast.Call(ast.Name(name, ast.Load()), [call, value], [])
+		return call
+
+
+# Code objects can't be pickled, so compiled expressions are kept here rather than in the question's _cache
+@functools.lru_cache(maxsize=256)
+def _compile(expression: str, params: Tuple[str, ...]):
+	return compile_expression(expression, dict.fromkeys(params))
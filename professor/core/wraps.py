@@ -1,9 +1,13 @@
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Optional, List, Tuple, Dict
+import functools
+import threading
+import re
 
 
 def contains(f: Callable) -> Callable:
 	"""
-	Checks if an index is within an attribute's array
+	Checks if an index is within an attribute's array. Values are located through the attribute's hash index
+	if the object lists it in 'indexed'.
 
 	"""
 	def wrap(self: object, attr: str, x: Optional[Any] = None, i: Optional[int] = None) -> bool:
@@ -14,8 +18,11 @@ def contains(f: Callable) -> Callable:
 				if -L <= i < L:
 					return f(self=self, attr=attr, x=x, i=i)
 			elif x is not None:
-				if x in arr:
+				if attr in self.indexed:
+					i = self._index(attr).first(x)
+				elif x in arr:
 					i = arr.index(x)
+				if i is not None:
 					return f(self=self, attr=attr, x=x, i=i)
 			return False
 		except ValueError:
@@ -23,9 +30,51 @@ def contains(f: Callable) -> Callable:
 	return wrap
 
 
+# Lock striping: objects share a fixed pool of locks, picked by identity
+_stripes = tuple(threading.RLock() for _ in range(64))
+
+
+def instance_lock(inst: object) -> threading.RLock:
+	"""
+	Returns the re-entrant lock guarding an object's edits. Locks are kept outside of the object
+	so it can still be copied and pickled.
+
+	"""
+	return _stripes[(id(inst) >> 4) % len(_stripes)]
+
+
+# Public editors, which run under their object's lock
+editor_pattern = re.compile(r"^((add_)|(clear_)|(delete_)|(edit_)|(insert_))")
+
+
+def locked(f: Callable) -> Callable:
+	"""
+	Runs an editor under its object's lock, so its changes and the deltas it reports don't interleave with
+	another thread's edit of the same object
+
+	"""
+	@functools.wraps(f)
+	def wrap(inst: object, *args, **kwargs):
+		with instance_lock(inst):
+			return f(inst, *args, **kwargs)
+	wrap.__locked__ = True
+	return wrap
+
+
+def lock_editors(cls: type):
+	"""
+	Makes the public editors a class defines take their object's lock. Called by EditableBase.__init_subclass__.
+
+	"""
+	for attr, value in list(vars(cls).items()):
+		if editor_pattern.match(attr) and callable(value) and not getattr(value, "__locked__", False):
+			setattr(cls, attr, locked(value))
+
+
 class Link:
 
 	__types = (bytes, str, float, int, list)
+	__values = (str, float, int, bytes, type(None))
 
 	def __init__(self, domain: str, codomain: str):
 		"""
@@ -35,25 +84,67 @@ class Link:
 			- If a 'domain' element is deleted, delete from 'codomain'
 			- If a 'domain' element is deleted from 'codomain', delete from 'domain'
 
+		The wrapped method's changes are recorded as deltas by the editors and mirrored onto the other attribute
+		through the attributes' hash indexes, so neither array is copied or diffed.
+
 		"""
 
 		self.domain = domain
 		self.codomain = codomain
-		self.logic: Optional[Callable] = None
+		# Key of the relationship in the instances' _links
+		self.key = f"{domain}:{codomain}"
+		# Relationship enforced per (class, domain type, codomain type)
+		self.logics: Dict[Tuple[type, type, type], Callable] = {}
+
+	@staticmethod
+	def _record(inst: object, f: Callable, *args, **kwargs) -> Tuple[Any, List[tuple]]:
+		"""
+		Calls f and collects the (attr, op, i, old, new) deltas its editors report
+
+		"""
+		previous = inst.__dict__.get("_deltas")
+		deltas = inst.__dict__["_deltas"] = []
+		try:
+			success = f(inst, *args, **kwargs)
+		finally:
+			if previous is None:
+				del inst.__dict__["_deltas"]
+			else:
+				previous.extend(deltas)
+				inst.__dict__["_deltas"] = previous
+		return success, deltas
+
+	@staticmethod
+	def _apply(inst: object, attr: str, op: str, i: Optional[int] = None, x: Any = None):
+		"""
+		Makes a mirrored change and reports it like the editors do
+
+		"""
+		inst._index(attr)
+		arr = inst._writable(attr)
+		old = None
+		if op == "set":
+			old = arr[i]
+			arr[i] = x
+		elif op == "append":
+			i = len(arr)
+			arr.append(x)
+		elif op == "pop":
+			old = arr.pop(i)
+		inst._changed(attr, op, i, old, x)
 
 	def _value_eq_value(self, inst: object, f: Callable, *args, **kwargs) -> bool:
 		"""
 		Assure any change to 'domain' or 'codomain' results in a change to the other
 
 		"""
-		a, b = inst.__dict__[self.domain], inst.__dict__[self.codomain]
-		success = f(inst, *args, **kwargs)
-		change = (a != inst.__dict__[self.domain]), (b != inst.__dict__[self.codomain])
+		success, deltas = self._record(inst, f, *args, **kwargs)
+		changed = {d[0] for d in deltas}
 
-		if change[0]:
-			inst.__dict__[self.codomain] = inst.__dict__[self.domain]
-		elif change[1]:
-			inst.__dict__[self.domain] = inst.__dict__[self.codomain]
+		if self.domain in changed:
+			inst._assign(self.codomain, inst.__dict__[self.domain])
+		elif self.codomain in changed:
+			inst._assign(self.domain, inst.__dict__[self.codomain])
 		return success
 
 	def _value_in_array(self, inst: object, f: Callable, *args, **kwargs) -> bool:
@@ -62,27 +153,31 @@ class Link:
 		Assure any change to 'codomain' results in a change to 'domain' if change was the 'domain' value
 
 		"""
-		a = inst.__dict__[self.domain]
-		b = inst.__dict__[self.codomain].copy()
-		b_i = b.index(a)
-
-		success = f(inst, *args, **kwargs)
-		change, diff = (a != inst.__dict__[self.domain]), (set(b) - set(inst.__dict__[self.codomain]))
-
-		if change:
-			inst.__dict__[self.codomain][b_i] = inst.__dict__[self.domain]
-		elif diff:
-			x = list(diff)[0]
-			# If change was on 'a'
-			if x == a:
+		success, deltas = self._record(inst, f, *args, **kwargs)
 
-				inverse = list(set(inst.__dict__[self.codomain]) - set(b))
-				if inverse:
-					# If it was an edit
-					inst.__dict__[self.domain] = inverse[0]
+		for attr, op, i, old, new in deltas:
+			if attr == self.domain:
+				if (new is None) or (old == new):
+					# Cleared answers leave the codomain as is
+					continue
+				index = inst._index(self.codomain)
+				j = index.first(old) if old is not None else None
+				if j is not None:
+					self._apply(inst, self.codomain, "set", j, new)
+				elif new not in index:
+					self._apply(inst, self.codomain, "append", x=new)
+			elif attr == self.codomain:
+				a = inst.__dict__[self.domain]
+				index = inst._index(self.codomain)
+				if (a is None) or (a in index):
+					continue
+				if (op == "set") & (old == a):
+					# The linked value was edited, follow it unless it merged with an existing value
+					inst.__dict__[self.domain] = new if index.count(new) == 1 else None
 				else:
-					# If it was a deletion
+					# The linked value was deleted
 					inst.__dict__[self.domain] = None
+				inst._changed(self.domain, "assign", None, a, inst.__dict__[self.domain])
 
 		return success
 
@@ -92,89 +187,144 @@ class Link:
 		Assure any change to 'codomain' results in a change to 'domain' if change was a 'domain' value
 
 		"""
-		a = inst.__dict__[self.domain].copy()
-		b = inst.__dict__[self.codomain].copy()
-
-		success = f(inst, *args, **kwargs)
-		# Specify change
-		change = inst.__dict__[self.domain] != a, inst.__dict__[self.codomain] != b
-		if change[0]:
-			# 'domain' array was affected
-			x = list(set(a) - set(inst.__dict__[self.domain]))
-			if x:
-				for val in x:
-					i = a.index(val)
-					j = b.index(val)
-					if len(a) == len(inst.__dict__[self.domain]):
+		inst._index(self.domain)
+		success, deltas = self._record(inst, f, *args, **kwargs)
+
+		for attr, op, i, old, new in deltas:
+			if attr == self.domain:
+				# 'domain' array was affected
+				dom = inst._index(self.domain)
+				cod = inst._index(self.codomain)
+				if op == "set":
+					if old == new:
+						continue
+					j = cod.first(old) if old not in dom else None
+					if j is not None:
 						# Value was edited
-						inst.__dict__[self.codomain][j] = inst.__dict__[self.domain][i]
-					else:
-						# Value was deleted
-						inst.__dict__[self.codomain].pop(j)
-						b.pop(j)
-			else:
-				# Value was added
-				# Inverse
-				x = list(set(inst.__dict__[self.domain]) - set(a))[0]
-				inst.__dict__[self.codomain].append(x)
-		elif change[1]:
-			# 'codomain' array was affected
-			x = list(set(b) - set(inst.__dict__[self.codomain]))
-			if x:
-				for val in x:
-					if val in a:
-						# Change was on a linked value
-						i = a.index(val)
-						j = b.index(val)
-						if len(b) == len(inst.__dict__[self.codomain]):
-							# Value was edited
-							inst.__dict__[self.domain][i] = inst.__dict__[self.codomain][j]
-						else:
-							# Value was deleted
-							inst.__dict__[self.domain].pop(i)
-							a.pop(i)
-				else:
-					inv = list(set(inst.__dict__[self.codomain]) - set(b))
+						self._apply(inst, self.codomain, "set", j, new)
+					elif (dom.count(new) == 1) | (new not in cod):
+						# Value was added
+						self._apply(inst, self.codomain, "append", x=new)
+				elif op in ("append", "insert"):
+					# Value was added
+					if (dom.count(new) == 1) | (new not in cod):
+						self._apply(inst, self.codomain, "append", x=new)
+				elif op == "pop":
+					# Value was deleted
+					if old not in dom:
+						j = cod.first(old)
+						if j is not None:
+							self._apply(inst, self.codomain, "pop", j)
+				elif op == "assign":
+					# Array was replaced, delete the values that were dropped
+					for val in dict.fromkeys(old or []):
+						if val not in inst._index(self.domain):
+							j = inst._index(self.codomain).first(val)
+							if j is not None:
+								self._apply(inst, self.codomain, "pop", j)
+			elif attr == self.codomain:
+				# 'codomain' array was affected
+				dom = inst._index(self.domain)
+				cod = inst._index(self.codomain)
+				if op == "set":
+					if (old != new) & (old not in cod) & (old in dom):
+						# Linked value was edited
+						self._apply(inst, self.domain, "set", dom.first(old), new)
+				elif op == "pop":
+					if (old not in cod) & (old in dom):
+						# Linked value was deleted
+						self._apply(inst, self.domain, "pop", dom.first(old))
+				elif op == "assign":
+					# Array was replaced, delete the linked values that were dropped
+					for val in dict.fromkeys(old or []):
+						if (val not in inst._index(self.codomain)) & (val in inst._index(self.domain)):
+							self._apply(inst, self.domain, "pop", inst._index(self.domain).first(val))
 
 		return success
 
-	def _resolve(self, inst: object):
-		if self.logic == self._array_in_array:
-			missing = set(inst.__dict__[self.domain]) - set(inst.__dict__[self.codomain])
-			inst.__dict__[self.codomain].extend(missing)
-		elif self.logic == self._value_in_array:
-			if inst.__dict__[self.domain] not in inst.__dict__[self.codomain]:
-				inst.__dict__[self.codomain].append(inst.__dict__[self.domain])
+	def _resolve(self, inst: object, logic: Callable):
+		"""
+		Makes an instance satisfy the relationship before its first linked edit, and again whenever its codomain
+		index has to be rebuilt (the array was replaced or reshaped outside of a linked edit)
 
-	def _set_logic(self, inst: object):
 		"""
-		Sets the relationship that will be enforced based upon the data types of
+		if logic is Link._value_eq_value:
+			return
+		indexes = inst.__dict__.get("_indexes")
+		index = indexes.get(self.codomain) if indexes else None
+		if (index is not None) and index.valid(inst.__dict__[self.codomain]):
+			return
+
+		index = inst._index(self.codomain)
+		if logic is Link._array_in_array:
+			for x in dict.fromkeys(inst.__dict__[self.domain]):
+				if x not in index:
+					self._apply(inst, self.codomain, "append", x=x)
+		elif logic is Link._value_in_array:
+			x = inst.__dict__[self.domain]
+			if (x is not None) and (x not in index):
+				self._apply(inst, self.codomain, "append", x=x)
+
+	def _select(self, key: Tuple[type, type, type]) -> Callable:
+		"""
+		Chooses the relationship that will be enforced based upon the data types of
 		the domain and codomain.
 
 		"""
-		dom_type = inst.__dict__[self.domain].__class__
-		cod_type = inst.__dict__[self.codomain].__class__
+		_, dom_type, cod_type = key
 		if dom_type == cod_type:
-			if dom_type in (str, float, int, bytes):
-				self.logic = self._value_eq_value
+			if dom_type in self.__values:
+				return Link._value_eq_value
 			elif dom_type == list:
-				self.logic = self._array_in_array
+				return Link._array_in_array
+			raise ValueError("Domain type must be str, float, int, bytes, or list")
 		else:
 			if cod_type != list:
 				raise ValueError("Codomain type must be a list or identical type to Domain")
-			elif dom_type not in (str, float, int, bytes):
+			elif dom_type not in self.__values:
 				raise ValueError("Domain type must be str, float, int, bytes, or list")
-			self.logic = self._value_in_array
+			return Link._value_in_array
 
-		self._resolve(inst)
+	def _logic(self, inst: object) -> Callable:
+		"""
+		The relationship enforced on an instance. It is selected for the instance's class and attribute types on
+		its first linked edit and kept in the instance's _links, which EditableBase._changed drops when an
+		attribute is assigned a value of another type.
+
+		"""
+		d = inst.__dict__
+		key = inst.__class__, d[self.domain].__class__, d[self.codomain].__class__
+		logic = self.logics.get(key)
+		if logic is None:
+			logic = self.logics[key] = self._select(key)
+		links = d.get("_links")
+		if links is None:
+			links = d["_links"] = {}
+		links[self.key] = logic
+		return logic
 
 	def __call__(self, f: Callable):
 		"""
 		Links two attributes so changes to one affect the other
 
 		"""
+		key = self.key
+
+		@functools.wraps(f)
 		def wrap(inst: object, *args, **kwargs):
-			if not self.logic:
-				self._set_logic(inst=inst)
-			return self.logic(inst, f, *args, **kwargs)
+			with instance_lock(inst):
+				d = inst.__dict__
+				links = d.get("_links")
+				logic = links.get(key) if links is not None else None
+				if logic is None:
+					logic = self._logic(inst)
+				journal = d.get("_journal")
+				if journal is None:
+					self._resolve(inst, logic)
+					return logic(self, inst, f, *args, **kwargs)
+				# The edit and the changes mirrored onto the other attribute are one step
+				with journal.step():
+					self._resolve(inst, logic)
+					return logic(self, inst, f, *args, **kwargs)
+		wrap.__locked__ = True
 		return wrap
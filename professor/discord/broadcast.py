@@ -0,0 +1,195 @@
+"""
+
+Broadcasting one quiz to many guilds with a shared render per question and rate-limited sending
+
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+import asyncio
+import copy
+import time
+
+from professor.utils.lazy import lazy_import
+
+discord = lazy_import("discord")
+
+
+class TokenBucket(object):
+
+	def __init__(self, rate: float, capacity: Optional[int] = None):
+		"""
+		Token bucket rate limiter
+
+		:param rate:        Tokens added per second
+		:param capacity:    Maximum tokens held at once (burst size). Defaults to rate
+
+		"""
+		self.rate: float = rate
+		self.capacity: float = capacity if capacity is not None else max(1, int(rate))
+		self.tokens: float = self.capacity
+		self.updated: float = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	def _refill(self):
+		now = time.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	async def acquire(self):
+		"""
+		Waits until a token is available and takes it
+
+		"""
+		async with self._lock:
+			self._refill()
+			while self.tokens < 1:
+				await asyncio.sleep((1 - self.tokens) / self.rate)
+				self._refill()
+			self.tokens -= 1
+
+	def pause(self, seconds: float):
+		"""
+		Empties the bucket so no token is available for the given time (e.g. after a 429 response)
+
+		"""
+		self._refill()
+		self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SendScheduler(object):
+
+	def __init__(self, rate: float = 50, channel_rate: float = 1, channel_capacity: int = 5, retries: int = 3):
+		"""
+		Sends messages behind a global token bucket and one token bucket per channel
+
+		:param rate:                Global messages per second
+		:param channel_rate:        Messages per second to a single channel
+		:param channel_capacity:    Burst size of a single channel
+		:param retries:             Attempts made after the API rate limits a send
+
+		"""
+		self.channel_rate: float = channel_rate
+		self.channel_capacity: int = channel_capacity
+		self.retries: int = retries
+		self.bucket = TokenBucket(rate)
+		self.channels: Dict[Any, TokenBucket] = {}
+
+	def channel_bucket(self, channel) -> TokenBucket:
+		key = getattr(channel, "id", channel)
+		if key not in self.channels:
+			self.channels[key] = TokenBucket(self.channel_rate, self.channel_capacity)
+		return self.channels[key]
+
+	async def send(self, channel, **kwargs) -> Optional[discord.Message]:
+		"""
+		Sends to a channel once both the channel's and the global bucket allow it
+
+		:return: The sent message or None if every attempt was rate limited
+		"""
+		bucket = self.channel_bucket(channel)
+		for _ in range(self.retries + 1):
+			await bucket.acquire()
+			await self.bucket.acquire()
+			try:
+				return await channel.send(**kwargs)
+			except discord.HTTPException as e:
+				if e.status != 429:
+					raise
+				retry_after = float(getattr(e, "retry_after", None) or 1)
+				if isinstance(e.text, str) and "global" in e.text:
+					self.bucket.pause(retry_after)
+				else:
+					bucket.pause(retry_after)
+		return None
+
+
+class BroadcastTarget(object):
+
+	def __init__(self, channel, guild: Optional[discord.Guild] = None, color: Optional[discord.Colour] = None):
+		"""
+		A channel receiving a broadcast and the guild-specific parts of its embeds
+
+		:param channel: Messageable to send to (anything with an async send)
+		:param guild:   Guild whose icon is used as thumbnail. Defaults to the channel's guild
+		:param color:   Embed colour for this guild
+
+		"""
+		self.channel = channel
+		self.guild: Optional[discord.Guild] = guild if guild is not None else getattr(channel, "guild", None)
+		self.color: Optional[discord.Colour] = color
+
+
+class Broadcast(object):
+
+	def __init__(self, targets: Iterable[BroadcastTarget], scheduler: Optional[SendScheduler] = None):
+		"""
+		Administers the same questions to many guilds. Each question is rendered once and only the
+		guild-specific fields (thumbnail and colour) are patched per target.
+
+		:param targets:     Channels to broadcast to
+		:param scheduler:   Rate-limited sender
+
+		"""
+		self.targets: List[BroadcastTarget] = list(targets)
+		self.scheduler: SendScheduler = scheduler if scheduler is not None else SendScheduler()
+
+	@staticmethod
+	def render(question) -> dict:
+		"""
+		Renders a question's user embed once to a dictionary
+
+		"""
+		return question.user_embed().to_dict()
+
+	@staticmethod
+	def patch(rendered: dict, target: BroadcastTarget) -> discord.Embed:
+		"""
+		Creates a target's embed from a shared render
+
+		"""
+		data = copy.copy(rendered)
+		if target.color is not None:
+			data["color"] = target.color.value
+		if target.guild is not None:
+			data["thumbnail"] = {"url": str(target.guild.icon_url)}
+		else:
+			# The render's thumbnail is the question's own guild
+			data.pop("thumbnail", None)
+		return discord.Embed.from_dict(data)
+
+	async def send(self, question) -> List[Union[discord.Message, BaseException, None]]:
+		"""
+		Sends a question to every target
+
+		:return: Messages sent (or exceptions raised) in target order
+		"""
+		rendered = self.render(question)
+		return await asyncio.gather(
+			*(self._send(question, rendered, target) for target in self.targets),
+			return_exceptions=True
+		)
+
+	async def run(self, quiz, interval: Optional[float] = None) -> List[List[Union[discord.Message, BaseException, None]]]:
+		"""
+		Sends every question of a quiz to every target
+
+		:param quiz:        QuizBase to administer
+		:param interval:    Seconds to wait between questions
+
+		"""
+		sent = []
+		for question in quiz:
+			sent.append(await self.send(question))
+			if interval:
+				await asyncio.sleep(interval)
+		return sent
+
+	async def _send(self, question, rendered: dict, target: BroadcastTarget) -> Optional[discord.Message]:
+		kwargs = {"embed": self.patch(rendered, target)}
+		if getattr(question, "image_pipeline", None) is not None:
+			# Transcoded bytes are cached, but a File can only be sent once
+			file = await question.image_file()
+			if file is not None:
+				kwargs["file"] = file
+		return await self.scheduler.send(target.channel, **kwargs)
@@ -0,0 +1,188 @@
+"""
+
+Resizing, compositing and encoding of question images into Discord attachments
+
+"""
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+from collections import OrderedDict
+from io import BytesIO
+import threading
+import asyncio
+import hashlib
+
+from professor.utils.lazy import lazy_import
+from professor.utils.storage import ImageStore
+
+discord = lazy_import("discord")
+
+Size = Tuple[int, int]
+Key = Tuple[str, Size, str]
+
+
+def transcode(x: bytes, size: Size, format: str, background: Tuple[int, int, int, int] = (0, 0, 0, 0)) -> bytes:
+	"""
+	Fits an image within size, centers it on a background canvas of that size and encodes it to format.
+	Runs inside worker processes, so it must stay a module-level function.
+
+	"""
+	from PIL import Image
+
+	with Image.open(BytesIO(x)) as image:
+		image = image.convert("RGBA")
+		image.thumbnail(size, Image.LANCZOS)
+		canvas = Image.new("RGBA", size, background)
+		canvas.paste(image, ((size[0] - image.width) // 2, (size[1] - image.height) // 2), image)
+
+	if format.upper() in ("JPEG", "JPG"):
+		# JPEG has no alpha channel
+		canvas = canvas.convert("RGB")
+	out = BytesIO()
+	canvas.save(out, format=format, optimize=True)
+	return out.getvalue()
+
+
+class ImagePipeline(object):
+
+	extensions = {"PNG": "png", "JPEG": "jpg", "JPG": "jpg", "WEBP": "webp", "GIF": "gif"}
+	# Inline images whose digest is remembered
+	digests_kept = 64
+
+	def __init__(
+			self,
+			size: Size = (400, 300),
+			format: str = "PNG",
+			store: Optional[ImageStore] = None,
+			executor: Optional[Executor] = None,
+			budget: int = 32 * 2**20
+	):
+		"""
+		Transcodes question images in a process pool and caches the result by (digest, size, format),
+		so every image is transcoded once no matter how many sessions display it.
+
+		:param size:        Default size images are fit to
+		:param format:      Default format images are encoded to
+		:param store:       Image store to keep transcoded images in. Otherwise they are kept in memory
+		:param executor:    Executor to transcode in. Defaults to a process pool created on first use
+		:param budget:      Maximum number of bytes of results held in memory (transcoded images, or their digests
+		                    with a store). The least recently used are dropped and transcoded again if needed.
+
+		"""
+		self.size: Size = size
+		self.format: str = format.upper()
+		self.store: Optional[ImageStore] = store
+		self.executor: Optional[Executor] = executor
+		self.budget: int = budget
+		# Bytes held in _results
+		self.held: int = 0
+		self._results: "OrderedDict[Key, Union[bytes, str]]" = OrderedDict()
+		self._pending: Dict[Key, asyncio.Future] = {}
+		# id of inline image bytes -> (the bytes, their digest). The bytes are held so the id can't be reused
+		self._digests: "OrderedDict[int, Tuple[bytes, str]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def digest(self, question) -> Optional[str]:
+		"""
+		Digest of a question's image. Stored images already carry one. Inline bytes are hashed with the store's
+		algorithm (sha256 without a store) once per bytes object, since every render asks for the digest.
+
+		"""
+		x = question.image
+		if isinstance(x, str):
+			return x
+		elif not isinstance(x, bytes):
+			return None
+		with self._lock:
+			found = self._digests.get(id(x))
+			if (found is not None) and (found[0] is x):
+				self._digests.move_to_end(id(x))
+				return found[1]
+		digest = self.store.digest(x) if self.store is not None else hashlib.sha256(x).hexdigest()
+		with self._lock:
+			self._digests[id(x)] = x, digest
+			if len(self._digests) > self.digests_kept:
+				self._digests.popitem(last=False)
+		return digest
+
+	def filename(self, digest: str, format: Optional[str] = None) -> str:
+		"""
+		Attachment name of a transcoded image. Embeds reference it as attachment://<filename>
+
+		"""
+		format = (format or self.format).upper()
+		return f"{digest[:16]}.{self.extensions.get(format, format.lower())}"
+
+	def key(self, digest: str, size: Optional[Size] = None, format: Optional[str] = None) -> Key:
+		return digest, tuple(size or self.size), (format or self.format).upper()
+
+	async def transcode(self, digest: str, x: bytes, size: Optional[Size] = None, format: Optional[str] = None) -> bytes:
+		"""
+		Transcodes an image off the event loop. Concurrent requests for the same key share one job.
+
+		"""
+		key = self.key(digest, size, format)
+		cached = self._lookup(key)
+		if cached is not None:
+			return cached
+		if key in self._pending:
+			return await asyncio.shield(self._pending[key])
+
+		loop = asyncio.get_running_loop()
+		if self.executor is None:
+			self.executor = ProcessPoolExecutor()
+		future = loop.run_in_executor(self.executor, transcode, x, key[1], key[2])
+		self._pending[key] = future
+		try:
+			result = await future
+		finally:
+			del self._pending[key]
+		self._save(key, result)
+		return result
+
+	async def attachment(self, question, size: Optional[Size] = None, format: Optional[str] = None) -> Optional[discord.File]:
+		"""
+		Creates the attachment for a question's image
+
+		:return: A discord.File or None if the question has no image
+		"""
+		digest = self.digest(question)
+		if digest is None:
+			return None
+		cached = self._lookup(self.key(digest, size, format))
+		if cached is None:
+			x = question.image_bytes
+			if x is None:
+				return None
+			cached = await self.transcode(digest, x, size, format)
+		return discord.File(BytesIO(cached), filename=self.filename(digest, format))
+
+	def shutdown(self):
+		if self.executor is not None:
+			self.executor.shutdown(wait=False)
+			self.executor = None
+
+	def _lookup(self, key: Key) -> Optional[bytes]:
+		with self._lock:
+			found = self._results.get(key)
+			if found is not None:
+				self._results.move_to_end(key)
+		if (found is None) or (self.store is None):
+			return found
+		return self.store.get(found)
+
+	def _save(self, key: Key, x: bytes):
+		# With a store, only the transcoded image's digest is kept in memory
+		value = self.store.put(x) if self.store is not None else x
+		if len(value) > self.budget:
+			return
+		with self._lock:
+			old = self._results.pop(key, None)
+			if old is not None:
+				self.held -= len(old)
+			self._results[key] = value
+			self.held += len(value)
+			while self.held > self.budget:
+				_, old = self._results.popitem(last=False)
+				self.held -= len(old)
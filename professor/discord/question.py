@@ -3,14 +3,20 @@
 Question objects wrapped and prepared for compatibility with Discord embeds
 
 """
-from typing import Dict, Optional
-import discord
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Optional
 import types
 import re
 
 from professor.core import question
+from professor.utils.lazy import lazy_import
 from professor.discord.wraps import on_change, size_enforce
 
+if TYPE_CHECKING:
+	from professor.discord.images import ImagePipeline
+
+discord = lazy_import("discord")
 
 class DiscordQuestionMeta(type):
 	editor_pattern = re.compile(r"^((_add_)|(_clear_)|(_delete_)|(_edit_)|(_insert_))")
@@ -22,20 +28,32 @@ class DiscordQuestionMeta(type):
 	Embed functions are inherited into the class.
 	"""
 
+	# Names already matched against editor_pattern
+	_editors: Dict[str, bool] = {}
+
 	def __new__(mcs, name, bases, namespace):
 		cls = type.__new__(mcs, name, bases, namespace)
 
-		for attr in dir(cls):
-			value = getattr(cls, attr)
-			if (mcs.editor_pattern.match(attr) is not None) & isinstance(value, types.FunctionType):
-				# If it matches base editor function pattern and is a method, wrap it
-				setattr(cls, attr, on_change(value))
+		seen = set()
+		for klass in cls.__mro__:
+			for attr, value in vars(klass).items():
+				if attr in seen:
+					continue
+				seen.add(attr)
+				if attr not in mcs._editors:
+					mcs._editors[attr] = mcs.editor_pattern.match(attr) is not None
+				if mcs._editors[attr] and isinstance(value, types.FunctionType) and not hasattr(value, "__on_change__"):
+					# If it matches base editor function pattern and is a method not yet wrapped, wrap it
+					setattr(cls, attr, on_change(value))
 
 		return cls
 
 
 class EmbedsMixin:
 
+	# Transcodes question images into attachments. Images are left out of embeds when unset.
+	image_pipeline: Optional[ImagePipeline] = None
+
 	def _base_embed(self) -> discord.Embed:
 		"""
 		Creates an embed containing the basic attributes
@@ -44,17 +62,27 @@ class EmbedsMixin:
 		embed = discord.Embed(
 			title=f"{self.name} Question",
 			description=self.text,
-			colour=self.color
+			colour=self.color if self.color is not None else discord.Colour.dark_theme()
 		)
 		if self.guild:
 			embed.set_thumbnail(url=self.guild.icon_url)
 
-		if self.image:
-			# TODO: Image storage and composition method
-			pass
+		if self.image and (self.image_pipeline is not None):
+			# The attachment itself is created by image_file and sent alongside the embed
+			digest = self.image_pipeline.digest(self)
+			embed.set_image(url=f"attachment://{self.image_pipeline.filename(digest)}")
 		embed.set_footer(text=f"{self.type_help}")
 		return embed
 
+	async def image_file(self) -> Optional[discord.File]:
+		"""
+		Returns the question's image as an attachment for the embed
+
+		"""
+		if self.image_pipeline is None:
+			return None
+		return await self.image_pipeline.attachment(self)
+
 	def user_embed(self) -> discord.Embed:
 		"""
 		Returns an embed displayable to a quiz-taker
@@ -79,11 +107,12 @@ class QuestionBase(question.QuestionBase, EmbedsMixin, metaclass=DiscordQuestion
 			*args,
 			fields: Optional[Dict[str, str]] = None,
 			guild: Optional[discord.Guild] = None,
-			color: discord.Colour = discord.Colour.dark_theme(),
+			color: Optional[discord.Colour] = None,
 			**kwargs
 	):
 		self.guild: discord.Guild = guild
-		self.color: discord.Colour = color
+		# Defaults to discord.Colour.dark_theme() when the embed is built
+		self.color: Optional[discord.Colour] = color
 		self.fields: Dict[str, str] = {
 			"text": "Description",
 			"help": "Total"
@@ -131,8 +160,8 @@ class MultipleChoice(QuestionBase, question.MultipleChoice, metaclass=DiscordQue
 		super(MultipleChoice, self).__init__(*args, **kwargs)
 
 	def user_embed(self) -> discord.Embed:
-		embed: discord.Embed = self._base_embed(self)
-		embed.add_field(name="Choices", value='\n'.join(f"{k}) {v}" for k, v in self.Choices), inline=False)
+		embed: discord.Embed = self._base_embed()
+		embed.add_field(name="Choices", value='\n'.join(f"{k}) {v}" for k, v in self.Choices.items()), inline=False)
 		return embed
 
 	def editor_embed(self) -> discord.Embed:
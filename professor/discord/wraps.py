@@ -1,8 +1,12 @@
-from typing import Callable, Optional, Union
-import discord
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Optional, Union
 
 from professor.utils.numeric import length
 
+if TYPE_CHECKING:
+	import discord
+
 
 class EmbedLimits(object):
 	Total = 6000
@@ -29,8 +33,12 @@ def on_change(f: Callable) -> Callable:
 	"""
 	def wrap(inst, *args, **kwargs) -> Optional[discord.Embed]:
 		success = f(inst, *args, **kwargs)
+		if inst.__dict__.get("_muted"):
+			return success
 		return inst.editor_embed() if success else None
 
+	wrap.__wrapped__ = f
+	wrap.__on_change__ = True
 	return wrap
 
 
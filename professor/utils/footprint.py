@@ -0,0 +1,241 @@
+"""
+
+Memory footprint of quizzes and question banks
+
+footprint() walks quizzes and questions and attributes the bytes they retain to question types and attributes.
+traced() measures what loading a bank allocates, with tracemalloc.
+
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from contextlib import contextmanager
+import tracemalloc
+import sys
+
+from professor.core.base import EditableBase
+
+_containers = (list, tuple, set, frozenset, dict)
+
+
+def type_name(cls: type) -> str:
+	return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class Footprint(object):
+
+	def __init__(self):
+		"""
+		Bytes retained by professor objects. Every object is counted once, under the first question type and
+		attribute it is reached from. Objects outside of professor (e.g. a discord.Guild) count their own size only.
+
+		"""
+		self.total: int = 0
+		# Instances and bytes per type
+		self.counts: Dict[str, int] = {}
+		self.types: Dict[str, int] = {}
+		# Bytes per type and attribute. '__dict__' is the instance and its attribute dictionary.
+		self.attributes: Dict[str, Dict[str, int]] = {}
+		# References to objects that were already counted, and the bytes those objects would take if copied
+		self.shared: int = 0
+		self.shared_bytes: int = 0
+		# Image bytes held by questions, and questions holding an image store digest instead
+		self.images: int = 0
+		self.image_bytes: int = 0
+		self.digests: int = 0
+		# Bytes of the rendered Discord embeds per type, if requested. They are built on demand and not retained.
+		self.embeds: Dict[str, int] = {}
+		self._seen: Set[int] = set()
+		# Value -> {id: size} of every string and bytes object, to find equal values held in distinct objects
+		self._values: Dict[Union[str, bytes], Dict[int, int]] = {}
+
+	def duplicates(self, n: Optional[int] = 10) -> List[Tuple[Union[str, bytes], int, int]]:
+		"""
+		Strings and bytes stored more than once with the same value
+
+		:param n:   Number returned, most wasteful first (all if None)
+		:return:    (value, copies, bytes taken by the extra copies)
+		"""
+		found = []
+		for value, copies in self._values.items():
+			if len(copies) > 1:
+				sizes = sorted(copies.values())
+				found.append((value, len(copies), sum(sizes[:-1])))
+		found.sort(key=lambda x: x[2], reverse=True)
+		return found if n is None else found[:n]
+
+	@property
+	def duplicated(self) -> int:
+		"""
+		Bytes that deduplicating equal strings and bytes would save
+
+		"""
+		return sum(wasted for _, _, wasted in self.duplicates(n=None))
+
+	def as_dict(self) -> dict:
+		return {
+			"total": self.total,
+			"types": {name: {"count": self.counts[name], "bytes": size, "attributes": self.attributes[name]} for name, size in self.types.items()},
+			"shared": {"references": self.shared, "bytes": self.shared_bytes},
+			"duplicated": self.duplicated,
+			"images": {"count": self.images, "bytes": self.image_bytes, "digests": self.digests},
+			"embeds": self.embeds,
+		}
+
+	def report(self, n: int = 10) -> str:
+		"""
+		Human-readable summary, with the n largest attributes per type and the n most wasteful duplicates
+
+		"""
+		lines = [f"Total retained: {self.total:,} bytes"]
+		for name, size in sorted(self.types.items(), key=lambda x: x[1], reverse=True):
+			lines.append(f"  {name} x{self.counts[name]:,}: {size:,} bytes ({size // self.counts[name]:,} per object)")
+			for attr, attr_size in sorted(self.attributes[name].items(), key=lambda x: x[1], reverse=True)[:n]:
+				lines.append(f"    {attr:<20} {attr_size:>14,}")
+		lines.append(f"Shared: {self.shared:,} references to objects already counted ({self.shared_bytes:,} bytes not duplicated)")
+		lines.append(f"Duplicated: {self.duplicated:,} bytes in equal strings and bytes held separately")
+		for value, copies, wasted in self.duplicates(n):
+			if isinstance(value, bytes):
+				shown = f"<{len(value):,} bytes>"
+			else:
+				shown = repr(value[:40]) + ("..." if len(value) > 40 else "")
+			lines.append(f"  {copies:>6,} copies {wasted:>12,} bytes  {shown}")
+		lines.append(f"Images: {self.images:,} held ({self.image_bytes:,} bytes), {self.digests:,} stored as digests")
+		for name, size in self.embeds.items():
+			lines.append(f"Embeds of {name}: {size:,} bytes when rendered")
+		return "\n".join(lines)
+
+	def add(self, obj: EditableBase, embeds: bool = False):
+		"""
+		Walks a professor object and the professor objects it holds
+
+		"""
+		pending = [obj]
+		while pending:
+			inst = pending.pop()
+			if id(inst) in self._seen:
+				self._reuse(inst)
+				continue
+			self._seen.add(id(inst))
+			name = type_name(inst.__class__)
+			self.counts[name] = self.counts.get(name, 0) + 1
+			attributes = self.attributes.setdefault(name, {})
+
+			size = sys.getsizeof(inst) + self._deep(inst.__dict__, pending, shallow=True)
+			attributes["__dict__"] = attributes.get("__dict__", 0) + size
+			total = size
+			for attr, value in inst.__dict__.items():
+				size = self._deep(value, pending)
+				attributes[attr] = attributes.get(attr, 0) + size
+				total += size
+				if attr == "image":
+					if isinstance(value, bytes):
+						self.images += 1
+						self.image_bytes += len(value)
+					elif isinstance(value, str) and (getattr(inst, "image_store", None) is not None):
+						self.digests += 1
+			self.types[name] = self.types.get(name, 0) + total
+			self.total += total
+
+			if embeds and hasattr(inst, "editor_embed"):
+				# Embeds are new objects, walked apart from the retained ones
+				rendered = Footprint()
+				size = rendered._deep(inst.user_embed().to_dict(), []) + rendered._deep(inst.editor_embed().to_dict(), [])
+				self.embeds[name] = self.embeds.get(name, 0) + size
+
+	def _reuse(self, obj: Any):
+		self.shared += 1
+		self.shared_bytes += sys.getsizeof(obj)
+
+	def _deep(self, obj: Any, pending: List[EditableBase], shallow: bool = False) -> int:
+		"""
+		Bytes of obj and the containers, strings and bytes it holds that were not counted yet.
+		Professor objects are queued in pending to be attributed to their own type.
+
+		:param shallow: Only count the container itself
+
+		"""
+		size = 0
+		stack = [obj]
+		while stack:
+			x = stack.pop()
+			if isinstance(x, EditableBase):
+				pending.append(x)
+				continue
+			if id(x) in self._seen:
+				self._reuse(x)
+				continue
+			self._seen.add(id(x))
+			size += sys.getsizeof(x)
+			if isinstance(x, (str, bytes)):
+				self._values.setdefault(x, {})[id(x)] = sys.getsizeof(x)
+			elif shallow:
+				shallow = False
+			elif isinstance(x, dict):
+				stack.extend(x.keys())
+				stack.extend(x.values())
+			elif isinstance(x, _containers):
+				stack.extend(x)
+		return size
+
+
+def footprint(objs: Union[EditableBase, Iterable[EditableBase]], embeds: bool = False) -> Footprint:
+	"""
+	Retained bytes of a quiz, a question or a bank (any iterable of them)
+
+	:param embeds:  Also render each Discord question's user and editor embeds and report their size
+
+	"""
+	result = Footprint()
+	for obj in ([objs] if isinstance(objs, EditableBase) else objs):
+		result.add(obj, embeds=embeds)
+	return result
+
+
+class Traced(object):
+
+	def __init__(self):
+		"""
+		Memory allocated inside a traced() block and still alive at its end
+
+		"""
+		self.size: int = 0
+		self.count: int = 0
+		self.peak: int = 0
+		self.statistics: List[tracemalloc.StatisticDiff] = []
+
+	def top(self, n: int = 10) -> List[tracemalloc.StatisticDiff]:
+		return self.statistics[:n]
+
+	def report(self, n: int = 10) -> str:
+		lines = [f"Allocated: {self.size:,} bytes in {self.count:,} blocks (peak {self.peak:,} bytes)"]
+		lines.extend(f"  {stat}" for stat in self.top(n))
+		return "\n".join(lines)
+
+
+@contextmanager
+def traced(group_by: str = "lineno", frames: int = 1) -> Iterator[Traced]:
+	"""
+	Compares tracemalloc snapshots taken before and after the block, e.g. around loading a bank.
+	Counts every allocation of the process, not only professor's, so keep other work out of the block.
+
+	:param group_by:    'lineno', 'filename' or 'traceback'
+	:param frames:      Frames kept per allocation (more are needed to group by traceback)
+
+	"""
+	result = Traced()
+	started = not tracemalloc.is_tracing()
+	if started:
+		tracemalloc.start(frames)
+	tracemalloc.reset_peak()
+	before = tracemalloc.take_snapshot()
+	try:
+		yield result
+	finally:
+		after = tracemalloc.take_snapshot()
+		_, result.peak = tracemalloc.get_traced_memory()
+		if started:
+			tracemalloc.stop()
+		# Leave out tracemalloc's own allocations
+		ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+		result.statistics = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), group_by)
+		result.size = sum(stat.size_diff for stat in result.statistics)
+		result.count = sum(stat.count_diff for stat in result.statistics)
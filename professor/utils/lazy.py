@@ -0,0 +1,27 @@
+"""
+
+Deferred imports for heavy optional dependencies
+
+"""
+import importlib.util
+import types
+import sys
+
+
+def lazy_import(name: str) -> types.ModuleType:
+	"""
+	Returns a module that is only executed on first attribute access.
+	Raises ModuleNotFoundError immediately if the module is not installed.
+
+	"""
+	if name in sys.modules:
+		return sys.modules[name]
+	spec = importlib.util.find_spec(name)
+	if spec is None:
+		raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+	loader = importlib.util.LazyLoader(spec.loader)
+	spec.loader = loader
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	loader.exec_module(module)
+	return module
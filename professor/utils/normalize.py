@@ -0,0 +1,98 @@
+"""
+
+Normalization of free responses and answers before they are compared
+
+"""
+from typing import Callable, Dict, Tuple, Union
+import unicodedata
+import re
+
+# Runs of punctuation and whitespace
+_separators = re.compile(r"[\W_]+")
+ARTICLES = ("the ", "an ", "a ")
+
+
+def nfkc(s: str) -> str:
+	"""
+	Unicode compatibility composition, e.g. full-width letters and ligatures to their plain forms
+
+	"""
+	# ASCII is already NFKC
+	return s if s.isascii() else unicodedata.normalize("NFKC", s)
+
+
+def casefold(s: str) -> str:
+	return s.casefold()
+
+
+def whitespace(s: str) -> str:
+	"""
+	Collapses runs of whitespace and trims the ends
+
+	"""
+	return " ".join(s.split())
+
+
+def collapse(s: str) -> str:
+	"""
+	Replaces punctuation with spaces, then collapses runs of whitespace and trims the ends
+
+	"""
+	if s.isalnum():
+		return s
+	return _separators.sub(" ", s).strip()
+
+
+def strip_articles(s: str) -> str:
+	"""
+	Removes a leading 'the', 'a' or 'an'. Run it after casefold and collapse.
+
+	"""
+	if " " not in s:
+		return s
+	for article in ARTICLES:
+		if s.startswith(article):
+			return s[len(article):]
+	return s
+
+
+# Steps by name, for configuring a Normalizer from text (e.g. a bot command)
+STEPS: Dict[str, Callable[[str], str]] = {
+	"nfkc": nfkc,
+	"casefold": casefold,
+	"whitespace": whitespace,
+	"collapse": collapse,
+	"articles": strip_articles,
+}
+
+
+class Normalizer(object):
+
+	def __init__(self, *steps: Union[str, Callable[[str], str]]):
+		"""
+		Chain of string transformations applied in order
+
+		:param steps:   Functions of one string, or names from STEPS
+
+		"""
+		self.steps: Tuple[Callable[[str], str], ...] = tuple(STEPS[step] if isinstance(step, str) else step for step in steps)
+
+	def __call__(self, s: str) -> str:
+		for step in self.steps:
+			s = step(s)
+		return s
+
+	def __eq__(self, other) -> bool:
+		return isinstance(other, Normalizer) and (self.steps == other.steps)
+
+	def __hash__(self) -> int:
+		return hash(self.steps)
+
+	def __repr__(self) -> str:
+		names = {f: name for name, f in STEPS.items()}
+		return f"Normalizer({', '.join(repr(names.get(step, step.__name__)) for step in self.steps)})"
+
+
+# Applied to free responses unless a question sets its own. Punctuation and articles are significant unless a
+# question opts in to "collapse" and "articles" (e.g. Normalizer("nfkc", "casefold", "collapse", "articles")).
+default = Normalizer("nfkc", "casefold", "whitespace")
@@ -20,10 +20,12 @@ def length(*args, **kwargs) -> int:
 
 def numeric_string(string: str) -> Optional[Union[int, float]]:
 	"""
-	Converts a string to integer or float form (or none)
+	Converts a string to integer or float form (or none). Numbers are returned as they are.
 
 	"""
 
+	if isinstance(string, (int, float)) and not isinstance(string, bool):
+		return string
 	if string.isnumeric():
 		return int(string)
 	else:
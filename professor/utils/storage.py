@@ -0,0 +1,157 @@
+"""
+
+Content-addressed storage for question images
+
+"""
+
+from typing import Optional, Union, Iterator
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import hashlib
+import string
+import os
+
+
+_hex = frozenset(string.hexdigits.lower())
+
+
+class ImageStore(object):
+
+	def __init__(self, root: Union[str, Path], budget: int = 64 * 2**20, algorithm: str = "sha256"):
+		"""
+		Content-addressed image store on local disk. Images are saved once per digest and only read back when
+		requested. Recently used images are held in memory until their total size exceeds the budget.
+
+		:param root:        Directory the images are stored in
+		:param budget:      Maximum number of image bytes held in memory
+		:param algorithm:   hashlib algorithm used for digests
+
+		"""
+		self.root: Path = Path(root)
+		self.budget: int = budget
+		self.algorithm: str = algorithm
+		# Number of hex characters in a digest
+		self.digest_length: int = 2 * hashlib.new(algorithm).digest_size
+		self.size: int = 0
+		self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.root.mkdir(parents=True, exist_ok=True)
+
+	def __contains__(self, digest: str) -> bool:
+		return self.valid(digest) and self.path(digest).is_file()
+
+	def __iter__(self) -> Iterator[str]:
+		"""
+		Generator for the digests of every stored image
+
+		"""
+		for path in self.root.glob("??/*"):
+			if path.is_file() and not path.name.endswith(".tmp"):
+				yield path.name
+
+	def digest(self, x: bytes) -> str:
+		"""
+		Computes the digest an image is stored under
+
+		"""
+		return hashlib.new(self.algorithm, x).hexdigest()
+
+	def valid(self, digest: str) -> bool:
+		"""
+		True if digest is a hex digest of the store's algorithm, so it can't name a path outside of the store
+
+		"""
+		return isinstance(digest, str) and (len(digest) == self.digest_length) and set(digest).issubset(_hex)
+
+	def path(self, digest: str) -> Path:
+		"""
+		Location of an image on disk. Images are sharded by the first two characters of the digest.
+
+		:raises ValueError: If digest is not a valid digest
+		"""
+		if not self.valid(digest):
+			raise ValueError(f"Not a {self.algorithm} digest: {digest!r}")
+		return self.root / digest[:2] / digest
+
+	def put(self, x: bytes) -> str:
+		"""
+		Stores an image if it is not already stored
+
+		:return: The image's digest
+		"""
+		digest = self.digest(x)
+		path = self.path(digest)
+		if not path.is_file():
+			path.parent.mkdir(exist_ok=True)
+			tmp = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+			with open(tmp, "wb") as f:
+				f.write(x)
+			# Atomic, so concurrent writers of the same image cannot leave a partial file
+			os.replace(tmp, path)
+		return digest
+
+	def get(self, digest: str) -> Optional[bytes]:
+		"""
+		Loads an image from memory, or from disk if it has been evicted
+
+		:return: The image's bytes or None if the digest is not stored
+		"""
+		with self._lock:
+			if digest in self._cache:
+				self._cache.move_to_end(digest)
+				return self._cache[digest]
+
+		if not self.valid(digest):
+			return None
+		try:
+			x = self.path(digest).read_bytes()
+		except FileNotFoundError:
+			return None
+
+		self._remember(digest, x)
+		return x
+
+	def delete(self, digest: str) -> bool:
+		"""
+		Removes an image from memory and disk
+
+		:return: True if successful
+		"""
+		self.evict(digest)
+		if not self.valid(digest):
+			return False
+		try:
+			self.path(digest).unlink()
+			return True
+		except FileNotFoundError:
+			return False
+
+	def evict(self, digest: Optional[str] = None):
+		"""
+		Drops an image (or every image if no digest is given) from memory. Disk copies are kept.
+
+		"""
+		with self._lock:
+			if digest is None:
+				self._cache.clear()
+				self.size = 0
+			elif digest in self._cache:
+				self.size -= len(self._cache.pop(digest))
+
+	def _remember(self, digest: str, x: bytes):
+		"""
+		Caches an image and evicts the least recently used images until the cache is within budget
+
+		"""
+		if len(x) > self.budget:
+			return
+		with self._lock:
+			if digest in self._cache:
+				self._cache.move_to_end(digest)
+				return
+			self._cache[digest] = x
+			self.size += len(x)
+			while self.size > self.budget:
+				_, old = self._cache.popitem(last=False)
+				self.size -= len(old)
@@ -0,0 +1,27 @@
+import sys
+
+import pytest
+
+from benchmarks import discord_stub
+
+
+def _discord_module(name: str) -> bool:
+	return (name == "discord") or name.startswith("discord.") or name.startswith("professor.discord")
+
+
+@pytest.fixture
+def discord():
+	"""
+	Installs the discord stub for one test. The stub and the professor.discord modules imported against it are
+	removed afterwards, so other tests see the modules they would have seen without it.
+
+	"""
+	saved = {name: module for name, module in sys.modules.items() if _discord_module(name)}
+	for name in saved:
+		del sys.modules[name]
+	try:
+		yield discord_stub.install()
+	finally:
+		for name in [name for name in sys.modules if _discord_module(name)]:
+			del sys.modules[name]
+		sys.modules.update(saved)
@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def broadcast(discord):
+	from professor.discord import broadcast
+	return broadcast
+
+
+class FakeChannel(object):
+
+	def __init__(self, id: int, limited: int = 0, text: str = "You are being rate limited."):
+		"""
+		Records every send. The first limited sends are answered with a 429.
+
+		"""
+		self.id: int = id
+		self.guild = SimpleNamespace(id=id, icon_url=f"https://cdn.example.com/icons/{id}.png")
+		self.limited: int = limited
+		self.text: str = text
+		self.attempts: list = []
+		self.sent: list = []
+
+	async def send(self, **kwargs):
+		import discord
+		self.attempts.append(time.monotonic())
+		if self.limited:
+			self.limited -= 1
+			raise discord.HTTPException(429, self.text, retry_after=0.05)
+		self.sent.append(kwargs)
+		return kwargs
+
+
+class FakeQuestion(object):
+
+	def __init__(self):
+		self.renders = 0
+
+	def user_embed(self):
+		import discord
+		self.renders += 1
+		embed = discord.Embed(title="Question", description="Capital of France?")
+		embed.set_thumbnail(url="https://cdn.example.com/icons/0.png")
+		return embed
+
+
+def test_retries_after_429(broadcast):
+	async def run():
+		scheduler = broadcast.SendScheduler(rate=100, channel_rate=100, channel_capacity=10)
+		channel = FakeChannel(1, limited=1)
+		message = await scheduler.send(channel, content="hi")
+		return scheduler, channel, message
+
+	scheduler, channel, message = asyncio.run(run())
+	assert message == {"content": "hi"}
+	assert len(channel.attempts) == 2
+	# The channel's bucket waited out retry_after before the second attempt
+	assert channel.attempts[1] - channel.attempts[0] >= 0.04
+	assert scheduler.bucket.tokens > 0
+
+
+def test_global_429_pauses_every_channel(broadcast):
+	async def run():
+		scheduler = broadcast.SendScheduler(rate=100, channel_rate=100, channel_capacity=10)
+		limited = FakeChannel(1, limited=1, text="global rate limit")
+		await scheduler.send(limited, content="a")
+		return scheduler, limited
+
+	scheduler, limited = asyncio.run(run())
+	assert len(limited.attempts) == 2
+	# The global bucket waited out retry_after, the channel's bucket was left alone
+	assert limited.attempts[1] - limited.attempts[0] >= 0.04
+	assert scheduler.channels[1].tokens >= 7
+
+
+def test_gives_up_after_retries(broadcast):
+	async def run():
+		scheduler = broadcast.SendScheduler(rate=100, channel_rate=100, channel_capacity=10, retries=2)
+		channel = FakeChannel(1, limited=5)
+		return await scheduler.send(channel, content="hi"), channel
+
+	message, channel = asyncio.run(run())
+	assert message is None
+	assert len(channel.attempts) == 3
+	assert channel.sent == []
+
+
+def test_other_errors_are_raised(discord, broadcast):
+	class Broken(FakeChannel):
+		async def send(self, **kwargs):
+			raise discord.HTTPException(403, "Missing Permissions")
+
+	with pytest.raises(discord.HTTPException):
+		asyncio.run(broadcast.SendScheduler().send(Broken(1), content="hi"))
+
+
+def test_channels_have_their_own_buckets(broadcast):
+	async def run():
+		scheduler = broadcast.SendScheduler(rate=1000, channel_rate=10, channel_capacity=1)
+		first, second = FakeChannel(1), FakeChannel(2)
+		await asyncio.gather(*(scheduler.send(channel, content=str(k)) for k in range(2) for channel in (first, second)))
+		return scheduler, first, second
+
+	scheduler, first, second = asyncio.run(run())
+	assert set(scheduler.channels) == {1, 2}
+	# One burst token per channel: each channel's second send waits for a refill, but not for the other channel
+	for channel in (first, second):
+		assert len(channel.sent) == 2
+		assert channel.attempts[1] - channel.attempts[0] >= 0.08
+	assert abs(first.attempts[0] - second.attempts[0]) < 0.05
+
+
+def test_broadcast_renders_once_and_patches_each_target(discord, broadcast):
+	async def run():
+		channels = [FakeChannel(1), FakeChannel(2), FakeChannel(3)]
+		# A channel without a guild, e.g. a DM
+		channels[2].guild = None
+		targets = [
+			broadcast.BroadcastTarget(channels[0], color=discord.Colour(0xFF0000)),
+			broadcast.BroadcastTarget(channels[1]),
+			broadcast.BroadcastTarget(channels[2]),
+		]
+		question = FakeQuestion()
+		sent = await broadcast.Broadcast(targets, broadcast.SendScheduler(rate=100)).send(question)
+		return channels, question, sent
+
+	channels, question, sent = asyncio.run(run())
+	assert question.renders == 1
+	assert len(sent) == 3
+	first, second, third = (channel.sent[0]["embed"].to_dict() for channel in channels)
+	assert first["title"] == second["title"] == third["title"] == "Question"
+	assert first["thumbnail"] == {"url": "https://cdn.example.com/icons/1.png"}
+	assert second["thumbnail"] == {"url": "https://cdn.example.com/icons/2.png"}
+	# The question's own thumbnail is not copied to a target without a guild
+	assert "thumbnail" not in third
+	assert first["color"] == 0xFF0000
+	assert "color" not in second
+
+
+def test_failed_sends_are_returned(discord, broadcast):
+	class Broken(FakeChannel):
+		async def send(self, **kwargs):
+			raise discord.HTTPException(403, "Missing Permissions")
+
+	targets = [broadcast.BroadcastTarget(FakeChannel(1)), broadcast.BroadcastTarget(Broken(2))]
+	sent = asyncio.run(broadcast.Broadcast(targets, broadcast.SendScheduler(rate=100)).send(FakeQuestion()))
+	assert isinstance(sent[1], discord.HTTPException)
+	assert sent[0]["embed"].to_dict()["title"] == "Question"
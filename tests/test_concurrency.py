@@ -0,0 +1,20 @@
+from professor.core.concurrency import concurrent
+from professor.core import question
+
+
+def test_type_change_leaves_snapshot_alone():
+	q = concurrent(question.MultipleChoice)(choices=["a", "b"], answer="a", shuffle=False)
+	snapshot = q.snapshot()
+	assert q.edit_type(question.MultipleResponse, answer=["c"])
+	assert snapshot.choices == ["a", "b"]
+	assert q.choices == ["a", "b", "c"]
+
+
+def test_readers_use_the_snapshot_class():
+	q = concurrent(question.MultipleChoice)(choices=["a", "b"], answer="a", shuffle=False)
+	snapshot = q.snapshot()
+	# As seen by a reader between the class swap and the next publish
+	q.__class__ = concurrent(question.FreeResponse)
+	q.__dict__["_published"] = snapshot
+	assert q.check("a")
+	assert not q.check("b")
@@ -0,0 +1,51 @@
+import csv
+import json
+
+from professor.core.base import QuizBase
+from professor.core.grading import ResultWriter, grade
+from professor.core.question import FreeResponse
+
+
+def test_results_name_their_source(tmp_path):
+	quiz = QuizBase(id="q", questions=[FreeResponse(id=1, answer="Paris")])
+	first, second = tmp_path / "first.jsonl", tmp_path / "second.csv"
+	with open(first, "w") as f:
+		for response in ("Paris", "Rome"):
+			f.write(json.dumps({"quiz": "q", "question": 1, "player": "p", "response": response}) + "\n")
+	with open(second, "w", newline="") as f:
+		csv.writer(f).writerows([("quiz", "question", "player", "response"), ("q", "1", "r", "Lyon")])
+
+	for workers in (0, 1):
+		out = tmp_path / f"results{workers}.csv"
+		with ResultWriter(out) as sink:
+			done = grade([first, second], {"q": quiz}, sink, workers=workers)
+		assert done.graded == 3
+		with open(out, newline="") as f:
+			rows = sorted((r["source"], r["row"], r["correct"]) for r in csv.DictReader(f))
+		assert rows == [(str(first), "0", "True"), (str(first), "1", "False"), (str(second), "0", "False")]
+
+
+def test_malformed_records_are_reported(tmp_path):
+	quiz = QuizBase(id="q", questions=[FreeResponse(id=1, answer="Paris")])
+	first, second = tmp_path / "first.jsonl", tmp_path / "second.csv"
+	with open(first, "w") as f:
+		f.write(json.dumps({"quiz": "q", "question": 1, "player": "p", "response": "Paris"}) + "\n")
+		f.write(json.dumps({"quiz": "q", "question": 1, "response": "Paris"}) + "\n")
+		f.write("{not json\n")
+		f.write(json.dumps({"quiz": "q", "question": 1, "player": "r", "response": "Rome"}) + "\n")
+	with open(second, "w", newline="") as f:
+		csv.writer(f).writerows([("q", "1", "p", "Paris"), ("q", "1", "extra", "Paris", "column"), ("q", "1", "r", "Paris")])
+
+	for workers in (0, 1):
+		results = []
+		done = grade([first, second], {"q": quiz}, results.extend, workers=workers)
+		assert (done.read, done.graded, done.errors) == (7, 7, 3)
+		verdicts = sorted((r.source, r.row, r.correct) for r in results)
+		assert verdicts == [
+			(str(first), 0, True), (str(first), 1, None), (str(first), 2, None), (str(first), 3, False),
+			(str(second), 0, True), (str(second), 1, None), (str(second), 2, True),
+		]
+		errors = {(r.source, r.row): r.error for r in results if r.error}
+		assert errors[str(first), 1] == "malformed record: KeyError: 'player'"
+		assert errors[str(first), 2].startswith("malformed record: JSONDecodeError")
+		assert errors[str(second), 1] == "malformed record: 5 fields instead of 4"
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from professor.core.base import QuizBase
+from professor.core.host import ShardHost, WorkerError
+from professor.core.question import FreeResponse
+
+
+class Locked(Exception):
+
+	def __init__(self):
+		super().__init__("locked")
+		self.lock = threading.Lock()
+
+
+class Raising(FreeResponse):
+
+	def grader(self):
+		def grade(x: str) -> bool:
+			raise Locked()
+		return grade
+
+
+def quizzes():
+	questions = [FreeResponse(id=k, text=f"Question {k}", answer=f"answer {k}") for k in range(3)]
+	return {
+		"exam": QuizBase(id="exam", questions=questions, size=3),
+		"raising": QuizBase(id="raising", questions=[Raising(id=0, text="?", answer="a")], size=1),
+	}
+
+
+def wait_for_restart(host: ShardHost, restarts: int):
+	deadline = time.monotonic() + 10
+	while (host.restarts < restarts) and (time.monotonic() < deadline):
+		time.sleep(0.05)
+	assert host.restarts == restarts
+
+
+def test_session_through_a_worker():
+	with ShardHost(quizzes(), workers=1) as host:
+		first = host.begin("guild", "exam", seed=1).result(5)
+		answer = first["text"].replace("Question", "answer")
+		assert host.answer("guild", "p1", answer, 1.0).result(5) is True
+		assert host.answer("guild", "p2", "wrong", 2.0).result(5) is False
+		assert host.answer("guild", "p1", answer, 3.0).result(5) is None
+		second = host.advance("guild").result(5)
+		assert second["id"] != first["id"]
+
+		state = host.state("guild")
+		assert (state.quiz, state.seed, state.position, state.answered) == ("exam", 1, 1, ())
+		standings = host.end("guild").result(5)
+		assert [s.player for s in standings] == ["p1", "p2"]
+		assert host.state("guild") is None
+
+
+def test_restarted_worker_restores_sessions():
+	with ShardHost(quizzes(), workers=1) as host:
+		first = host.begin("guild", "exam", seed=2).result(5)
+		second = host.advance("guild").result(5)
+		answer = second["text"].replace("Question", "answer")
+		assert host.answer("guild", "p1", answer).result(5) is True
+		before = host.state("guild")
+
+		host._processes[0].kill()
+		wait_for_restart(host, 1)
+		assert host.state("guild") == before
+		# The restored session is still on its second question, and p1 has answered it
+		assert host.answer("guild", "p1", answer).result(5) is None
+		assert host.answer("guild", "p2", answer).result(5) is True
+		third = host.advance("guild").result(5)
+		assert third["id"] not in (first["id"], second["id"])
+		assert [s.player for s in host.end("guild").result(5)] == ["p1", "p2"]
+
+
+def test_unpicklable_exceptions_are_raised():
+	with ShardHost(quizzes(), workers=1) as host:
+		host.begin("guild", "raising").result(5)
+		with pytest.raises(WorkerError, match="Locked"):
+			host.answer("guild", "p1", "a").result(5)
+		with pytest.raises(KeyError):
+			host.advance("nobody").result(5)
+		# The worker is still serving
+		assert host.advance("guild").result(5) is None
+
+
+def test_unpicklable_results_fail_their_request():
+	with ShardHost(quizzes(), workers=1, render=lambda question: threading.Lock()) as host:
+		with pytest.raises(WorkerError, match="could not be sent"):
+			host.begin("guild", "exam").result(5)
+		assert host.answer("guild", "p1", "a").result(5) is False
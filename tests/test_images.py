@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+import hashlib
+
+import pytest
+
+from professor.utils.storage import ImageStore
+
+
+@pytest.fixture
+def ImagePipeline(discord):
+	from professor.discord.images import ImagePipeline
+	return ImagePipeline
+
+
+def test_inline_digests_are_hashed_once(ImagePipeline, monkeypatch):
+	pipeline = ImagePipeline()
+	question = SimpleNamespace(image=b"not really a png")
+	calls = []
+	sha256 = hashlib.sha256
+	monkeypatch.setattr(hashlib, "sha256", lambda x: calls.append(x) or sha256(x))
+
+	digest = pipeline.digest(question)
+	assert digest == sha256(b"not really a png").hexdigest()
+	assert pipeline.digest(question) == digest
+	assert len(calls) == 1
+
+	# Equal contents in a new object are hashed again, and give the same digest
+	question.image = bytes(bytearray(b"not really a png"))
+	assert pipeline.digest(question) == digest
+	assert len(calls) == 2
+
+
+def test_digests_use_the_store_algorithm(ImagePipeline, tmp_path):
+	pipeline = ImagePipeline(store=ImageStore(tmp_path, algorithm="blake2b"))
+	assert pipeline.digest(SimpleNamespace(image=b"x")) == hashlib.blake2b(b"x").hexdigest()
+	assert pipeline.digest(SimpleNamespace(image="abc")) == "abc"
+	assert pipeline.digest(SimpleNamespace(image=None)) is None
+
+
+def test_results_are_bounded_without_a_store(ImagePipeline):
+	pipeline = ImagePipeline(budget=10)
+	keys = [pipeline.key(str(k)) for k in range(4)]
+	for key in keys[:3]:
+		pipeline._save(key, b"xxxx")
+	# The oldest result was dropped to stay within the budget
+	assert pipeline._lookup(keys[0]) is None
+	assert pipeline._lookup(keys[1]) == b"xxxx"
+	pipeline._save(keys[3], b"yyyy")
+	# keys[1] was used more recently than keys[2]
+	assert pipeline._lookup(keys[2]) is None
+	assert pipeline._lookup(keys[1]) == b"xxxx"
+	assert pipeline.held == 8
+	# Results larger than the budget are not held
+	pipeline._save(keys[0], b"z" * 11)
+	assert pipeline._lookup(keys[0]) is None
+
+
+def test_results_in_a_store_hold_digests(ImagePipeline, tmp_path):
+	pipeline = ImagePipeline(store=ImageStore(tmp_path))
+	key = pipeline.key("a")
+	pipeline._save(key, b"transcoded")
+	assert pipeline._results[key] == pipeline.store.digest(b"transcoded")
+	assert pipeline._lookup(key) == b"transcoded"
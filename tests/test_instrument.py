@@ -0,0 +1,107 @@
+import os
+import re
+
+import pytest
+
+from professor.core import instrument
+from professor.core.base import QuestionBase
+from professor.core.question import FreeResponse, MultipleChoice
+
+sample = re.compile(r'^(\w+)\{((?:\w+="[^"]*",?)+)\} (\S+)$')
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+	"""
+	Instrumentation enabled with empty counters, as they were afterwards
+
+	"""
+	monkeypatch.setattr(instrument, "_enabled", True)
+	monkeypatch.setattr(instrument, "_stats", {})
+	return instrument
+
+
+def question_type():
+	class Probe(QuestionBase):
+
+		def check(self, x: str) -> bool:
+			if x is None:
+				raise ValueError("no response")
+			return x == self.answer
+
+		def edit_answer(self, x: str, i=None) -> bool:
+			return self._edit_string(x=x, attr="answer")
+
+	return Probe
+
+
+@pytest.mark.skipif(os.environ.get("PROFESSOR_INSTRUMENT", "") not in ("", "0"), reason="instrumentation is enabled")
+def test_off_by_default():
+	assert not instrument.enabled()
+	for method in (FreeResponse.check, FreeResponse.edit_answer, MultipleChoice.edit_choice, MultipleChoice.add_choice):
+		assert not instrument.is_instrumented(method)
+	FreeResponse(answer="Paris").check("Paris")
+	assert instrument.snapshot() == {}
+
+
+def test_wrapped_methods_return_their_result(enabled):
+	Probe = question_type()
+	assert instrument.is_instrumented(Probe.check)
+	q = Probe(answer="a")
+	assert q.check("a") is True
+	assert q.check("b") is False
+	with pytest.raises(ValueError):
+		q.check(None)
+	assert q.edit_answer("b") is True
+	assert q.edit_answer(1) is False
+	assert q.answer == "b"
+
+	stats = instrument.snapshot()
+	prefix = f"{Probe.__module__}.{Probe.__qualname__}"
+	check, edit = stats[f"{prefix}.check"], stats[f"{prefix}.edit_answer"]
+	assert (check["kind"], check["calls"], check["errors"], check["failures"]) == ("check", 3, 1, 0)
+	# Checks returning False are not editor failures
+	assert (edit["kind"], edit["calls"], edit["errors"], edit["failures"]) == ("edit", 2, 0, 1)
+	assert sum(check["buckets"].values()) == 3
+	assert check["seconds"] > 0
+
+
+def test_prometheus_output(enabled):
+	Probe = question_type()
+	q = Probe(answer="a")
+	for x in ("a", "b", "a"):
+		q.check(x)
+	q.edit_answer("c")
+
+	text = enabled.prometheus("quiz")
+	assert text.endswith("\n")
+	lines = text.splitlines()
+	declared = None
+	buckets = {}
+	counts = {}
+	for line in lines:
+		if line.startswith("#"):
+			_, kind, name, metric = line.split()
+			assert (kind, metric) in (("TYPE", "counter"), ("TYPE", "histogram"))
+			declared = name
+			continue
+		match = sample.match(line)
+		assert match is not None, line
+		name, labels, value = match.groups()
+		assert name.startswith(declared)
+		assert float(value) >= 0
+		if name == "quiz_latency_seconds_bucket":
+			series, le = labels.rsplit(",", 1)
+			buckets.setdefault(series, []).append((le, float(value)))
+		elif name == "quiz_latency_seconds_count":
+			counts[labels] = float(value)
+
+	assert set(buckets) == set(counts)
+	# check, edit_answer and the _edit_string it calls
+	assert len(counts) == 3
+	for series, values in buckets.items():
+		assert values[-1][0] == 'le="+Inf"'
+		cumulative = [n for _, n in values]
+		assert cumulative == sorted(cumulative)
+		assert cumulative[-1] == counts[series]
+	assert f'quiz_calls_total{{class="{Probe.__module__}.{Probe.__qualname__}",method="check",kind="check"}} 3' in lines
@@ -0,0 +1,72 @@
+import random
+import copy
+
+from professor.core.question import MultipleResponse
+from professor.core.journal import Journal, state
+
+
+def edit(q: MultipleResponse, rng: random.Random):
+	"""
+	One random editor call on a question's answer list
+
+	"""
+	values = ["a", "b", "c", "d", "e"]
+	kind = rng.randrange(5)
+	if kind == 0:
+		q.add_answer(rng.choice(values))
+	elif (kind == 1) and q.answer:
+		q.delete_answer(x=rng.choice(q.answer))
+	elif (kind == 2) and q.answer:
+		q.delete_answer(i=rng.randrange(len(q.answer)))
+	elif kind == 3:
+		q.clear_answers()
+	else:
+		q.edit_text(rng.choice(values))
+
+
+def test_undo_after_delete_before_end():
+	q = MultipleResponse(choices=["a", "c", "e"], answer=["a"], shuffle=False)
+	journal = Journal(q)
+	q.add_answer("e")
+	q.add_answer("c")
+	q.delete_answer(x="a")
+	for _ in range(3):
+		assert journal.undo()
+	assert q.answer == ["a"]
+
+
+def test_materialize_leaves_instance_alone():
+	q = MultipleResponse(choices=["x", "y"], answer=["x"], shuffle=False)
+	journal = Journal(q)
+	q.clear_answers()
+	q.add_answer("x")
+	q.add_answer("y")
+	assert journal.materialize(2).answer == ["x"]
+	assert journal.materialize(3).answer == ["x", "y"]
+	assert q.answer == ["x", "y"]
+	assert journal.undo() and journal.undo() and journal.undo()
+	assert q.answer == ["x"]
+
+
+def test_undo_redo_round_trip():
+	rng = random.Random(0)
+	for _ in range(500):
+		q = MultipleResponse(choices=["a", "b", "c", "d", "e"], answer=["a"], shuffle=False)
+		journal = Journal(q, snapshot_every=4)
+		versions = [state(q)]
+		for _ in range(rng.randrange(1, 12)):
+			edit(q, rng)
+			if journal.version == len(versions):
+				versions.append(state(q))
+			else:
+				versions[-1] = state(q)
+
+		for version in range(journal.latest + 1):
+			assert state(journal.materialize(version)) == versions[version]
+		assert state(q) == versions[-1]
+		while journal.undo():
+			assert state(q) == versions[journal.version]
+			assert q.answer.count("a") == q._index("answer").count("a")
+		while journal.redo():
+			assert state(q) == versions[journal.version]
+		assert copy.deepcopy(state(q)) == versions[-1]
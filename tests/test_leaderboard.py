@@ -0,0 +1,106 @@
+import pickle
+import random
+
+from professor.core.leaderboard import Leaderboard, Standing
+
+
+class Reference(object):
+
+	def __init__(self):
+		"""
+		Leaderboard kept as a dict and sorted on every query
+
+		"""
+		self.players = {}
+		self.joined = 0
+
+	def add(self, player, points, time):
+		score, total, order = self.players.get(player, (0, 0.0, self.joined))
+		if player not in self.players:
+			self.joined += 1
+		self.players[player] = score + points, total + time, order
+
+	def remove(self, player):
+		return self.players.pop(player, None) is not None
+
+	def standings(self):
+		ordered = sorted(self.players.items(), key=lambda item: (-item[1][0], item[1][1], item[1][2]))
+		return [Standing(k + 1, player, score, time) for k, (player, (score, time, _)) in enumerate(ordered)]
+
+
+def same(board: Leaderboard, reference: Reference):
+	standings = reference.standings()
+	assert board.top(len(standings) + 5) == standings
+	assert len(board) == len(standings)
+	for standing in standings:
+		assert board.rank(standing.player) == standing.rank
+		assert board.standing(standing.player) == standing
+		assert board.at(standing.rank) == standing
+	assert board.at(0) is None
+	assert board.at(len(standings) + 1) is None
+	assert board.top(3) == standings[:3]
+
+
+def test_record_and_remove():
+	rng = random.Random(0)
+	board, reference = Leaderboard(), Reference()
+	for step in range(2000):
+		player = f"player {rng.randrange(60)}"
+		if rng.random() < 0.1:
+			assert board.remove(player) == reference.remove(player)
+		else:
+			correct, time = rng.random() < 0.5, float(rng.randrange(5))
+			standing = board.record(player, correct, time)
+			reference.add(player, 1 if correct else 0, time)
+			assert standing == board.standing(player)
+		if step % 50 == 0:
+			same(board, reference)
+	same(board, reference)
+	assert board.rank("nobody") is None
+	assert board.standing("nobody") is None
+	assert not board.remove("nobody")
+
+
+def test_ties_keep_joining_order():
+	board = Leaderboard()
+	for player in "abc":
+		board.record(player, True, 1.0)
+	assert [s.player for s in board] == ["a", "b", "c"]
+	board.record("c", False, -0.5)
+	assert [s.player for s in board] == ["c", "a", "b"]
+
+
+def test_merge():
+	rng = random.Random(1)
+	boards = [Leaderboard() for _ in range(3)]
+	reference = Reference()
+	for _ in range(500):
+		player, points, time = f"player {rng.randrange(30)}", rng.randrange(3), float(rng.randrange(4))
+		board = rng.choice(boards)
+		board.add(player, points, time)
+
+	merged = Leaderboard()
+	for board in boards:
+		merged.merge(board)
+	for board in boards:
+		for player, score, time in board.entries():
+			reference.add(player, score, time)
+	# Ties are ordered by when players joined the merged board, so only totals are compared
+	assert sorted(merged.entries()) == sorted((s.player, s.score, s.time) for s in reference.standings())
+	assert [(s.score, s.time) for s in merged] == [(s.score, s.time) for s in reference.standings()]
+	assert Leaderboard().merge(boards[0].entries()).entries() == boards[0].entries()
+
+
+def test_pickle_round_trip():
+	rng = random.Random(2)
+	board = Leaderboard()
+	for _ in range(300):
+		board.record(f"player {rng.randrange(40)}", rng.random() < 0.5, float(rng.randrange(3)))
+	copy = pickle.loads(pickle.dumps(board))
+	assert list(copy) == list(board)
+	assert copy.entries() == board.entries()
+
+	# Both keep updating the same way
+	for player in ("player 0", "player 39", "newcomer"):
+		assert copy.record(player, True, 1.0) == board.record(player, True, 1.0)
+	assert list(copy) == list(board)
@@ -0,0 +1,52 @@
+import threading
+
+from professor.core.question import MultipleChoice, MultipleResponse
+from professor.core.wraps import Link
+
+
+def test_relationship_is_kept_until_a_type_changes():
+	q = MultipleChoice(choices=["a", "b"], answer="a", shuffle=False)
+	assert q.edit_choice("c", i=1)
+	assert q.__dict__["_links"] == {"answer:choices": Link._value_in_array}
+
+	# A value of the same type keeps the relationship
+	q._assign("answer", "c")
+	assert "_links" in q.__dict__
+
+	q._assign("answer", ["a"])
+	assert "_links" not in q.__dict__
+	assert q.edit_choice("d", i=1)
+	assert q.__dict__["_links"] == {"answer:choices": Link._array_in_array}
+
+
+def test_public_editors_are_locked():
+	for cls in (MultipleChoice, MultipleResponse):
+		for name in ("add_choice", "insert_choice", "edit_choice", "edit_text", "edit_shuffle", "edit_answer"):
+			assert getattr(cls, name).__locked__
+
+
+def test_unlinked_edits_wait_for_linked_edits():
+	started, release = threading.Event(), threading.Event()
+
+	class Slow(MultipleResponse):
+
+		@Link(domain="answer", codomain="choices")
+		def add_answer_slowly(self, x: str) -> bool:
+			started.set()
+			release.wait(5)
+			return self._add_element(attr="answer", x=x)
+
+	q = Slow(choices=["a"], answer=["a"], shuffle=False)
+	linked = threading.Thread(target=q.add_answer_slowly, args=("b",))
+	linked.start()
+	assert started.wait(5)
+	unlinked = threading.Thread(target=q.add_choice, args=("c",))
+	unlinked.start()
+	# add_choice waits for the linked edit, rather than reporting its change into the linked edit's deltas
+	unlinked.join(0.1)
+	assert unlinked.is_alive()
+	release.set()
+	linked.join()
+	unlinked.join()
+	assert q.answer == ["a", "b"]
+	assert sorted(q.choices) == ["a", "b", "c"]
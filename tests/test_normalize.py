@@ -0,0 +1,31 @@
+from professor.core.question import FreeResponse, MultipleFreeResponse
+from professor.utils import normalize
+from professor.utils.normalize import Normalizer
+
+
+def test_exact_compares_as_given():
+	q = FreeResponse(answer="Paris", exact=True)
+	assert q.check("Paris")
+	assert not q.check("paris")
+	assert not q.check("PARIS!!")
+	assert q.grader()("Paris")
+	assert not q.grader()("paris")
+
+	q = MultipleFreeResponse(answer=["C++", "C#"], exact=True)
+	assert q.check("C#")
+	assert not q.check("c")
+	assert not q.grader()("c")
+
+
+def test_punctuation_is_significant_by_default():
+	assert normalize.default("3 14") != normalize.default("3.14")
+	assert normalize.default(" 3.14 ") == "3.14"
+
+	q = MultipleFreeResponse(answer=["C++", "C#"])
+	assert not q.check("c")
+	assert q.check("c#")
+
+
+def test_collapse_is_opt_in():
+	q = FreeResponse(answer="The Eiffel Tower", normalizer=Normalizer("nfkc", "casefold", "collapse", "articles"))
+	assert q.check("eiffel-tower!")
@@ -0,0 +1,110 @@
+from string import ascii_lowercase
+import random
+
+import pytest
+
+from professor.core.question import MultipleResponse, Score, parse_choices
+
+
+def picks(q: MultipleResponse, x=None, i=None) -> list:
+	"""
+	The values a response picks, as the set-based check read them. Letters and indices past the choices
+	pick a value that is no choice.
+
+	"""
+	if isinstance(x, str):
+		i = [ascii_lowercase.index(t) if t.isalpha() else int(t) for t in x.replace(",", " ").split()]
+		x = None
+	if x:
+		return list(x)
+	return [q.choices[k] if 0 <= k < len(q.choices) else ("missing", k) for k in (i or [])]
+
+
+def check(q: MultipleResponse, x=None, i=None) -> bool:
+	chosen = picks(q, x, i)
+	return bool(chosen) and (set(chosen) == set(q.answer))
+
+
+def score(q: MultipleResponse, x=None, i=None) -> Score:
+	chosen = picks(q, x, i)
+	answer = set(q.answer)
+	known = {v for v in chosen if v in q.choices}
+	unknown = sum(v not in q.choices for v in chosen)
+	return Score(len(known & answer), len(answer - known), len(known - answer) + unknown)
+
+
+def test_parse_choices():
+	assert parse_choices("a, c d") == [0, 2, 3]
+	assert parse_choices(" A;b,,c ") == [0, 1, 2]
+	assert parse_choices("0 2 10") == [0, 2, 10]
+	assert parse_choices("a a") == [0, 0]
+	assert parse_choices("") == []
+	assert parse_choices("ab") is None
+	assert parse_choices("a -1") is None
+
+
+@pytest.mark.parametrize("response, correct", [
+	("a c", True),
+	("c, a", True),
+	("a", False),
+	("a c d", False),
+	("a a c", True),
+	("a c z", False),
+	("a c 9", False),
+	("0 2", True),
+	(["Paris", "Rome"], True),
+	(["Paris", "Rome", "Rome"], True),
+	(["Paris"], False),
+	(["Paris", "Rome", "Oslo"], False),
+	(["Paris", "Rome", "Lyon"], False),
+	([["unhashable"]], False),
+])
+def test_check(response, correct: bool):
+	q = MultipleResponse(choices=["Paris", "Berlin", "Rome", "Madrid"], answer=["Paris", "Rome"], shuffle=False)
+	assert q.check(response) is correct
+	assert q.grader()(response) is correct
+	assert q.check_many([response]) == [correct]
+
+
+def test_check_indices():
+	q = MultipleResponse(choices=["Paris", "Berlin", "Rome", "Madrid"], answer=["Paris", "Rome"], shuffle=False)
+	assert q.check(i=[0, 2])
+	assert q.check(i=[2, 0, 0])
+	assert not q.check(i=[0])
+	assert not q.check(i=[0, 2, 7])
+	assert not q.check(i=[0, 2, -1])
+	assert not q.check()
+
+
+def test_bitmasks_match_sets():
+	rng = random.Random(0)
+	for _ in range(300):
+		choices = rng.sample([f"choice {k}" for k in range(40)], rng.randrange(1, 12))
+		answer = rng.sample(choices, rng.randrange(1, len(choices) + 1))
+		q = MultipleResponse(choices=choices, answer=answer, shuffle=False)
+		responses = []
+		for _ in range(20):
+			k = rng.randrange(0, len(choices) + 3)
+			indices = [rng.randrange(len(choices) + 2) for _ in range(k)]
+			if rng.random() < 0.5:
+				responses.append(" ".join(ascii_lowercase[i] for i in indices))
+			else:
+				responses.append([choices[i] if i < len(choices) else "not a choice" for i in indices])
+		for response in responses:
+			assert q.check(response) == check(q, response), response
+			assert q.score(response) == score(q, response), response
+		assert q.check_many(responses) == [check(q, response) for response in responses]
+		assert q.score_many(responses) == [score(q, response) for response in responses]
+
+
+def test_masks_follow_edits():
+	q = MultipleResponse(choices=["x", "y", "z"], answer=["x"], shuffle=False)
+	assert q.check("a")
+	q.add_answer("w")
+	assert not q.check("a")
+	assert q.check("a d")
+	assert q.check(["w", "x"])
+	q.delete_choice(x="x")
+	assert q.choices == ["y", "z", "w"]
+	assert q.check("c")
+	assert q.score("a c") == Score(1, 0, 1)
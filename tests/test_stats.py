@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from professor.core.stats import ItemStatistics
+
+np = pytest.importorskip("numpy")
+
+
+def answers(rng: random.Random, n: int):
+	"""
+	Random graded answers (question id, correct, time, score). Correct answers come with higher scores,
+	so discriminations are not all zero.
+
+	"""
+	rows = []
+	for _ in range(n):
+		qid = rng.choice([1, 2, "three"])
+		score = rng.random()
+		rows.append((qid, rng.random() < score, rng.expovariate(1 / 20), score))
+	return rows
+
+
+def expected(rows, qid):
+	correct = np.array([c for q, c, _, _ in rows if q == qid], dtype=float)
+	times = np.array([t for q, _, t, _ in rows if q == qid])
+	scores = np.array([s for q, _, _, s in rows if q == qid])
+	return {
+		"answers": len(correct),
+		"difficulty": correct.mean(),
+		"discrimination": np.corrcoef(correct, scores)[0, 1],
+		"mean_time": times.mean(),
+		"time_sd": times.std(ddof=1),
+	}
+
+
+def check(stats: ItemStatistics, rows):
+	for qid in (1, 2, "three"):
+		item = stats.item(qid)
+		for field, value in expected(rows, qid).items():
+			assert getattr(item, field) == pytest.approx(value, rel=1e-9), (qid, field)
+
+
+def test_matches_direct_computation():
+	rows = answers(random.Random(0), 2000)
+	stats = ItemStatistics()
+	for qid, correct, time, score in rows:
+		stats.update(qid, correct, time=time, score=score)
+	check(stats, rows)
+
+
+def test_merge_matches_direct_computation():
+	rng = random.Random(1)
+	rows = answers(rng, 3000)
+	parts = [ItemStatistics() for _ in range(4)]
+	for row in rows:
+		qid, correct, time, score = row
+		rng.choice(parts).update(qid, correct, time=time, score=score)
+	# An empty part and a part without times or scores merge too
+	parts.append(ItemStatistics())
+	merged = ItemStatistics()
+	for part in parts:
+		merged.merge(part)
+	check(merged, rows)
+
+	partial = ItemStatistics().merge(merged)
+	partial.update(1, True)
+	assert partial.item(1).answers == merged.item(1).answers + 1
+	assert partial.item(1).mean_time == merged.item(1).mean_time
+
+
+def test_without_scores():
+	stats = ItemStatistics()
+	stats.update("q", True)
+	stats.update("q", False, time=3.0)
+	item = stats.item("q")
+	assert (item.answers, item.difficulty, item.discrimination, item.mean_time, item.time_sd) == (2, 0.5, None, 3.0, None)
+
+
+def test_round_trip(tmp_path):
+	rows = answers(random.Random(2), 500)
+	stats = ItemStatistics()
+	for qid, correct, time, score in rows:
+		stats.update(qid, correct, time=time, score=score)
+
+	loaded = ItemStatistics.loads(stats.dumps())
+	assert loaded.ids == stats.ids
+	assert loaded.summary() == stats.summary()
+	stats.save(tmp_path / "stats.bin")
+	assert ItemStatistics.load(tmp_path / "stats.bin").summary() == stats.summary()
+	assert list(tmp_path.iterdir()) == [tmp_path / "stats.bin"]
+
+	# Loaded statistics keep accumulating
+	loaded.update(1, True, time=1.0, score=1.0)
+	assert loaded.item(1).answers == stats.item(1).answers + 1
@@ -0,0 +1,66 @@
+import hashlib
+
+import pytest
+
+from professor.utils.storage import ImageStore
+
+
+def test_put_and_get(tmp_path):
+	store = ImageStore(tmp_path)
+	digest = store.put(b"image")
+	assert digest == hashlib.sha256(b"image").hexdigest()
+	assert store.put(b"image") == digest
+	assert digest in store
+	assert list(store) == [digest]
+	assert store.get(digest) == b"image"
+
+	store.evict()
+	assert store.size == 0
+	assert store.get(digest) == b"image"
+	assert store.get(store.put(b"")) == b""
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+	store = ImageStore(tmp_path, budget=10)
+	a, b, c = (store.put(x) for x in (b"aaaa", b"bbbb", b"cccc"))
+	store.get(a)
+	store.get(b)
+	store.get(a)
+	store.get(c)
+	# b was used least recently
+	assert list(store._cache) == [a, c]
+	assert store.size == 8
+	# Images larger than the budget are read but never held
+	big = store.put(b"x" * 11)
+	assert store.get(big) == b"x" * 11
+	assert big not in store._cache
+	assert store.get(b) == b"bbbb"
+
+
+def test_delete(tmp_path):
+	store = ImageStore(tmp_path)
+	digest = store.put(b"image")
+	store.get(digest)
+	assert store.delete(digest)
+	assert digest not in store
+	assert store.get(digest) is None
+	assert store.size == 0
+	assert not store.delete(digest)
+
+
+@pytest.mark.parametrize("digest", ["../../etc/passwd", "ab/../../x", "A" * 64, "g" * 64, "ab", "", None])
+def test_invalid_digests(tmp_path, digest):
+	store = ImageStore(tmp_path / "store")
+	with pytest.raises(ValueError):
+		store.path(digest)
+	assert digest not in store
+	assert store.get(digest) is None
+	assert not store.delete(digest)
+
+
+def test_digests_of_other_algorithms(tmp_path):
+	store = ImageStore(tmp_path, algorithm="blake2b")
+	digest = store.put(b"image")
+	assert len(digest) == store.digest_length == 128
+	assert store.get(digest) == b"image"
+	assert not store.valid(hashlib.sha256(b"image").hexdigest())
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from professor.core.template import NumericTemplate, compile_expression
+
+
+def template() -> NumericTemplate:
+	return NumericTemplate(
+		id="car", text="A car travels {d} km in {t} h. What is its speed in km/h?",
+		params={"d": ("integers", 10, 500), "t": [1, 2, 4, 5]}, expression="d / t", round=1
+	)
+
+
+@pytest.mark.parametrize("expression", [
+	"(lambda: 1)()",
+	"[c for c in ().__class__.__base__.__subclasses__()][0]",
+	"(lambda: [c for c in ().__class__.__base__.__subclasses__() if c.__name__ == '_wrap_close'][0])()",
+	"d.__class__",
+	"sqrt.__globals__",
+	"{'a': d}['a']",
+	"__import__('os')",
+	"d(t)",
+	"sqrt(d, out=t)",
+	"10**10**10",
+	"(d**2)**3",
+	"d**t",
+	"2**1000",
+	"'a' * 10**10",
+	"'a' * d",
+	"b'a'",
+	"1j * d",
+	"1 << 10**9",
+])
+def test_refused_expressions(expression: str):
+	q = template()
+	assert not q.edit_expression(expression)
+	assert q.expression == "d / t"
+	with pytest.raises((ValueError, NameError, SyntaxError)):
+		compile_expression(expression, q.params)
+
+
+def test_allowed_expressions():
+	q = template()
+	assert q.edit_expression("round(sqrt(d) * pi, 2) if 0 < t < d and d > 20 else -abs(d - t)")
+	_, answers = q.batch(100, seed=1)
+	assert answers.shape == (100,)
+
+
+def test_invalid_constructor_expression():
+	with pytest.raises(ValueError):
+		NumericTemplate(id="x", text="{d}", params={"d": [1, 2]}, expression="d + z")
+	with pytest.raises(ValueError):
+		NumericTemplate(id="x", text="{d}", params={"d": [1, 2]}, expression="10**10**10")
+
+
+def test_powers_of_literals():
+	q = template()
+	assert q.edit_expression("(d / t)**2 + d**-0.5")
+	params, answers = q.batch(10, seed=3)
+	assert answers.tolist() == pytest.approx(((params["d"] / params["t"])**2 + params["d"]**-0.5).tolist())
+
+
+def test_variants_are_reproducible():
+	q = template()
+	assert q.draw(7).text == q.draw(7).text
+	assert q.draw(7).answer == q.draw(7).answer
+	assert q.draw(7).id == "car:7:0"
+	assert q.draw().id == "car:0"
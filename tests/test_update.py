@@ -0,0 +1,40 @@
+from professor.core.base import QuizBase
+from professor.core.question import FreeResponse, MultipleFreeResponse, Numeric
+
+
+def test_failures_are_reported():
+	fr = FreeResponse(answer="Paris")
+	mfr = MultipleFreeResponse(answer=["a", "b"])
+	nu = Numeric(answer="1")
+	quiz = QuizBase(questions=[fr, mfr, nu])
+
+	failures = []
+	edited = quiz.update(values={"answer": "Lyon"}, failures=failures)
+	assert edited == [fr]
+	assert fr.answer == "Lyon"
+	assert [(f.question, f.attr) for f in failures] == [(mfr, "answer"), (nu, "answer")]
+	# edit_answer needs a position on MultipleFreeResponse
+	assert isinstance(next(f for f in failures if f.question is mfr).error, TypeError)
+
+
+
+def test_type_and_numbers_go_through_editors():
+	fr = FreeResponse(answer="3")
+	nu = Numeric(answer="1")
+	quiz = QuizBase(questions=[fr, nu])
+
+	failures = []
+	assert quiz.update(values={"type": Numeric}, failures=failures) == [fr, nu]
+	assert failures == []
+	assert isinstance(fr, Numeric)
+	assert fr.answer == 3
+
+	assert quiz.update(values={"round": 2}, failures=failures) == [fr, nu]
+	assert failures == []
+	assert fr.round == nu.round == 2
+	assert fr.check("3.001")
+
+
+def test_failures_are_optional():
+	quiz = QuizBase(questions=[MultipleFreeResponse(answer=["a"])])
+	assert quiz.update(values={"answer": "b"}) == []